@@ -1,210 +1,285 @@
-from flask import Flask, render_template, Response, request, jsonify, redirect, url_for
-import cv2
-import pandas as pd
+from flask import Flask, render_template, Response, request, jsonify, redirect, url_for, stream_with_context
+import atexit
+import click
+import csv
+import io
 import os
 import json
-import numpy as np
-import face_recognition
+import time
 from datetime import datetime
-from models.face_recognizer import FaceRecognizer
-from models.gesture_recognizer import GestureRecognizer
+from models.face_registration import RegistrationManager
+from models.lazy_model import LazyModel, warm_up
+from monitoring.metrics import metrics
+from storage.attendance_ledger import FIELDS, AttendanceLedger
+from storage.attendance_query import AttendanceQuery, parse_limit
+from storage.attendance_summary import AttendanceAggregates
+from storage.sqlite_store import SQLiteStore
+from storage.student_store import JsonStudentStore
+from streaming.attendance_trigger import AttendanceTrigger
+from streaming.camera_workers import CameraManager, load_camera_config
+from streaming.frame_encoder import JpegEncoder, parse_profile
+from streaming.frame_hub import FrameHub
+from streaming.frame_pipeline import FramePipeline
+from streaming.frame_scheduler import FrameScheduler
 
 app = Flask(__name__)
 
-# Initialize recognizers
-face_recognizer = FaceRecognizer()
-gesture_recognizer = GestureRecognizer()
+# The vision stack (dlib, MediaPipe) and the face gallery load on first use,
+# so importing the app and serving pages and JSON APIs never pays for them
+def load_face_recognizer():
+    from models.face_recognizer import FaceRecognizer
+    return FaceRecognizer()
+
+def load_face_tracker():
+    from models.face_tracker import FaceTracker
+    return FaceTracker(face_recognizer)
+
+def load_gesture_recognizer():
+    from models.gesture_recognizer import GestureRecognizer
+    return GestureRecognizer()
+
+face_recognizer = LazyModel('face_recognizer', load_face_recognizer)
+face_tracker = LazyModel('face_tracker', load_face_tracker)
+gesture_recognizer = LazyModel('gesture_recognizer', load_gesture_recognizer)
+vision_models = [face_recognizer, face_tracker, gesture_recognizer]
+
+def warm_up_models():
+    """Load the models in the background at server start, unless MODEL_WARMUP=0"""
+    if os.environ.get('MODEL_WARMUP', '1') != '0':
+        return warm_up(vision_models)
+    return None
+
+# Hand detection only runs once a recognized face is present and stable:
+# GESTURE_POLICY is 'roi' (around the faces), 'stable' (full frame) or
+# 'always'; GESTURE_EVERY is the cadence while it runs.
+frame_scheduler = FrameScheduler(face_tracker, gesture_recognizer,
+                                 gesture_policy=os.environ.get('GESTURE_POLICY', 'roi'),
+                                 gesture_every=int(os.environ.get('GESTURE_EVERY', 2)))
 
 # Ensure data directory exists
 os.makedirs('data', exist_ok=True)
 os.makedirs('data/face_images', exist_ok=True)
 
-# Initialize attendance CSV with proper headers
 attendance_file = 'data/attendance.csv'
-if not os.path.exists(attendance_file) or os.path.getsize(attendance_file) == 0:
-    df = pd.DataFrame(columns=['Name', 'Date', 'Time', 'Status'])
-    df.to_csv(attendance_file, index=False)
-
-# Student database file
 students_file = 'data/students.json'
 
+# ATTENDANCE_BACKEND=sqlite keeps students and attendance in an indexed
+# SQLite database (existing CSV/JSON data is imported on first start);
+# the default is the append-only CSV ledger plus students.json.
+STORAGE_BACKEND = os.environ.get('ATTENDANCE_BACKEND', 'csv')
+if STORAGE_BACKEND == 'sqlite':
+    attendance_store = SQLiteStore('data/attendance.db', attendance_file, students_file)
+    student_store = attendance_store
+else:
+    attendance_store = AttendanceLedger(attendance_file)
+    student_store = JsonStudentStore(students_file)
+
 def load_students():
-    if os.path.exists(students_file) and os.path.getsize(students_file) > 0:
-        try:
-            with open(students_file, 'r') as f:
-                return json.load(f)
-        except:
-            return []
-    return []
-
-def save_students(students):
-    with open(students_file, 'w') as f:
-        json.dump(students, f, indent=2)
+    return student_store.students()
+
+# Department of each student, used to roll attendance up by department
+student_departments = {s['name']: s.get('department', '') for s in load_students()}
+
+def department_of(name):
+    return student_departments.get(name, '')
+
+# Incrementally maintained attendance rollups behind /api/attendance/summary
+attendance_summary = AttendanceAggregates(f'data/attendance_summary_{STORAGE_BACKEND}.json')
+
+def load_attendance_summary():
+    """Restore the rollups checkpoint and replay ledger rows written since"""
+    if not attendance_summary.load():
+        attendance_summary.reset()
+        attendance_summary.position = None
+    replayed = attendance_summary.replay(attendance_store, department_of, attendance_summary.position)
+    if replayed:
+        print(f"Replayed {replayed} attendance rows into the summary")
+    attendance_summary.save()
+
+load_attendance_summary()
+atexit.register(attendance_summary.save)
 
 def mark_attendance(name):
-    """Mark attendance in CSV file"""
+    """Record `name` as present today in the attendance store (CSV ledger or SQLite)"""
     try:
-        # Read existing data safely
-        if os.path.getsize(attendance_file) == 0:
-            df = pd.DataFrame(columns=['Name', 'Date', 'Time', 'Status'])
-        else:
-            df = pd.read_csv(attendance_file)
-        
         now = datetime.now()
-        date = now.strftime("%Y-%m-%d")
-        time = now.strftime("%H:%M:%S")
-        
-        # Check if already marked today
-        if 'Date' in df.columns:
-            today_attendance = df[(df['Name'] == name) & (df['Date'] == date)]
-            if len(today_attendance) > 0:
-                return False, "Attendance already marked today"
-        
-        new_entry = pd.DataFrame({
-            'Name': [name],
-            'Date': [date],
-            'Time': [time],
-            'Status': ['Present']
-        })
-        
-        df = pd.concat([df, new_entry], ignore_index=True)
-        df.to_csv(attendance_file, index=False)
-        return True, "Attendance marked successfully"
+        with attendance_summary.lock:
+            started_at = time.perf_counter()
+            success, message = attendance_store.mark(name, now=now)
+            metrics.observe('attendance_write', started_at)
+            if success:
+                attendance_summary.record(name, now.strftime("%Y-%m-%d"), department_of(name))
+                attendance_summary.position = attendance_store.end_cursor()
+        attendance_summary.maybe_save()
+        return success, message
     except Exception as e:
+        metrics.increment('errors', stage='attendance_write')
         return False, f"Error marking attendance: {str(e)}"
 
-# Global variables for face registration
-current_registration = {
-    'active': False,
-    'name': '',
-    'samples_collected': 0,
-    'max_samples': 10
-}
+# Registrations in progress; samples are checked and encoded off the stream threads
+registrations = RegistrationManager(face_recognizer)
 
-def generate_frames():
-    """Generate video frames with face and gesture recognition"""
-    cap = cv2.VideoCapture(0)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+# Camera behind the live stream and registration; VIDEO_SOURCE may be a
+# USB index, a stream URL or a video file
+VIDEO_SOURCE = os.environ.get('VIDEO_SOURCE', '0')
+
+def open_camera():
+    from streaming.camera_sources import open_source
+    return open_source(VIDEO_SOURCE)
+
+# Additional door cameras run in worker processes (see streaming/camera_workers.py)
+CAMERA_CONFIG = os.environ.get('CAMERA_CONFIG', 'cameras.json')
+camera_manager = None
+
+def start_camera_workers():
+    """Start a worker process per configured camera, recording their events here"""
+    global camera_manager
+    cameras = load_camera_config(CAMERA_CONFIG)
+    if not cameras:
+        return None
+    camera_manager = CameraManager(cameras, mark_attendance, attendance_store.is_marked).start()
+    atexit.register(camera_manager.stop)
+    print(f"Started {len(cameras)} camera workers from {CAMERA_CONFIG}")
+    return camera_manager
+
+def create_pipeline():
+    """One capture and inference pipeline, shared by every stream client"""
+    # Confirmation progress, cooldowns and who was marked live with the pipeline
+    trigger = AttendanceTrigger(mark_attendance, attendance_store.is_marked,
+                                confirm_frames=int(os.environ.get('GESTURE_CONFIRM_FRAMES', 4)))
     
-    attendance_marked = False
-    marked_name = ""
-    last_attendance_time = datetime.now()
+    return FramePipeline(
+        open_camera,
+        face_stage,
+        gesture_stage,
+        render_frame,
+        on_results=lambda face, gesture: decide_attendance(face, gesture, trigger),
+        prepare=frame_scheduler.prepare
+    )
+
+# Process-wide camera broadcaster: the camera opens with the first viewer
+# JPEG_ENCODER=turbojpeg|opencv|auto (libjpeg-turbo when PyTurboJPEG is installed)
+frame_hub = FrameHub(create_pipeline, encoder=JpegEncoder(os.environ.get('JPEG_ENCODER', 'auto')))
+
+def mjpeg_part(frame_bytes):
+    """One JPEG as a part of the multipart/x-mixed-replace video stream"""
+    return (b'--frame\r\n'
+            b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+
+def generate_frames(profile=None):
+    """Generate video frames with face and gesture recognition"""
+    for frame_bytes in frame_hub.stream(profile):
+        yield mjpeg_part(frame_bytes)
+
+def face_stage(frame):
+    """Face worker: registration capture or recognition, depending on mode"""
+    session = registrations.current()
+    if session is not None:
+        face_tracker.reset()
+        frame_scheduler.reset()
+        return handle_face_registration(frame, session)
     
-    while True:
-        success, frame = cap.read()
-        if not success:
-            break
-        
-        # Handle face registration if active
-        if current_registration['active']:
-            frame = handle_face_registration(frame)
-        else:
-            # Normal face recognition mode
-            frame = handle_attendance_mode(frame, attendance_marked, marked_name, last_attendance_time)
-        
-        # Encode frame
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame_bytes = buffer.tobytes()
-        
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+    # Detection and encoding only run when the tracker needs them
+    face_locations, face_names, track_ids = frame_scheduler.faces(frame)
+    return {'mode': 'attendance', 'locations': face_locations, 'names': face_names, 'track_ids': track_ids}
+
+def gesture_stage(frame):
+    """Gesture worker: hand landmarks and gestures, gated on recognized faces"""
+    if registrations.current() is not None:
+        return None
     
-    cap.release()
+    return frame_scheduler.hands(frame)
 
-def handle_face_registration(frame):
-    """Handle face registration process"""
-    global current_registration
+def handle_face_registration(frame, session):
+    """Show the face box and hand a sample to the registration encoder when one is due"""
+    # Detect faces with the same scale/ROI scheduling as recognition
+    face_locations = face_recognizer.detect_faces(frame.image, frame.rgb)
+    result = {'mode': 'registration', 'name': session.name, 'location': None}
     
-    # Convert to RGB for face recognition
-    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    if len(face_locations) > 0:
+        # The largest face is the student registering
+        top, right, bottom, left = max(face_locations, key=lambda box: (box[2] - box[0]) * (box[1] - box[3]))
+        result['location'] = (top, right, bottom, left)
+        registrations.offer(session, frame.image, frame.rgb, result['location'])
     
-    # Display registration info
-    cv2.putText(frame, f"Registration: {current_registration['name']}", 
-               (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-    cv2.putText(frame, f"Samples: {current_registration['samples_collected']}/{current_registration['max_samples']}", 
-               (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-    cv2.putText(frame, "Keep face centered and look straight", 
-               (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+    return result
+
+def decide_attendance(face, gesture, trigger):
+    """Mark attendance once a recognized face holds up an open hand for several frames"""
+    if face is None or gesture is None or face.value is None or gesture.value is None:
+        return trigger
+    if face.value['mode'] != 'attendance':
+        return trigger
     
-    # Detect faces
-    face_locations = face_recognition.face_locations(rgb_frame)
+    return trigger.update(face.value, gesture.value)
+
+def scaled_box(box, scale):
+    """Full-frame (top, right, bottom, left) box on a frame resized by `scale`"""
+    return tuple(int(v * scale) for v in box)
+
+def put_text(frame, text, origin, size, color, thickness, scale):
+    """cv2.putText with position and size following the output scale"""
+    import cv2
+    x, y = origin
+    cv2.putText(frame, text, (int(x * scale), int(y * scale)), cv2.FONT_HERSHEY_SIMPLEX,
+                size * scale, color, max(1, int(round(thickness * scale))))
+
+def draw_registration(frame, face, status, scale=1.0):
+    import cv2
+    # Display registration info
+    put_text(frame, f"Registration: {status['name']}", 
+             (10, 30), 0.7, (0, 255, 255), 2, scale)
+    put_text(frame, f"Samples: {status['samples_collected']}/{status['max_samples']}", 
+             (10, 60), 0.7, (0, 255, 255), 2, scale)
+    put_text(frame, status['hint'] or "Keep face centered and look straight", 
+             (10, 90), 0.5, (0, 255, 255), 1, scale)
     
-    if len(face_locations) > 0:
+    if face is not None and face.value is not None and face.value['mode'] == 'registration' and face.value['location']:
         # Draw face bounding box
-        top, right, bottom, left = face_locations[0]
+        top, right, bottom, left = scaled_box(face.value['location'], scale)
         cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-        
-        # Auto-capture samples every 2 seconds if face is detected
-        current_time = datetime.now()
-        if (current_time - current_registration.get('last_capture', datetime.now())).total_seconds() > 2:
-            # Save face sample
-            face_image = frame[top:bottom, left:right]
-            if face_image.size > 0:
-                sample_path = f"data/face_images/{current_registration['name']}_{current_registration['samples_collected']}.jpg"
-                cv2.imwrite(sample_path, face_image)
-                
-                # Add to face recognizer
-                if face_recognizer.add_face_encoding(face_image, current_registration['name']):
-                    current_registration['samples_collected'] += 1
-                    current_registration['last_capture'] = current_time
-                
-                # Check if we have enough samples
-                if current_registration['samples_collected'] >= current_registration['max_samples']:
-                    current_registration['active'] = False
-                    cv2.putText(frame, "REGISTRATION COMPLETE!", (50, 120), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
     else:
-        cv2.putText(frame, "No face detected - please position face in frame", 
-                   (10, 120), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
-    
-    return frame
+        put_text(frame, "No face detected - please position face in frame", 
+                 (10, 120), 0.5, (0, 0, 255), 1, scale)
 
-def handle_attendance_mode(frame, attendance_marked, marked_name, last_attendance_time):
-    """Handle normal attendance marking mode"""
-    # Face recognition
-    face_locations, face_names = face_recognizer.recognize_face(frame)
-    
+def draw_attendance(frame, face, gesture, state, scale=1.0):
+    import cv2
     # Draw face bounding boxes and names
-    for (top, right, bottom, left), name in zip(face_locations, face_names):
-        cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-        cv2.putText(frame, name, (left, top - 10), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+    if face is not None and face.value is not None and face.value['mode'] == 'attendance':
+        for box, name in zip(face.value['locations'], face.value['names']):
+            top, right, bottom, left = scaled_box(box, scale)
+            cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+            cv2.putText(frame, name, (left, top - int(10 * scale)), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.9 * scale, (0, 255, 0), max(1, int(round(2 * scale))))
     
-    # Gesture recognition
-    hand_landmarks = gesture_recognizer.detect_hands(frame)
     gesture_detected = None
-    
-    if hand_landmarks:
-        gesture_detected = gesture_recognizer.recognize_gesture(hand_landmarks)
+    if gesture is not None and gesture.value is not None and gesture.value['landmarks']:
+        gesture_detected = gesture.value['gesture']
         
         # Draw hand landmarks
-        gesture_recognizer.mp_draw.draw_landmarks(
-            frame, hand_landmarks, gesture_recognizer.mp_hands.HAND_CONNECTIONS)
-        
-        # If open hand gesture detected and face recognized, mark attendance
-        current_time = datetime.now()
-        time_diff = (current_time - last_attendance_time).total_seconds()
-        
-        if (gesture_detected == 'open_hand' and 
-            len(face_names) > 0 and 
-            face_names[0] != "Unknown" and 
-            time_diff > 5):  # Prevent multiple markings within 5 seconds
-            
-            if not attendance_marked or marked_name != face_names[0]:
-                success, message = mark_attendance(face_names[0])
-                if success:
-                    attendance_marked = True
-                    marked_name = face_names[0]
-                    last_attendance_time = current_time
-                    cv2.putText(frame, "ATTENDANCE MARKED!", (50, 50), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3)
+        for hand_landmarks in gesture.value['landmarks']:
+            gesture_recognizer.mp_draw.draw_landmarks(
+                frame, hand_landmarks, gesture_recognizer.mp_hands.HAND_CONNECTIONS)
+    
+    # Keep the confirmation on screen briefly after a mark
+    if state is not None:
+        if state.recent_mark():
+            put_text(frame, "ATTENDANCE MARKED!", (50, 50), 1, (0, 255, 0), 3, scale)
+        for i, (name, count) in enumerate(state.pending()):
+            put_text(frame, f"Hold for {name}: {count}/{state.confirm_frames}", (50, 140 + 25 * i), 
+                     0.6, (0, 255, 255), 2, scale)
     
     # Display gesture info
     if gesture_detected:
-        cv2.putText(frame, f"Gesture: {gesture_detected}", (50, 100), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 0), 2)
-    
+        put_text(frame, f"Gesture: {gesture_detected}", (50, 100), 0.7, (255, 0, 0), 2, scale)
+
+def render_frame(frame, face, gesture, state, scale=1.0):
+    """Draw the latest annotations on a (possibly downscaled) copy of a captured frame"""
+    session = registrations.current()
+    if session is not None:
+        draw_registration(frame, face, registrations.status(session.name), scale)
+    else:
+        draw_attendance(frame, face, gesture, state, scale)
     return frame
 
 @app.route('/')
@@ -213,28 +288,62 @@ def index():
 
 @app.route('/video_feed')
 def video_feed():
-    return Response(generate_frames(), 
+    """MJPEG stream; ?width=, ?quality=, ?fps= and ?adaptive=0 set the output"""
+    return Response(generate_frames(parse_profile(request.args)), 
                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/video_feed_register')
 def video_feed_register():
     """Video feed for registration page - uses the same generator but with registration mode"""
-    return Response(generate_frames(), 
+    return Response(generate_frames(parse_profile(request.args)), 
                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
+def attendance_query_from_request():
+    """Attendance filters from the query string: start, end, name, department, status"""
+    department = request.args.get('department')
+    names = None
+    if department and STORAGE_BACKEND != 'sqlite':
+        names = {s['name'] for s in load_students() if s.get('department') == department}
+    
+    return AttendanceQuery(
+        start=request.args.get('start'),
+        end=request.args.get('end'),
+        name=request.args.get('name'),
+        names=names,
+        status=request.args.get('status'),
+        department=department
+    )
+
+def stream_attendance(query, export_format):
+    """Stream matching rows as NDJSON or CSV without building the full list"""
+    def generate():
+        if export_format == 'csv':
+            yield ','.join(FIELDS) + '\n'
+        for record in attendance_store.records(query):
+            if export_format == 'csv':
+                line = io.StringIO()
+                csv.writer(line, lineterminator='\n').writerow([record[field] for field in FIELDS])
+                yield line.getvalue()
+            else:
+                yield json.dumps(record) + '\n'
+    
+    if export_format == 'csv':
+        return Response(stream_with_context(generate()), mimetype='text/csv',
+                        headers={'Content-Disposition': 'attachment; filename=attendance.csv'})
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/attendance')
 def attendance():
+    query = attendance_query_from_request()
     try:
-        if os.path.getsize(attendance_file) == 0:
-            records = []
-        else:
-            df = pd.read_csv(attendance_file)
-            records = df.to_dict('records')
+        records, next_cursor = attendance_store.page(query, request.args.get('cursor'),
+                                                     parse_limit(request.args.get('limit')))
     except Exception as e:
-        print(f"Error reading attendance file: {e}")
-        records = []
+        print(f"Error reading attendance records: {e}")
+        records, next_cursor = [], None
     
-    return render_template('attendance.html', records=records)
+    return render_template('attendance.html', records=records, next_cursor=next_cursor,
+                           filters=query.as_args())
 
 @app.route('/add_student', methods=['GET', 'POST'])
 def add_student():
@@ -244,24 +353,16 @@ def add_student():
         department = request.form.get('department', '')
         
         # Add student to database
-        students = load_students()
-        students.append({
+        student_store.add_student({
             'name': name,
             'id': student_id,
             'department': department,
             'registered_at': datetime.now().isoformat()
         })
-        save_students(students)
+        student_departments[name] = department
         
         # Start face registration process
-        global current_registration
-        current_registration = {
-            'active': True,
-            'name': name,
-            'samples_collected': 0,
-            'max_samples': 10,
-            'last_capture': datetime.now()
-        }
+        registrations.start(name, student_id)
         
         return redirect(url_for('register_face', name=name))
     
@@ -269,66 +370,191 @@ def add_student():
 
 @app.route('/register_face/<name>')
 def register_face(name):
-    # Ensure registration is active for this student
-    global current_registration
-    if not current_registration['active'] or current_registration['name'] != name:
-        current_registration = {
-            'active': True,
-            'name': name,
-            'samples_collected': 0,
-            'max_samples': 10,
-            'last_capture': datetime.now()
-        }
+    # Start or resume this student's registration; the camera follows the latest one opened
+    registrations.start(name)
     
     return render_template('register_face.html', name=name)
 
 @app.route('/complete_registration/<name>')
 def complete_registration(name):
-    global current_registration
-    current_registration['active'] = False
+    # Wait for samples still being encoded
+    registrations.complete(name)
     
-    # Ensure face encodings are saved
+    # Collapse the new samples to a centroid plus prototypes, then save
+    face_recognizer.compact_identity(name)
     face_recognizer.save_known_faces()
     
     return render_template('registration_complete.html', name=name)
 
 @app.route('/api/attendance')
 def api_attendance():
+    """Filtered attendance, one cursor page at a time or as a streamed export.
+    
+    ?format=ndjson or ?format=csv streams every matching row; otherwise the
+    response is {records, next_cursor} with at most ?limit rows.
+    """
+    query = attendance_query_from_request()
+    export_format = request.args.get('format', 'json')
+    if export_format in ('ndjson', 'csv'):
+        return stream_attendance(query, export_format)
+    
     try:
-        if os.path.getsize(attendance_file) == 0:
-            return jsonify([])
-        
-        df = pd.read_csv(attendance_file)
-        return jsonify(df.to_dict('records'))
+        limit = parse_limit(request.args.get('limit'))
+        records, next_cursor = attendance_store.page(query, request.args.get('cursor'), limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        return jsonify([])
+        return jsonify({'records': [], 'next_cursor': None})
+    
+    return jsonify({'records': records, 'next_cursor': next_cursor})
+
+@app.route('/api/attendance/summary')
+def api_attendance_summary():
+    """Headline counts: today, totals, days recorded and department totals"""
+    return jsonify(attendance_summary.summary(datetime.now().strftime("%Y-%m-%d")))
+
+@app.route('/api/attendance/summary/daily')
+def api_attendance_summary_daily():
+    """Headcount per day, optionally between ?start and ?end"""
+    return jsonify(attendance_summary.daily_counts(request.args.get('start'), request.args.get('end')))
+
+@app.route('/api/attendance/summary/students')
+def api_attendance_summary_students():
+    return jsonify(attendance_summary.all_students())
+
+@app.route('/api/attendance/summary/students/<name>')
+def api_attendance_summary_student(name):
+    student = attendance_summary.student(name)
+    if student is None:
+        return jsonify({'error': f"No attendance recorded for {name}"}), 404
+    return jsonify(student)
+
+@app.route('/api/attendance/summary/departments')
+def api_attendance_summary_departments():
+    return jsonify(attendance_summary.department_totals())
+
+@app.cli.command('rebuild-aggregates')
+@click.option('--check', is_flag=True, help='Only verify the current rollups, do not replace them.')
+def rebuild_aggregates(check):
+    """Recompute attendance rollups from the raw ledger and verify them"""
+    rebuilt = AttendanceAggregates(attendance_summary.path)
+    rebuilt.replay(attendance_store, department_of)
+    problems = attendance_summary.verify(rebuilt)
+    for problem in problems:
+        click.echo(problem)
+    click.echo(f"{len(problems)} differences between stored and rebuilt rollups")
+    
+    if not check:
+        with attendance_summary.lock:
+            attendance_summary.daily = rebuilt.daily
+            attendance_summary.students = rebuilt.students
+            attendance_summary.departments = rebuilt.departments
+            attendance_summary.position = rebuilt.position
+            attendance_summary.save()
+        click.echo("Rollups rebuilt from the ledger")
 
 @app.route('/api/students')
 def api_students():
     students = load_students()
     return jsonify(students)
 
+@app.route('/api/pipeline_stats')
+def api_pipeline_stats():
+    """Per-stage throughput, latency and queue drops of the live stream,
+    plus per-model invocation counts and time"""
+    report = frame_hub.report()
+    report['models'] = {model.name: model.report() for model in vision_models}
+    if face_tracker.loaded:
+        report['scheduler'] = frame_scheduler.report()
+    pipeline = frame_hub.pipeline
+    if pipeline is not None and pipeline.status is not None:
+        report['attendance_trigger'] = pipeline.status.report()
+    return jsonify(report)
+
+def perf_gauges():
+    """Gauges for /metrics and /api/perf, read from the live objects at scrape time"""
+    report = frame_hub.report()
+    hub = report.pop('hub')
+    gauges = [
+        ('stream_subscribers', 'Connected video stream clients', {}, hub['subscribers']),
+        ('stream_running', 'Whether the camera pipeline is running', {}, int(hub['running'])),
+        ('stream_outputs', 'Frames handed to stream clients', {}, hub['outputs']),
+        ('stream_client_dropped', 'Frames replaced before a client took them', {}, sum(hub['dropped'])),
+        ('jpeg_encodes', 'JPEG encodes for the video streams', {}, hub['encoder']['encodes']),
+    ]
+    # Reading the gallery size must not load the models
+    if face_recognizer.loaded:
+        gauges.append(('gallery_size', 'Face encodings in the recognition gallery', {}, len(face_recognizer.gallery)))
+    for model in vision_models:
+        gauges.append(('model_loaded', 'Whether a model has been loaded', {'model': model.name}, int(model.loaded)))
+        if model.load_time is not None:
+            gauges.append(('model_load_seconds', 'Time taken to load a model', {'model': model.name}, model.load_time))
+    for stage, stats in report.items():
+        if not isinstance(stats, dict) or 'fps' not in stats:
+            continue
+        gauges.append(('stage_fps', 'Frames per second through a pipeline stage', {'stage': stage}, stats['fps']))
+        gauges.append(('stage_frame_age_seconds', 'Time from capture to the end of a stage', {'stage': stage},
+                       stats['frame_age_ms'] / 1000))
+        if 'queue_depth' in stats:
+            gauges.append(('stage_queue_depth', 'Frames waiting for a stage', {'stage': stage}, stats['queue_depth']))
+            gauges.append(('stage_dropped', 'Frames dropped before a stage', {'stage': stage}, stats['dropped']))
+    if camera_manager is not None:
+        cameras = camera_manager.report()['cameras']
+        gauges.append(('camera_workers_alive', 'Camera worker processes running', {},
+                       sum(1 for c in cameras.values() if c['alive'])))
+    return gauges
+
+metrics.add_collector(perf_gauges)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Stage latency histograms, counters and gauges in Prometheus text format"""
+    return Response(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/perf')
+def api_perf():
+    """Stage latency percentiles, counters and gauges as JSON"""
+    return jsonify(metrics.snapshot())
+
+@app.route('/api/cameras')
+def api_cameras():
+    """Worker process status and event counts of the configured cameras"""
+    if camera_manager is None:
+        return jsonify({'cameras': {}, 'service': None})
+    return jsonify(camera_manager.report())
+
 @app.route('/api/registration_status')
 def api_registration_status():
-    return jsonify(current_registration)
+    """Progress of ?name='s registration (default: the one using the camera) and of all others"""
+    name = request.args.get('name')
+    status = registrations.status(name) or {
+        'name': name, 'state': 'none', 'active': False, 'samples_collected': 0,
+        'max_samples': registrations.max_samples
+    }
+    status['registrations'] = registrations.report()
+    return jsonify(status)
 
 @app.route('/manual_capture/<name>')
 def manual_capture(name):
-    """Manual endpoint to capture a face sample"""
-    global current_registration
-    
-    # Simulate capture for demonstration
-    current_registration['samples_collected'] += 1
-    if current_registration['samples_collected'] >= current_registration['max_samples']:
-        current_registration['active'] = False
-        face_recognizer.save_known_faces()
+    """Take the next registration sample now instead of waiting for the interval"""
+    if registrations.request_capture(name) is None:
+        status = registrations.status(name)
+        if status is None:
+            return jsonify({'status': 'error', 'message': f"No registration in progress for {name}"}), 404
+        return jsonify({'status': 'error', 'message': f"Registration for {name} is {status['state']}",
+                        'state': status['state']}), 409
+    status = registrations.status(name)
     
     return jsonify({
         'status': 'success',
-        'samples_collected': current_registration['samples_collected'],
-        'max_samples': current_registration['max_samples'],
-        'registration_complete': not current_registration['active']
+        'samples_collected': status['samples_collected'],
+        'max_samples': status['max_samples'],
+        'registration_complete': status['state'] in ('collected', 'complete')
     })
 
 if __name__ == '__main__':
+    # With the debug reloader only the serving child starts the workers
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_camera_workers()
+        warm_up_models()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
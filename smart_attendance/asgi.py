@@ -0,0 +1,187 @@
+"""Asyncio serving mode for the attendance app.
+
+The video streams are served natively on the event loop: every viewer is
+a coroutine waiting on the shared frame hub instead of a server thread,
+and a viewer that reads slower than the camera skips frames rather than
+buffering them. Every other route (pages, JSON APIs, exports) runs the
+existing Flask app through a WSGI bridge on a bounded thread pool, so
+blocking storage calls never stall the event loop and the templates work
+unchanged. Run with any ASGI server, e.g.
+
+    python asgi.py --port 5000
+    uvicorn asgi:application --port 5000
+"""
+import argparse
+import asyncio
+import contextvars
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+import app as attendance_app
+from streaming.frame_encoder import parse_profile
+
+STREAM_PATHS = ('/video_feed', '/video_feed_register')
+
+# Threads for Flask routes; streams do not use them
+executor = ThreadPoolExecutor(max_workers=int(os.environ.get('ASGI_THREADS', 32)),
+                              thread_name_prefix='asgi-wsgi')
+
+
+async def watch_disconnect(receive, disconnected):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            disconnected.set()
+            return
+
+
+async def serve_stream(scope, receive, send):
+    """MJPEG stream from the shared pipeline, one coroutine per viewer"""
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(b'content-type', b'multipart/x-mixed-replace; boundary=frame'),
+                            (b'cache-control', b'no-cache')]})
+
+    profile = parse_profile(dict(parse_qsl(scope['query_string'].decode('latin-1'))))
+
+    async def pump():
+        async for frame_bytes in attendance_app.frame_hub.astream(profile):
+            # Waits while the server's write buffer for this client is full
+            await send({'type': 'http.response.body', 'body': attendance_app.mjpeg_part(frame_bytes),
+                        'more_body': True})
+
+    disconnected = asyncio.Event()
+    tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(watch_disconnect(receive, disconnected))]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    if not disconnected.is_set():
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+
+def wsgi_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope['headers']:
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'CONTENT_LENGTH':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            key = f'HTTP_{name}'
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def serve_wsgi(scope, receive, send):
+    """Run a Flask route on the thread pool and relay its response"""
+    loop = asyncio.get_running_loop()
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        return lambda data: None
+
+    def call_app():
+        result = attendance_app.app(wsgi_environ(scope, body), start_response)
+        return result, iter(result)
+
+    # Every call for this request runs in one context, whichever pool thread
+    # takes it: a stream_with_context generator pops the Flask context it
+    # pushed, and context variable tokens only reset in their own context
+    context = contextvars.copy_context()
+    result, chunks = await loop.run_in_executor(executor, context.run, call_app)
+    disconnected = asyncio.Event()
+    watcher = asyncio.ensure_future(watch_disconnect(receive, disconnected))
+    try:
+        await send({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+        done = object()
+        while not disconnected.is_set():
+            # Streaming exports produce their rows lazily, also off the loop
+            chunk = await loop.run_in_executor(executor, context.run, next, chunks, done)
+            if chunk is done:
+                break
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        if not disconnected.is_set():
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+        watcher.cancel()
+        if hasattr(result, 'close'):
+            await loop.run_in_executor(executor, context.run, result.close)
+
+
+async def lifespan(receive, send):
+    loop = asyncio.get_running_loop()
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await loop.run_in_executor(executor, attendance_app.start_camera_workers)
+            attendance_app.warm_up_models()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if attendance_app.camera_manager is not None:
+                await loop.run_in_executor(executor, attendance_app.camera_manager.stop)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+    elif scope['type'] == 'http' and scope['path'] in STREAM_PATHS:
+        await serve_stream(scope, receive, send)
+    elif scope['type'] == 'http':
+        await serve_wsgi(scope, receive, send)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+    try:
+        import uvicorn
+    except ImportError:
+        print("The async server mode needs uvicorn: pip install uvicorn")
+        sys.exit(1)
+    uvicorn.run(application, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""Load test: many concurrent MJPEG viewers plus JSON API traffic.
+
+Starts the async server (asgi.py) on a free port with VIDEO_SOURCE set to
+a recording, or targets an already running server with --url. It then
+opens --viewers concurrent /video_feed streams, runs --api-clients loops
+against the JSON APIs and --export-clients loops downloading the streamed
+CSV/NDJSON attendance export, all for --duration seconds. It reports the
+frame rate each viewer received, time to first frame, API throughput and
+latency percentiles, and how many exports arrived truncated. Run from
+smart_attendance:
+
+    python -m benchmarks.bench_asgi_load --video entrance.mp4 --viewers 40 --api-clients 8
+    python -m benchmarks.bench_asgi_load --url http://127.0.0.1:5000 --json load.json
+    python -m benchmarks.bench_asgi_load --video entrance.mp4 --stream-query "width=320&fps=15"
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+API_PATHS = ['/api/attendance/summary', '/api/attendance?limit=50', '/api/students', '/api/pipeline_stats']
+EXPORT_PATHS = ['/api/attendance?format=csv', '/api/attendance?format=ndjson']
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def http_get(host, port, path):
+    """(status, head, body) of one GET on a fresh connection"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        data = await reader.read()
+    finally:
+        writer.close()
+    head, _, body = data.partition(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1]) if head else 0
+    return status, head, body
+
+
+def complete_body(head, body):
+    """Whether a response body arrived in full: the closing chunk of a
+    chunked response, or Content-Length bytes"""
+    headers = {}
+    for line in head.split(b'\r\n')[1:]:
+        name, _, value = line.partition(b':')
+        headers[name.strip().lower()] = value.strip().lower()
+    if headers.get(b'transfer-encoding') == b'chunked':
+        return body.endswith(b'0\r\n\r\n')
+    if b'content-length' in headers:
+        return len(body) == int(headers[b'content-length'])
+    return True
+
+
+async def wait_until_ready(host, port, timeout=120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            status, _, _ = await http_get(host, port, '/api/students')
+            if status == 200:
+                return True
+        except OSError:
+            pass
+        await asyncio.sleep(0.5)
+    return False
+
+
+async def viewer(host, port, stop_at, result, query=''):
+    """Read one /video_feed stream, counting frame boundaries"""
+    started = time.monotonic()
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError as e:
+        result['error'] = str(e)
+        return
+    try:
+        path = f"/video_feed?{query}" if query else '/video_feed'
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+        await writer.drain()
+        tail = b''
+        while time.monotonic() < stop_at:
+            try:
+                chunk = await asyncio.wait_for(reader.read(65536), max(0.01, stop_at - time.monotonic()))
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                result['error'] = 'stream closed'
+                break
+            result['bytes'] += len(chunk)
+            data = tail + chunk
+            count = data.count(b'--frame\r\n')
+            if count and result['first_frame'] is None:
+                result['first_frame'] = time.monotonic() - started
+            result['frames'] += count
+            tail = data[-9:]
+    finally:
+        writer.close()
+
+
+async def api_client(host, port, stop_at, paths, latencies, errors):
+    i = 0
+    while time.monotonic() < stop_at:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            status, _, _ = await http_get(host, port, path)
+        except OSError:
+            status = 0
+        latencies.append(time.perf_counter() - started)
+        if status != 200:
+            errors.append((path, status))
+
+
+async def export_client(host, port, stop_at, result):
+    """Download the streamed exports in a loop, counting truncated responses"""
+    i = 0
+    while time.monotonic() < stop_at:
+        path = EXPORT_PATHS[i % len(EXPORT_PATHS)]
+        i += 1
+        try:
+            status, head, body = await http_get(host, port, path)
+        except OSError:
+            status, head, body = 0, b'', b''
+        result['requests'] += 1
+        if status != 200:
+            result['errors'].append((path, status))
+        elif not complete_body(head, body):
+            result['truncated'] += 1
+
+
+async def run_load(host, port, args):
+    stop_at = time.monotonic() + args.duration
+    viewers = [{'frames': 0, 'bytes': 0, 'first_frame': None, 'error': None} for _ in range(args.viewers)]
+    latencies, errors = [], []
+    exports = {'requests': 0, 'truncated': 0, 'errors': []}
+    tasks = [viewer(host, port, stop_at, result, args.stream_query) for result in viewers]
+    tasks += [api_client(host, port, stop_at, args.api_paths, latencies, errors) for _ in range(args.api_clients)]
+    tasks += [export_client(host, port, stop_at, exports) for _ in range(args.export_clients)]
+    await asyncio.gather(*tasks)
+
+    fps = np.array([v['frames'] / args.duration for v in viewers]) if viewers else np.zeros(1)
+    first = [v['first_frame'] for v in viewers if v['first_frame'] is not None]
+    lat = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        'viewers': args.viewers,
+        'api_clients': args.api_clients,
+        'duration_s': args.duration,
+        'viewers_with_frames': sum(1 for v in viewers if v['frames']),
+        'viewer_errors': [v['error'] for v in viewers if v['error']],
+        'viewer_fps': {'min': round(float(fps.min()), 2), 'median': round(float(np.median(fps)), 2),
+                       'max': round(float(fps.max()), 2)},
+        'first_frame_s': {'median': round(float(np.median(first)), 3) if first else None,
+                          'max': round(float(max(first)), 3) if first else None},
+        'stream_mb': round(sum(v['bytes'] for v in viewers) / 1e6, 2),
+        'api_requests': len(latencies),
+        'api_rps': round(len(latencies) / args.duration, 1),
+        'api_errors': len(errors),
+        'api_latency_ms': {p: round(float(np.percentile(lat, q)), 2)
+                           for p, q in (('p50', 50), ('p95', 95), ('p99', 99), ('max', 100))},
+        'export_clients': args.export_clients,
+        'export_requests': exports['requests'],
+        'export_truncated': exports['truncated'],
+        'export_errors': len(exports['errors']),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='running server to test instead of starting asgi.py')
+    parser.add_argument('--video', help='recording to serve as the camera when starting the server')
+    parser.add_argument('--viewers', type=int, default=40)
+    parser.add_argument('--api-clients', type=int, default=8)
+    parser.add_argument('--api-paths', nargs='*', default=API_PATHS)
+    parser.add_argument('--export-clients', type=int, default=4, help='clients downloading the streamed exports')
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--stream-query', default='', help='stream settings, e.g. "width=320&quality=60&fps=10"')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        if not args.video:
+            parser.error('--video is required unless --url is given')
+        host, port = '127.0.0.1', free_port()
+        env = dict(os.environ, VIDEO_SOURCE=args.video)
+        server = subprocess.Popen([sys.executable, 'asgi.py', '--host', host, '--port', str(port)], env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not asyncio.run(wait_until_ready(host, port)):
+            sys.exit(f"server at {host}:{port} did not become ready")
+        results = asyncio.run(run_load(host, port, args))
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(15)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    fps, lat = results['viewer_fps'], results['api_latency_ms']
+    print(f"{results['viewers_with_frames']}/{args.viewers} viewers received frames, "
+          f"fps min/median/max {fps['min']}/{fps['median']}/{fps['max']}, "
+          f"first frame median {results['first_frame_s']['median']}s")
+    print(f"API: {results['api_requests']} requests ({results['api_rps']}/s), {results['api_errors']} errors, "
+          f"latency p50 {lat['p50']}ms p95 {lat['p95']}ms p99 {lat['p99']}ms")
+    if args.export_clients:
+        print(f"Exports: {results['export_requests']} downloads, {results['export_truncated']} truncated, "
+              f"{results['export_errors']} errors")
+    if results['viewer_errors']:
+        print(f"viewer errors: {results['viewer_errors'][:5]}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
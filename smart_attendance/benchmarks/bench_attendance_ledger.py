@@ -0,0 +1,103 @@
+"""Attendance mark latency against a large historical ledger.
+
+Writes a synthetic attendance.csv with --rows historical rows, then times
+AttendanceLedger startup and individual marks. Pass --legacy to also time
+the old pandas read/filter/concat/rewrite path on the same file. Run from
+smart_attendance:
+
+    python -m benchmarks.bench_attendance_ledger --rows 1000000
+"""
+import argparse
+import csv
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from storage.attendance_ledger import FIELDS, AttendanceLedger
+
+
+def write_history(path, rows, students=2000):
+    """Chronological rows ending yesterday, one per student per day"""
+    days = rows // students + 1
+    start = datetime.now() - timedelta(days=days)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        written = 0
+        for day in range(days):
+            date = (start + timedelta(days=day)).strftime("%Y-%m-%d")
+            for student in range(min(students, rows - written)):
+                writer.writerow([f"student_{student}", date, "09:00:00", "Present"])
+            written += students
+            if written >= rows:
+                break
+
+
+def legacy_mark(path, name):
+    import pandas as pd
+    df = pd.read_csv(path)
+    now = datetime.now()
+    date, clock = now.strftime("%Y-%m-%d"), now.strftime("%H:%M:%S")
+    if len(df[(df['Name'] == name) & (df['Date'] == date)]) > 0:
+        return False
+    df = pd.concat([df, pd.DataFrame({'Name': [name], 'Date': [date], 'Time': [clock],
+                                      'Status': ['Present']})], ignore_index=True)
+    df.to_csv(path, index=False)
+    return True
+
+
+def summarize(label, latencies):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<22}{statistics.median(latencies) * 1000:>12.3f}{p99 * 1000:>12.3f}{len(latencies):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--marks', type=int, default=500)
+    parser.add_argument('--legacy', action='store_true', help='also time the pandas rewrite path')
+    parser.add_argument('--no-fsync', action='store_true')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='ledger-bench-')
+    try:
+        path = os.path.join(workdir, 'attendance.csv')
+        write_history(path, args.rows)
+        print(f"history: {args.rows} rows, {os.path.getsize(path) / 1e6:.1f} MB")
+
+        start = time.perf_counter()
+        ledger = AttendanceLedger(path, durable=not args.no_fsync)
+        print(f"ledger startup: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        print(f"{'path':<22}{'p50 ms':>12}{'p99 ms':>12}{'marks':>8}")
+        latencies = []
+        for i in range(args.marks):
+            start = time.perf_counter()
+            ledger.mark(f"visitor_{i}")
+            latencies.append(time.perf_counter() - start)
+        summarize('ledger mark', latencies)
+
+        latencies = []
+        for i in range(args.marks):
+            start = time.perf_counter()
+            ledger.mark(f"visitor_{i}")
+            latencies.append(time.perf_counter() - start)
+        summarize('ledger duplicate', latencies)
+
+        if args.legacy:
+            latencies = []
+            for i in range(min(args.marks, 5)):
+                start = time.perf_counter()
+                legacy_mark(path, f"legacy_{i}")
+                latencies.append(time.perf_counter() - start)
+            summarize('pandas rewrite', latencies)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
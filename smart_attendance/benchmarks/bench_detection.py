@@ -0,0 +1,66 @@
+"""Latency and detection rate of each face detection scheduling policy.
+
+Replays a recorded video through DetectionScheduler under the 'fixed',
+'adaptive' and 'roi' policies. For every policy it reports ms per frame,
+pixels handed to HOG, the share of frames with a face, and recall against
+a reference pass of full-resolution HOG on every frame. Run from
+smart_attendance:
+
+    python -m benchmarks.bench_detection --video entrance.mp4
+"""
+import argparse
+import time
+
+import cv2
+import face_recognition
+
+from models.detection_scheduler import POLICIES, DetectionScheduler
+from models.face_tracker import box_iou
+from streaming.camera_sources import read_frames
+
+
+def reference_boxes(frames):
+    return [face_recognition.face_locations(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)) for frame in frames]
+
+
+def recall(found, reference):
+    hits = total = 0
+    for boxes, truth in zip(found, reference):
+        total += len(truth)
+        hits += sum(any(box_iou(t, b) >= 0.3 for b in boxes) for t in truth)
+    return hits / total if total else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--video', required=True)
+    parser.add_argument('--max-frames', type=int, default=300)
+    parser.add_argument('--policies', nargs='*', default=list(POLICIES), choices=POLICIES)
+    parser.add_argument('--no-reference', action='store_true', help='skip the full-resolution recall pass')
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.max_frames)
+    if not frames:
+        parser.error(f"could not read frames from {args.video}")
+
+    reference = None if args.no_reference else reference_boxes(frames)
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]} from {args.video}")
+    print(f"{'policy':<10}{'ms/frame':>10}{'Mpx/frame':>11}{'full':>7}{'roi':>7}{'hit rate':>10}{'recall':>8}")
+
+    for policy in args.policies:
+        scheduler = DetectionScheduler(policy=policy)
+        found = []
+        start = time.perf_counter()
+        for frame in frames:
+            found.append(scheduler.detect(frame))
+        elapsed = (time.perf_counter() - start) / len(frames) * 1000.0
+
+        counters = scheduler.counters
+        hit_rate = sum(1 for boxes in found if boxes) / len(frames)
+        policy_recall = recall(found, reference) if reference is not None else float('nan')
+        print(f"{policy:<10}{elapsed:>10.2f}{counters['pixels'] / len(frames) / 1e6:>11.3f}"
+              f"{counters['full_scans']:>7}{counters['roi_scans']:>7}{hit_rate:>10.1%}{policy_recall:>8.1%}")
+
+
+if __name__ == '__main__':
+    main()
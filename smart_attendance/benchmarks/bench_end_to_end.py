@@ -0,0 +1,364 @@
+"""End-to-end benchmark of the recognition loop on recorded frames.
+
+Replays a video file or an image sequence (a directory or a glob) through
+the stages the live stream runs: frame preparation, face tracking and
+recognition, gesture detection, attendance confirmation, annotation and
+JPEG encoding. The loop runs once per synthetic gallery size, with a face
+from the recording enrolled next to the synthetic identities so
+recognition and the attendance trigger make real decisions.
+
+Each gallery size gets two passes:
+
+  replay  frames processed one after another, in order. Per-stage latency,
+          end-to-end FPS, and every recognition, gesture and attendance
+          decision, summarised with a digest that only changes when the
+          decisions do.
+  stream  the threaded pipeline and frame hub behind /video_feed, read by
+          one viewer for --stream-seconds. Reports the frame rate the
+          viewer received and the pipeline's own stage stats.
+
+Frames are replayed as fast as possible unless --realtime paces them to
+the recording's frame rate like a camera. Results are printed and, with
+--json, written as JSON that --compare can diff against a run from
+another commit. Run from smart_attendance:
+
+    python -m benchmarks.bench_end_to_end --source entrance.mp4
+    python -m benchmarks.bench_end_to_end --source 'frames/*.png' --fps 15 --json e2e.json
+    python -m benchmarks.bench_end_to_end --source entrance.mp4 --galleries 100 --realtime --stream-seconds 30
+    python -m benchmarks.bench_end_to_end --source entrance.mp4 --json new.json --compare base.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+
+import cv2
+import face_recognition
+import numpy as np
+
+from benchmarks.bench_face_index import synthetic_gallery
+from models.face_recognizer import FaceRecognizer
+from models.face_tracker import FaceTracker
+from models.gesture_recognizer import GestureRecognizer
+from monitoring.metrics import Histogram, metrics
+from streaming.attendance_trigger import AttendanceTrigger
+from streaming.camera_sources import open_source
+from streaming.frame_encoder import JpegEncoder, StreamProfile
+from streaming.frame_hub import FrameHub
+from streaming.frame_pipeline import FramePipeline
+from streaming.frame_scheduler import FrameScheduler
+
+GALLERY_SIZES = [100, 10000, 100000]
+REPLAY_STAGES = ('capture', 'prepare', 'faces', 'hands', 'decision', 'render', 'encode', 'frame')
+SUBJECT = 'subject'
+
+
+def git_revision():
+    """Commit of the working tree, suffixed with -dirty if it has changes"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty else '')
+
+
+def environment():
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'numpy': np.__version__, 'opencv': cv2.__version__}
+
+
+def find_subject(args):
+    """Encoding of the first face in the recording, or None"""
+    capture = open_source(args.source, loop=False, realtime=False, fps=args.fps)
+    try:
+        for _ in range(args.enroll_frames):
+            success, frame = capture.read()
+            if not success:
+                break
+            encodings = face_recognition.face_encodings(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            if encodings:
+                return encodings[0]
+    finally:
+        capture.release()
+    return None
+
+
+def build_recognizer(workdir, identities, samples, subject):
+    """Recognizer over a throwaway store holding synthetic identities plus the subject"""
+    recognizer = FaceRecognizer(store_path=os.path.join(workdir, 'faces.emb'),
+                                archive_path=os.path.join(workdir, 'faces_archive.emb'),
+                                legacy_path=os.path.join(workdir, 'face_encodings.pkl'), read_only=True)
+    _, encodings, labels = synthetic_gallery(identities, samples)
+    started = time.perf_counter()
+    recognizer.gallery.add(encodings, [f"student_{label}" for label in labels])
+    if subject is not None:
+        recognizer.gallery.add(subject, [SUBJECT])
+    # The first match builds whatever the index still builds lazily
+    recognizer.gallery.match(np.zeros((1, recognizer.gallery.dim), dtype=np.float32))
+    return recognizer, time.perf_counter() - started
+
+
+def build_loop(recognizer, args, clock=time.monotonic):
+    """Tracker, scheduler and trigger configured like the live pipeline"""
+    tracker = FaceTracker(recognizer)
+    scheduler = FrameScheduler(tracker, GestureRecognizer(), gesture_policy=args.gesture_policy,
+                               gesture_every=args.gesture_every)
+    marks = []
+
+    def mark(name):
+        marks.append(name)
+        return True, f"Attendance marked for {name}"
+
+    trigger = AttendanceTrigger(mark, confirm_frames=args.confirm_frames, clock=clock)
+    return scheduler, trigger, marks
+
+
+def annotate(image, face, gesture, scale=1.0):
+    """Boxes, names and the gesture label, roughly what the live stream draws"""
+    for box, name in zip(face['locations'], face['names']):
+        top, right, bottom, left = (int(v * scale) for v in box)
+        cv2.rectangle(image, (left, top), (right, bottom), (0, 255, 0), 2)
+        cv2.putText(image, name, (left, max(0, top - 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.9 * scale, (0, 255, 0), 2)
+    if gesture['gesture']:
+        cv2.putText(image, f"Gesture: {gesture['gesture']}", (50, 100), cv2.FONT_HERSHEY_SIMPLEX,
+                    0.7 * scale, (255, 0, 0), 2)
+    return image
+
+
+def replay(recognizer, args, encoder, fps):
+    """Process every frame of the recording in order, timing each stage"""
+    frame_index = [0]
+    # Trigger time follows the recording, so cooldowns do not depend on machine speed
+    scheduler, trigger, marks = build_loop(recognizer, args, clock=lambda: frame_index[0] / fps)
+    stages = {stage: Histogram() for stage in REPLAY_STAGES}
+    names_seen, gestures_seen = Counter(), Counter()
+    decisions = hashlib.sha1()
+    mark_frames = []
+    faces = frames_with_faces = gesture_runs = 0
+
+    capture = open_source(args.source, loop=False, realtime=args.realtime, fps=args.fps)
+    started = time.perf_counter()
+    try:
+        while not args.max_frames or frame_index[0] < args.max_frames:
+            t0 = time.perf_counter()
+            success, image = capture.read()
+            if not success:
+                break
+            t1 = time.perf_counter()
+            frame = scheduler.prepare(image)
+            t2 = time.perf_counter()
+            locations, names, track_ids = scheduler.faces(frame)
+            face = {'locations': locations, 'names': names, 'track_ids': track_ids}
+            t3 = time.perf_counter()
+            gesture = scheduler.hands(frame)
+            t4 = time.perf_counter()
+            marked_before = len(marks)
+            trigger.update(face, gesture, today='replay')
+            t5 = time.perf_counter()
+            output = annotate(image.copy(), face, gesture)
+            t6 = time.perf_counter()
+            encoder.encode(output, args.quality)
+            t7 = time.perf_counter()
+
+            for stage, (begin, end) in zip(REPLAY_STAGES, [(t0, t1), (t1, t2), (t2, t3), (t3, t4), (t4, t5),
+                                                           (t5, t6), (t6, t7), (t0, t7)]):
+                stages[stage].observe(end - begin)
+
+            faces += len(names)
+            frames_with_faces += bool(names)
+            names_seen.update(names)
+            if gesture['fresh'] and gesture['landmarks']:
+                gesture_runs += 1
+                gestures_seen.update(g or 'none' for g in gesture['gestures'])
+            for name in marks[marked_before:]:
+                mark_frames.append({'frame': frame_index[0], 'name': name})
+            decisions.update(repr((sorted(names), gesture['gesture'] if gesture['fresh'] else '-',
+                                   marks[marked_before:])).encode())
+            frame_index[0] += 1
+    finally:
+        capture.release()
+    elapsed = time.perf_counter() - started
+    frames = frame_index[0]
+
+    return {
+        'frames': frames,
+        'wall_s': round(elapsed, 3),
+        'fps': round(frames / elapsed, 2) if elapsed else 0.0,
+        'stages': {stage: histogram.summary() for stage, histogram in stages.items()},
+        'decisions': {
+            'digest': decisions.hexdigest(),
+            'frames_with_faces': frames_with_faces,
+            'faces': faces,
+            'names': dict(names_seen.most_common()),
+            'synthetic_matches': sum(count for name, count in names_seen.items() if name.startswith('student_')),
+            'gesture_results': gesture_runs,
+            'gestures': dict(gestures_seen.most_common()),
+            'marks': mark_frames,
+        },
+        'scheduler': scheduler.report(),
+        'trigger': trigger.report(),
+    }
+
+
+def stream(recognizer, args):
+    """Run the threaded pipeline and frame hub and read one viewer's stream"""
+    scheduler, trigger, marks = build_loop(recognizer, args)
+
+    def face_stage(frame):
+        locations, names, track_ids = scheduler.faces(frame)
+        return {'locations': locations, 'names': names, 'track_ids': track_ids}
+
+    def ready(face, gesture):
+        return face is not None and gesture is not None and face.value is not None and gesture.value is not None
+
+    def render(image, face, gesture, status, scale):
+        return annotate(image, face.value, gesture.value, scale) if ready(face, gesture) else image
+
+    def decide(face, gesture):
+        if ready(face, gesture):
+            trigger.update(face.value, gesture.value, today='stream')
+
+    def create_pipeline():
+        return FramePipeline(lambda: open_source(args.source, loop=True, realtime=args.realtime, fps=args.fps),
+                             face_stage, scheduler.hands, render, on_results=decide, prepare=scheduler.prepare)
+
+    hub = FrameHub(create_pipeline, linger=0)
+    profile = StreamProfile(width=args.stream_width, quality=args.quality, max_fps=None, adaptive=False)
+    frames, first_frame = 0, None
+    started = time.monotonic()
+    stop_at = started + args.stream_seconds
+    for _ in hub.stream(profile):
+        frames += 1
+        if first_frame is None:
+            first_frame = time.monotonic() - started
+        if time.monotonic() >= stop_at:
+            break
+    elapsed = time.monotonic() - started
+    pipeline = hub.pipeline.report() if hub.pipeline is not None else {}
+    return {
+        'seconds': round(elapsed, 2),
+        'frames': frames,
+        'fps': round(frames / elapsed, 2) if elapsed else 0.0,
+        'first_frame_s': round(first_frame, 3) if first_frame is not None else None,
+        'pipeline': pipeline,
+        'marks': len(marks),
+        'trigger': trigger.report(),
+    }
+
+
+def print_run(run):
+    replayed = run['replay']
+    print(f"\ngallery {run['identities']} identities ({run['encodings']} encodings, {run['index']} index), "
+          f"built in {run['gallery_build_s']}s")
+    print(f"  replay: {replayed['frames']} frames, {replayed['fps']} fps")
+    print(f"  {'stage':<16}{'avg ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for stage, summary in list(replayed['stages'].items()) + list(run['model_stages'].items()):
+        print(f"  {stage:<16}{summary['avg_ms']:>10.2f}{summary['p50_ms']:>10.2f}"
+              f"{summary['p95_ms']:>10.2f}{summary['max_ms']:>10.2f}")
+    decisions = replayed['decisions']
+    print(f"  faces in {decisions['frames_with_faces']} frames, names {decisions['names']}, "
+          f"gestures {decisions['gestures']}, marks {[(m['name'], m['frame']) for m in decisions['marks']]}")
+    print(f"  decision digest {decisions['digest'][:12]}")
+    if 'stream' in run:
+        streamed = run['stream']
+        print(f"  stream: {streamed['frames']} frames in {streamed['seconds']}s, {streamed['fps']} fps, "
+              f"first frame {streamed['first_frame_s']}s, {streamed['marks']} marks")
+
+
+def compare(base, current):
+    """Print FPS and latency changes per gallery size and flag changed decisions"""
+    base_runs = {run['identities']: run for run in base['runs']}
+    print(f"\ncompared with {base.get('commit') or 'baseline'} ({base.get('created')})")
+    for run in current['runs']:
+        old = base_runs.get(run['identities'])
+        if old is None:
+            print(f"  {run['identities']} identities: not in the baseline")
+            continue
+        old_fps, new_fps = old['replay']['fps'], run['replay']['fps']
+        change = f"{(new_fps / old_fps - 1) * 100:+.1f}%" if old_fps else 'n/a'
+        print(f"  {run['identities']} identities: replay fps {old_fps} -> {new_fps} ({change})")
+        for stage, summary in run['replay']['stages'].items():
+            previous = old['replay']['stages'].get(stage)
+            if previous:
+                print(f"    {stage:<12} p50 {previous['p50_ms']:>8.2f} -> {summary['p50_ms']:>8.2f} ms")
+        same = old['replay']['decisions']['digest'] == run['replay']['decisions']['digest']
+        print(f"    decisions {'unchanged' if same else 'CHANGED'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', required=True, help='video file, image directory or image glob')
+    parser.add_argument('--fps', type=float, help='replay rate (default: the video\'s own, 25 for images)')
+    parser.add_argument('--realtime', action='store_true', help='pace frames like a camera instead of max speed')
+    parser.add_argument('--max-frames', type=int, default=0, help='stop the replay after this many frames')
+    parser.add_argument('--galleries', type=int, nargs='*', default=GALLERY_SIZES, help='synthetic identities')
+    parser.add_argument('--samples', type=int, default=3, help='encodings per synthetic identity')
+    parser.add_argument('--no-enroll', action='store_true', help='do not enroll a face from the recording')
+    parser.add_argument('--enroll-frames', type=int, default=300, help='frames searched for a face to enroll')
+    parser.add_argument('--gesture-policy', default='roi')
+    parser.add_argument('--gesture-every', type=int, default=2)
+    parser.add_argument('--confirm-frames', type=int, default=4)
+    parser.add_argument('--quality', type=int, default=80, help='JPEG quality of the encoded output')
+    parser.add_argument('--encoder', default='auto', help='JPEG encoder: auto, opencv or turbojpeg')
+    parser.add_argument('--stream-seconds', type=float, default=10.0, help='threaded stream pass, 0 to skip')
+    parser.add_argument('--stream-width', type=int, help='output width of the stream pass')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='results JSON of an earlier run to compare with')
+    args = parser.parse_args()
+
+    probe = open_source(args.source, loop=False, realtime=False, fps=args.fps)
+    if not probe.isOpened():
+        parser.error(f"could not open {args.source}")
+    fps = probe.fps
+    probe.release()
+
+    subject = None
+    if not args.no_enroll:
+        subject = find_subject(args)
+        if subject is None:
+            print(f"No face found in the first {args.enroll_frames} frames; running without an enrolled subject")
+
+    encoder = JpegEncoder(args.encoder)
+    results = {'benchmark': 'end_to_end', 'created': datetime.now().isoformat(timespec='seconds'),
+               'commit': git_revision(), 'environment': environment(),
+               'settings': {k: v for k, v in vars(args).items() if k not in ('json', 'compare')},
+               'replay_fps': fps, 'encoder': encoder.backend, 'subject_enrolled': subject is not None,
+               'runs': []}
+    print(f"{args.source} at {fps:g} fps, {'realtime' if args.realtime else 'as fast as possible'}, "
+          f"commit {results['commit']}")
+
+    for identities in args.galleries:
+        with tempfile.TemporaryDirectory() as workdir:
+            recognizer, build_time = build_recognizer(workdir, identities, args.samples, subject)
+            run = {'identities': identities, 'encodings': len(recognizer.gallery),
+                   'index': type(recognizer.gallery.index).__name__, 'gallery_build_s': round(build_time, 3)}
+            metrics.reset()
+            run['replay'] = replay(recognizer, args, encoder, fps)
+            # Model calls inside the stages, from the process-wide registry
+            run['model_stages'] = metrics.snapshot()['stages']
+            run['counters'] = metrics.snapshot()['counters']
+            if args.stream_seconds > 0:
+                run['stream'] = stream(recognizer, args)
+            results['runs'].append(run)
+            print_run(run)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nwrote {args.json}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
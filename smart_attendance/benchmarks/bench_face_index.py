@@ -0,0 +1,84 @@
+"""Recall/latency benchmark of the IVF face index against exact search.
+
+Run from the smart_attendance directory:
+
+    python -m benchmarks.bench_face_index --identities 10000 --samples 5
+"""
+import argparse
+import time
+
+import numpy as np
+
+from models.face_gallery import FaceGallery
+
+
+def synthetic_gallery(identities, samples, dim=128, seed=0):
+    """Clustered 128-d embeddings shaped like dlib encodings.
+
+    Identity centres sit roughly 1.0 apart and samples lie about 0.2 from
+    their centre, matching the usual same/different person distances.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0.0, 0.0625, size=(identities, dim)).astype(np.float32)
+    labels = np.repeat(np.arange(identities), samples)
+    encodings = centers[labels] + rng.normal(0.0, 0.018, size=(len(labels), dim)).astype(np.float32)
+    return centers, encodings, labels
+
+
+def synthetic_queries(centers, count, seed=1):
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, len(centers), size=count)
+    queries = centers[labels] + rng.normal(0.0, 0.018, size=(count, centers.shape[1])).astype(np.float32)
+    return queries, labels
+
+
+def build(kind, encodings, names):
+    gallery = FaceGallery(index=kind)
+    start = time.perf_counter()
+    gallery.add(encodings, names)
+    return gallery, time.perf_counter() - start
+
+
+def time_matches(gallery, queries, batch):
+    results = []
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch):
+        results.extend(gallery.match(queries[i:i + batch]).names)
+    elapsed = time.perf_counter() - start
+    return results, elapsed / len(queries) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--identities', type=int, default=10000)
+    parser.add_argument('--samples', type=int, default=5, help='encodings per identity')
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--batch', type=int, default=4, help='faces matched per call, like one frame')
+    parser.add_argument('--n-probe', type=int, nargs='*', default=None,
+                        help='IVF probe counts to sweep (default: index default)')
+    args = parser.parse_args()
+
+    centers, encodings, labels = synthetic_gallery(args.identities, args.samples)
+    names = [f"student_{label}" for label in labels]
+    queries, query_labels = synthetic_queries(centers, args.queries)
+    truth = [f"student_{label}" for label in query_labels]
+
+    exact, exact_build = build('exact', encodings, names)
+    exact_names, exact_ms = time_matches(exact, queries, args.batch)
+    print(f"gallery: {len(exact)} encodings, {args.identities} identities, {args.queries} queries")
+    print(f"{'index':<14}{'build s':>10}{'ms/face':>10}{'recall@1':>10}{'accuracy':>10}")
+    print(f"{'exact':<14}{exact_build:>10.3f}{exact_ms:>10.3f}{1.0:>10.3f}"
+          f"{np.mean([a == b for a, b in zip(exact_names, truth)]):>10.3f}")
+
+    ivf, ivf_build = build('ivf', encodings, names)
+    for n_probe in args.n_probe or [ivf.index.n_probe]:
+        ivf.index.n_probe = min(n_probe, ivf.index.n_lists)
+        ivf_names, ivf_ms = time_matches(ivf, queries, args.batch)
+        recall = np.mean([a == b for a, b in zip(ivf_names, exact_names)])
+        accuracy = np.mean([a == b for a, b in zip(ivf_names, truth)])
+        label = f"ivf/{ivf.index.n_probe}of{ivf.index.n_lists}"
+        print(f"{label:<14}{ivf_build:>10.3f}{ivf_ms:>10.3f}{recall:>10.3f}{accuracy:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Cost of saving the face store when registrations complete.
+
+Seeds a store with --identities synthetic identities (--samples rows each),
+then runs --registrations registrations the way the app does: each sample
+is saved as it arrives, then the identity is compacted and saved. Times
+the save after each compaction, which tombstones the student's old rows
+and appends the prototypes, against rewriting the whole store, which is
+what every completed registration used to cost. Also reports the startup
+load (store opened and attached to a gallery, without reading embeddings)
+with the tombstoned rows still in the file and after compact_store().
+Run from smart_attendance:
+
+    python -m benchmarks.bench_face_store --identities 10000 --samples 4
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_face_index import synthetic_gallery
+from models.face_gallery import FaceGallery
+from models.face_recognizer import FaceRecognizer
+from models.face_store import FaceStore
+
+
+def file_mb(store):
+    paths = (store.path, store.names_path, store.removed_path)
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path)) / (1024 * 1024)
+
+
+def load_ms(path):
+    """Store load as FaceRecognizer does it at startup"""
+    started = time.perf_counter()
+    encodings, names, _, live = FaceStore(path).load_rows()
+    FaceGallery().attach(encodings, names, live)
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--identities', type=int, default=10000)
+    parser.add_argument('--samples', type=int, default=4, help='stored rows per seeded identity')
+    parser.add_argument('--registrations', type=int, default=20)
+    parser.add_argument('--registration-samples', type=int, default=10)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='bench_face_store_')
+    try:
+        paths = dict(store_path=os.path.join(directory, 'faces.emb'),
+                     archive_path=os.path.join(directory, 'faces_archive.emb'),
+                     legacy_path=os.path.join(directory, 'face_encodings.pkl'))
+        per_identity = max(args.samples, args.registration_samples)
+        _, encodings, labels = synthetic_gallery(args.identities + args.registrations, per_identity)
+        seeded = (labels < args.identities) & (np.arange(len(labels)) % per_identity < args.samples)
+        FaceStore(paths['store_path']).rewrite(encodings[seeded], [f"student_{label}" for label in labels[seeded]])
+
+        recognizer = FaceRecognizer(**paths)
+        appends, saves, rewrites = [], [], []
+        quiet = contextlib.redirect_stdout(io.StringIO())
+        for registration in range(args.registrations):
+            label = args.identities + registration
+            name = f"student_{label}"
+            with quiet:
+                for encoding in encodings[labels == label][:args.registration_samples]:
+                    started = time.perf_counter()
+                    recognizer.add_encoding(encoding, name)
+                    recognizer.save_known_faces()
+                    appends.append((time.perf_counter() - started) * 1000)
+
+                recognizer.compact_identity(name)
+                started = time.perf_counter()
+                recognizer.save_known_faces()
+                saves.append((time.perf_counter() - started) * 1000)
+
+            # The old path: every completed registration rewrote the store
+            names = recognizer.gallery.names
+            scratch = FaceStore(os.path.join(directory, 'rewrite.emb'))
+            started = time.perf_counter()
+            scratch.rewrite(recognizer.gallery.encodings, names)
+            rewrites.append((time.perf_counter() - started) * 1000)
+
+        rows, _, _ = recognizer.store.version()
+        live = len(recognizer.gallery)
+        print(f"store: {live} live rows, {rows - live} removed rows, {file_mb(recognizer.store):.1f} MB")
+        print(f"{'save':<32}{'median ms':>12}{'max ms':>10}")
+        for label, timings in (('sample append', appends), ('compaction save (tombstones)', saves),
+                               ('full rewrite', rewrites)):
+            print(f"{label:<32}{statistics.median(timings):>12.2f}{max(timings):>10.2f}")
+
+        tombstoned = load_ms(paths['store_path'])
+        started = time.perf_counter()
+        recognizer.compact_store()
+        compact = (time.perf_counter() - started) * 1000
+        print(f"load with removed rows {tombstoned:.1f} ms; compact_store {compact:.1f} ms "
+              f"-> {file_mb(recognizer.store):.1f} MB; load after {load_ms(paths['store_path']):.1f} ms")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
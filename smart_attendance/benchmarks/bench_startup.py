@@ -0,0 +1,150 @@
+"""Startup time and memory of the app, cold versus warmed up.
+
+Each scenario runs in a fresh Python process started from smart_attendance
+(so it uses the real data/ directory, like starting the server would):
+
+  light        import app, then serve /api/students. This is what tests,
+               CLI commands and API-only workers pay; no model should load.
+  first-frame  import app, then run the face and gesture stages on one
+               frame; the models load on demand inside that first frame.
+  warm         import app and start the background warm-up, serve
+               /api/students while it runs, wait for the models, then run
+               the first frame.
+
+Reports time (seconds / ms), resident memory after each step and which
+heavy modules were imported, as the median of --runs processes. Run from
+smart_attendance:
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --image data/face_images/alice_0.jpg --runs 5 --json startup.json
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+SCENARIOS = ('light', 'first-frame', 'warm')
+HEAVY_MODULES = ('face_recognition', 'dlib', 'mediapipe', 'pandas', 'cv2', 'numpy')
+RESULT_PREFIX = 'RESULT '
+
+
+def rss_mb():
+    """Current resident set size, or the peak where /proc is not available"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def child(scenario, image_path):
+    """Run one scenario in this process and print its measurements"""
+    result = {'scenario': scenario, 'rss_start_mb': rss_mb()}
+    started = time.perf_counter()
+    import app
+    result['import_s'] = round(time.perf_counter() - started, 3)
+    result['rss_import_mb'] = rss_mb()
+    client = app.app.test_client()
+
+    def request_ms(path):
+        started = time.perf_counter()
+        status = client.get(path).status_code
+        if status != 200:
+            raise RuntimeError(f"{path} returned {status}")
+        return round((time.perf_counter() - started) * 1000, 2)
+
+    def frame_ms():
+        import cv2
+        import numpy as np
+        image = cv2.imread(image_path) if image_path else None
+        if image is None:
+            image = np.full((480, 640, 3), 127, dtype=np.uint8)
+        started = time.perf_counter()
+        frame = app.frame_scheduler.prepare(image)
+        app.face_stage(frame)
+        app.gesture_stage(frame)
+        return round((time.perf_counter() - started) * 1000, 2)
+
+    if scenario == 'light':
+        result['first_request_ms'] = request_ms('/api/students')
+        result['request_ms'] = request_ms('/api/students')
+    elif scenario == 'first-frame':
+        result['first_frame_ms'] = frame_ms()
+        result['frame_ms'] = frame_ms()
+    else:
+        warm_started = time.perf_counter()
+        thread = app.warm_up(app.vision_models)
+        result['request_during_warm_up_ms'] = request_ms('/api/students')
+        thread.join()
+        result['warm_up_s'] = round(time.perf_counter() - warm_started, 3)
+        result['first_frame_ms'] = frame_ms()
+    result['rss_end_mb'] = rss_mb()
+    result['models_loaded'] = [model.name for model in app.vision_models if model.loaded]
+    result['modules'] = [name for name in HEAVY_MODULES if name in sys.modules]
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+
+
+def run_scenario(scenario, image_path):
+    command = [sys.executable, '-m', 'benchmarks.bench_startup', '--child', scenario]
+    if image_path:
+        command += ['--image', image_path]
+    started = time.perf_counter()
+    completed = subprocess.run(command, capture_output=True, text=True, env=dict(os.environ, MODEL_WARMUP='0'))
+    wall = time.perf_counter() - started
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            result = json.loads(line[len(RESULT_PREFIX):])
+            result['process_s'] = round(wall, 3)
+            return result
+    raise RuntimeError(f"{scenario} run failed:\n{completed.stderr[-2000:]}")
+
+
+def median_of(runs):
+    """Median of every numeric field across runs; other fields from the first run"""
+    summary = dict(runs[0])
+    for key, value in runs[0].items():
+        if isinstance(value, (int, float)):
+            summary[key] = round(statistics.median(run[key] for run in runs), 3)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='*', default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--image', help='frame for the first-frame step (default: a blank frame)')
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--child', choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.image)
+        return
+
+    results = {}
+    for scenario in args.scenarios:
+        results[scenario] = median_of([run_scenario(scenario, args.image) for _ in range(args.runs)])
+
+    print(f"median of {args.runs} runs")
+    for scenario, result in results.items():
+        timings = ', '.join(f"{key} {value}" for key, value in result.items()
+                            if key.endswith(('_s', '_ms')))
+        print(f"{scenario:<12} {timings}")
+        print(f"{'':<12} rss MB: start {result['rss_start_mb']}, after import {result['rss_import_mb']}, "
+              f"end {result['rss_end_mb']}; models loaded {result['models_loaded'] or 'none'}; "
+              f"modules {', '.join(result['modules'])}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
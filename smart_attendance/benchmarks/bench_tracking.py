@@ -0,0 +1,74 @@
+"""Per-frame cost of full recognition versus track-then-recognize.
+
+Replays a recorded video (e.g. a steady-state classroom entrance) through
+FaceRecognizer.recognize_face and through FaceTracker.update and reports
+wall and CPU time per frame, detector and encoder calls, and how often the
+two modes agree on the names in a frame. Run from smart_attendance:
+
+    python -m benchmarks.bench_tracking --video entrance.mp4
+"""
+import argparse
+import time
+
+import cv2
+import face_recognition
+
+from models.face_recognizer import FaceRecognizer
+from models.face_tracker import FaceTracker
+from streaming.camera_sources import read_frames
+
+
+def enroll_first_face(recognizer, frames):
+    """Give an empty gallery one identity so recognition does real work"""
+    for frame in frames:
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        encodings = face_recognition.face_encodings(rgb)
+        if encodings:
+            recognizer.gallery.add(encodings[0], ['subject'])
+            return True
+    return False
+
+
+def run(frames, process):
+    names = []
+    wall, cpu = time.perf_counter(), time.process_time()
+    for frame in frames:
+        names.append(sorted(process(frame)[1]))
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    return names, wall / len(frames) * 1000.0, cpu / len(frames) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--video', required=True)
+    parser.add_argument('--max-frames', type=int, default=600)
+    parser.add_argument('--detect-every', type=int, default=5)
+    parser.add_argument('--reencode-every', type=int, default=30)
+    parser.add_argument('--gallery', default='data/faces.emb')
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.max_frames)
+    if not frames:
+        parser.error(f"could not read frames from {args.video}")
+
+    # Full-frame detection at a fixed scale on every frame, as before ROI scheduling
+    recognizer = FaceRecognizer(store_path=args.gallery, detection_policy='fixed')
+    if len(recognizer.gallery) == 0 and not enroll_first_face(recognizer, frames):
+        parser.error("gallery is empty and no face was found in the video to enroll")
+
+    full_names, full_ms, full_cpu = run(frames, recognizer.recognize_face)
+
+    tracker = FaceTracker(recognizer, detect_every=args.detect_every, reencode_every=args.reencode_every)
+    tracked_names, tracked_ms, tracked_cpu = run(frames, tracker.update)
+    agreement = sum(a == b for a, b in zip(full_names, tracked_names)) / len(frames)
+
+    print(f"{len(frames)} frames from {args.video}, gallery of {len(recognizer.gallery)} encodings")
+    print(f"{'mode':<10}{'wall ms':>10}{'cpu ms':>10}{'detects':>10}{'encodes':>10}")
+    print(f"{'full':<10}{full_ms:>10.2f}{full_cpu:>10.2f}{len(frames):>10}{'-':>10}")
+    print(f"{'tracked':<10}{tracked_ms:>10.2f}{tracked_cpu:>10.2f}"
+          f"{tracker.counters['detections']:>10}{tracker.counters['encodings']:>10}")
+    print(f"cpu reduction: {full_cpu / max(tracked_cpu, 1e-9):.1f}x, name agreement: {agreement:.1%}")
+
+
+if __name__ == '__main__':
+    main()
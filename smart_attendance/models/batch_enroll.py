@@ -0,0 +1,187 @@
+"""Bulk enrollment of face images into the face store.
+
+Encodes a directory tree of images across a process pool and writes the
+results to the face store in bulk. Two layouts are understood:
+
+    data/faces/<name>/*.jpg          (one folder per student)
+    data/face_images/<name>_<n>.jpg  (flat, as saved by online registration)
+
+Every processed image is recorded in a manifest once its encoding has been
+saved, so an interrupted run picks up where it stopped. Run from the
+smart_attendance directory while the web app is stopped:
+
+    python -m models.batch_enroll data/faces --workers 8
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import face_recognition
+import numpy as np
+
+from models.face_recognizer import FaceRecognizer
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+# Images between saves; bounds the work lost if a run dies without cleanup
+CHECKPOINT_EVERY = 200
+
+
+def find_images(root):
+    """(path, name) for every image, named by folder or by filename prefix"""
+    images = []
+    for directory, _, files in os.walk(root):
+        for filename in sorted(files):
+            if os.path.splitext(filename)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            path = os.path.join(directory, filename)
+            if os.path.abspath(directory) == os.path.abspath(root):
+                name = os.path.splitext(filename)[0].rsplit('_', 1)[0]
+            else:
+                name = os.path.basename(directory)
+            images.append((path, name))
+    return sorted(images)
+
+
+def encode_image(path, upsample=1):
+    """Worker: detect the largest face in an image and encode it"""
+    try:
+        image = face_recognition.load_image_file(path)
+        locations = face_recognition.face_locations(image, number_of_times_to_upsample=upsample)
+        if not locations:
+            return path, None, "no face found"
+        largest = max(locations, key=lambda box: (box[2] - box[0]) * (box[1] - box[3]))
+        encodings = face_recognition.face_encodings(image, [largest])
+        if not encodings:
+            return path, None, "face could not be encoded"
+        return path, np.asarray(encodings[0], dtype=np.float32), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def file_key(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def load_manifest(path):
+    """Images already handled by a previous run, keyed by path"""
+    done = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                done[entry['path']] = entry
+    return done
+
+
+def append_manifest(path, entries):
+    with open(path, 'a') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class BatchEnroller:
+    def __init__(self, recognizer, manifest_path, workers=None, upsample=1, checkpoint_every=CHECKPOINT_EVERY):
+        self.recognizer = recognizer
+        self.manifest_path = manifest_path
+        self.workers = workers
+        self.upsample = upsample
+        self.checkpoint_every = checkpoint_every
+        self.failures = []
+        self._pending = []
+
+    def _flush(self):
+        """Write pending encodings to the store in one append, then record them"""
+        if not self._pending:
+            return
+        encoded = [entry for entry in self._pending if entry['encoding'] is not None]
+        if encoded:
+            with self.recognizer.lock:
+                self.recognizer.gallery.add(np.stack([entry['encoding'] for entry in encoded]),
+                                            [entry['name'] for entry in encoded])
+                self.recognizer.save_known_faces()
+        append_manifest(self.manifest_path, [
+            {'path': entry['path'], 'key': entry['key'], 'name': entry['name'], 'error': entry['error']}
+            for entry in self._pending
+        ])
+        self._pending = []
+
+    def run(self, images, retry_failed=False):
+        done = load_manifest(self.manifest_path)
+        todo = [(path, name) for path, name in images
+                if path not in done or done[path]['key'] != file_key(path)
+                or (retry_failed and done[path]['error'])]
+        skipped = len(images) - len(todo)
+        print(f"{len(images)} images, {skipped} already enrolled, {len(todo)} to process")
+
+        names = dict(todo)
+        started = time.perf_counter()
+        enrolled = 0
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = [pool.submit(encode_image, path, self.upsample) for path, _ in todo]
+                try:
+                    for completed, future in enumerate(as_completed(futures), 1):
+                        path, encoding, error = future.result()
+                        self._pending.append({'path': path, 'key': file_key(path), 'name': names[path],
+                                              'encoding': encoding, 'error': error})
+                        if error:
+                            self.failures.append((path, error))
+                        else:
+                            enrolled += 1
+
+                        if completed % 50 == 0 or completed == len(todo):
+                            rate = completed / max(time.perf_counter() - started, 1e-9)
+                            print(f"[{completed}/{len(todo)}] {enrolled} encoded, "
+                                  f"{len(self.failures)} failed, {rate:.1f} images/s")
+                        if self.checkpoint_every and len(self._pending) >= self.checkpoint_every:
+                            self._flush()
+                finally:
+                    # On Ctrl-C or an error, do not wait for images still queued
+                    for future in futures:
+                        future.cancel()
+        finally:
+            # Whatever was encoded is saved and recorded, so a rerun resumes from here
+            self._flush()
+        return enrolled
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('root', nargs='?', default='data/faces', help='directory tree of face images')
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: CPU count)')
+    parser.add_argument('--upsample', type=int, default=1, help='HOG upsampling for small faces')
+    parser.add_argument('--manifest', default='data/enroll_manifest.jsonl')
+    parser.add_argument('--checkpoint-every', type=int, default=CHECKPOINT_EVERY,
+                        help='save every N images (0: only at the end)')
+    parser.add_argument('--retry-failed', action='store_true', help='reprocess images that failed before')
+    parser.add_argument('--compact', action='store_true', help='compact enrolled identities afterwards')
+    args = parser.parse_args()
+
+    images = find_images(args.root)
+    if not images:
+        parser.error(f"no images found under {args.root}")
+
+    recognizer = FaceRecognizer()
+    enroller = BatchEnroller(recognizer, args.manifest, args.workers, args.upsample, args.checkpoint_every)
+    enrolled = enroller.run(images, args.retry_failed)
+
+    if args.compact and enrolled:
+        for name in sorted({name for _, name in images}):
+            recognizer.compact_identity(name)
+        recognizer.save_known_faces()
+
+    for path, error in enroller.failures:
+        print(f"FAILED {path}: {error}")
+    print(f"Enrolled {enrolled} images, {len(enroller.failures)} failures")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+import time
+
+import cv2
+import face_recognition
+
+from models.face_tracker import box_iou
+from monitoring.metrics import metrics
+
+POLICIES = ('fixed', 'adaptive', 'roi')
+
+
+class DetectionScheduler:
+    """Decides where and at what resolution HOG face detection runs.
+
+    'fixed' reproduces the old behaviour: the whole frame at one scale.
+    'adaptive' picks the scale from recently observed face sizes so the
+    smallest face lands near `target_face_px` (HOG with one upsample finds
+    faces from about 40px), and alternates through `search_scales` while
+    no faces are known so distant faces are not missed.
+    'roi' is adaptive and, between full scans every `full_scan_every`
+    frames, only searches margins around recently seen faces.
+
+    Boxes are returned in full-frame (top, right, bottom, left) pixels.
+    Callers that already hold the frame in RGB can pass it as `rgb` so
+    regions are cut from it instead of being converted again.
+    """
+
+    def __init__(self, policy='roi', fixed_scale=0.25, target_face_px=64, min_scale=0.2, max_scale=1.0,
+                 search_scales=(0.25, 0.5), full_scan_every=15, roi_margin=0.6, max_age=15):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown detection policy: {policy}")
+        self.policy = policy
+        self.fixed_scale = fixed_scale
+        self.target_face_px = target_face_px
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.search_scales = search_scales
+        self.full_scan_every = full_scan_every
+        self.roi_margin = roi_margin
+        self.max_age = max_age
+
+        self.frame_index = 0
+        self.recent = []  # (box, frame_index last seen)
+        self._search_step = 0
+        self._force_full = True
+        self.counters = {'frames': 0, 'full_scans': 0, 'roi_scans': 0, 'pixels': 0, 'faces': 0}
+
+    def reset(self):
+        self.recent = []
+        self._force_full = True
+
+    def _clamp_scale(self, scale):
+        return max(self.min_scale, min(self.max_scale, scale))
+
+    def _scale_for(self, heights):
+        return self._clamp_scale(self.target_face_px / max(1, min(heights)))
+
+    def _detect_region(self, frame, top, left, bottom, right, scale, rgb=None):
+        region = (frame if rgb is None else rgb)[top:bottom, left:right]
+        if region.size == 0:
+            return []
+        if scale != 1.0:
+            region = cv2.resize(region, (0, 0), fx=scale, fy=scale)
+        rgb_region = cv2.cvtColor(region, cv2.COLOR_BGR2RGB) if rgb is None else region
+        self.counters['pixels'] += rgb_region.shape[0] * rgb_region.shape[1]
+
+        factor = 1.0 / scale
+        started_at = time.perf_counter()
+        locations = face_recognition.face_locations(rgb_region)
+        metrics.observe('face_locations', started_at)
+        return [(int(t * factor) + top, int(r * factor) + left, int(b * factor) + top, int(l * factor) + left)
+                for t, r, b, l in locations]
+
+    def _full_scan(self, frame, rgb=None):
+        height, width = frame.shape[:2]
+        if self.policy == 'fixed':
+            scale = self.fixed_scale
+        elif self.recent:
+            scale = self._scale_for([b - t for (t, _, b, _), _ in self.recent])
+        else:
+            scale = self.search_scales[self._search_step % len(self.search_scales)]
+            self._search_step += 1
+        self.counters['full_scans'] += 1
+        return self._detect_region(frame, 0, 0, height, width, scale, rgb)
+
+    def _roi_scan(self, frame, rgb=None):
+        height, width = frame.shape[:2]
+        boxes = []
+        lost = False
+        for (top, right, bottom, left), _ in self.recent:
+            pad_y = int((bottom - top) * self.roi_margin)
+            pad_x = int((right - left) * self.roi_margin)
+            found = self._detect_region(frame, max(0, top - pad_y), max(0, left - pad_x),
+                                        min(height, bottom + pad_y), min(width, right + pad_x),
+                                        self._scale_for([bottom - top]), rgb)
+            lost = lost or not found
+            boxes.extend(found)
+        self.counters['roi_scans'] += 1
+        # A face that left its region may have moved anywhere: rescan fully next time
+        self._force_full = lost
+        return boxes
+
+    def _dedupe(self, boxes):
+        kept = []
+        for box in sorted(boxes, key=lambda b: (b[2] - b[0]) * (b[1] - b[3]), reverse=True):
+            if all(box_iou(box, other) < 0.5 for other in kept):
+                kept.append(box)
+        return kept
+
+    def detect(self, frame, rgb=None):
+        """Face boxes for a BGR frame (and optionally its RGB copy) according to the policy"""
+        full = (self.policy != 'roi' or self._force_full or not self.recent
+                or self.frame_index % self.full_scan_every == 0)
+        if full:
+            self._force_full = False
+            boxes = self._full_scan(frame, rgb)
+        else:
+            boxes = self._roi_scan(frame, rgb)
+        boxes = self._dedupe(boxes)
+
+        # Remember where faces are so scale and regions follow them
+        self.recent = [(box, self.frame_index) for box in boxes] + [
+            (box, seen) for box, seen in self.recent
+            if self.frame_index - seen < self.max_age and all(box_iou(box, b) < 0.3 for b in boxes)
+        ]
+        if full:
+            # A full scan is authoritative about what is currently visible
+            self.recent = [(box, seen) for box, seen in self.recent if seen == self.frame_index]
+
+        self.frame_index += 1
+        self.counters['frames'] += 1
+        self.counters['faces'] += len(boxes)
+        return boxes
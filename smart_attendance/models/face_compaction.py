@@ -0,0 +1,61 @@
+import numpy as np
+
+
+def select_prototypes(samples, max_prototypes=3, coverage=0.3):
+    """Reduce one identity's samples to a centroid plus diverse prototypes.
+
+    Prototypes are picked by farthest-point sampling: each step keeps the
+    sample farthest from everything kept so far, stopping once every sample
+    lies within `coverage` of a kept encoding. Returns (kept, dropped_mask).
+    """
+    samples = np.asarray(samples, dtype=np.float32)
+    centroid = samples.mean(axis=0)
+    kept = [centroid]
+    chosen = np.zeros(len(samples), dtype=bool)
+    nearest = np.linalg.norm(samples - centroid, axis=1)
+
+    for _ in range(max_prototypes):
+        candidate = int(np.argmax(np.where(chosen, -np.inf, nearest)))
+        if chosen[candidate] or nearest[candidate] <= coverage:
+            break
+        chosen[candidate] = True
+        kept.append(samples[candidate])
+        nearest = np.minimum(nearest, np.linalg.norm(samples - samples[candidate], axis=1))
+
+    return np.stack(kept), ~chosen
+
+
+def compact_identity(gallery, name, max_prototypes=3, coverage=0.3, tolerance=0.6, has_centroid=False):
+    """Compact one identity in the gallery, returns the dropped samples.
+
+    Dropped samples must still match `name` against the compacted gallery:
+    any that would fall outside tolerance, or closer to another identity,
+    are kept as extra prototypes so accuracy on stored samples is preserved.
+    `has_centroid` says the identity's first row is the centroid of an
+    earlier compaction; it is replaced but never returned as a sample.
+    """
+    samples = gallery.rows_for(name)
+    if len(samples) <= max_prototypes + 1:
+        return np.empty((0, gallery.dim), dtype=np.float32)
+
+    kept, dropped = select_prototypes(samples, max_prototypes, coverage)
+
+    # Best distance from each sample to any other identity
+    label = gallery.label_for(name)
+    others = gallery.match(samples, tolerance).identity_distances
+    others[:, label] = np.inf
+    other_best = others.min(axis=1) if others.shape[1] else np.full(len(samples), np.inf)
+
+    own_best = np.linalg.norm(samples[:, None, :] - kept[None, :, :], axis=2).min(axis=1)
+    lost = dropped & ((own_best >= tolerance) | (own_best >= other_best))
+    if lost.any():
+        kept = np.concatenate([kept, samples[lost]])
+        dropped &= ~lost
+    if has_centroid:
+        dropped[0] = False
+    if not dropped.any():
+        # Nothing to archive: leave the identity as it is
+        return np.empty((0, gallery.dim), dtype=np.float32)
+
+    gallery.replace_identity(name, kept)
+    return samples[dropped]
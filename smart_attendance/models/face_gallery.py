@@ -0,0 +1,247 @@
+import numpy as np
+from collections import namedtuple
+from models.face_index import BruteForceIndex, INDEX_TYPES, IVF_THRESHOLD, choose_index_kind
+
+# Result of matching a batch of query encodings against the gallery.
+# `identity_distances` has one column per entry in `FaceGallery.identity_names`.
+MatchResult = namedtuple('MatchResult', ['names', 'distances', 'identity_distances'])
+
+# Label of attached rows the store has removed; they are kept but never matched
+REMOVED = -1
+
+
+class FaceGallery:
+    """Contiguous float32 matrix of known face encodings with integer labels.
+
+    Search goes through a pluggable index: exact brute force for small
+    galleries and IVF once the gallery reaches `ivf_threshold` encodings
+    (index='auto'), or a fixed kind given as index='exact' / index='ivf'.
+    """
+
+    def __init__(self, dim=128, capacity=1024, index='auto', ivf_threshold=IVF_THRESHOLD):
+        self.dim = dim
+        self.size = 0
+        self.removed = 0
+        self._encodings = np.empty((capacity, dim), dtype=np.float32)
+        self._sq_norms = np.empty(capacity, dtype=np.float32)
+        self._labels = np.empty(capacity, dtype=np.int32)
+
+        # Label -> name and name -> label lookups
+        self.identity_names = []
+        self._label_of = {}
+
+        # Label-sorted column order, rebuilt lazily after the gallery changes
+        self._order = None
+        self._group_starts = None
+        self._group_labels = None
+
+        self.index_kind = index
+        self.ivf_threshold = ivf_threshold
+        self.index = BruteForceIndex(self)
+        self._prepared = True
+
+    def __len__(self):
+        return self.size - self.removed
+
+    @property
+    def encodings(self):
+        return self._encodings[:self.size]
+
+    @property
+    def labels(self):
+        return self._labels[:self.size]
+
+    @property
+    def names(self):
+        """Name of every row, None for removed rows"""
+        return [self.identity_names[label] if label != REMOVED else None for label in self.labels]
+
+    def label_for(self, name):
+        label = self._label_of.get(name)
+        if label is None:
+            label = len(self.identity_names)
+            self.identity_names.append(name)
+            self._label_of[name] = label
+        return label
+
+    def _reserve(self, extra):
+        needed = self.size + extra
+        capacity = len(self._encodings)
+        if needed <= capacity and self._encodings.flags.writeable:
+            return
+
+        # Read-only (memory-mapped) rows are copied into RAM on the first append
+        capacity = max(capacity, 16)
+        while capacity < needed:
+            capacity *= 2
+
+        encodings = np.empty((capacity, self.dim), dtype=np.float32)
+        sq_norms = np.empty(capacity, dtype=np.float32)
+        labels = np.empty(capacity, dtype=np.int32)
+        encodings[:self.size] = self._encodings[:self.size]
+        sq_norms[:self.size] = self._sq_norms[:self.size]
+        labels[:self.size] = self._labels[:self.size]
+        self._encodings, self._sq_norms, self._labels = encodings, sq_norms, labels
+
+    def attach(self, encodings, names, live=None):
+        """Adopt an existing (N, dim) array, e.g. a memmap, without reading it.
+
+        Rows where the `live` mask is False stay in the array but are never
+        matched. Norms and the search index are only computed on first use.
+        """
+        self.clear()
+        self._encodings = encodings
+        self._labels = np.array([self.label_for(name) if live is None or live[i] else REMOVED
+                                 for i, name in enumerate(names)], dtype=np.int32)
+        self._sq_norms = None
+        self.size = len(names)
+        self.removed = len(names) - int(np.count_nonzero(live)) if live is not None else 0
+        self._prepared = False
+
+    def _prepare(self):
+        if self._prepared:
+            return
+        self._prepared = True
+        encodings = self.encodings
+        self._sq_norms = np.einsum('ij,ij->i', encodings, encodings).astype(np.float32)
+        self.index = BruteForceIndex(self)
+        self._update_index(0, self.size)
+
+    def add(self, encodings, names):
+        """Append encodings (N, dim) with their names, returns the new row range"""
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        if len(encodings) != len(names):
+            raise ValueError("encodings and names must have the same length")
+
+        self._prepare()
+        start = self.size
+        self._reserve(len(encodings))
+        end = start + len(encodings)
+
+        self._encodings[start:end] = encodings
+        self._sq_norms[start:end] = np.einsum('ij,ij->i', encodings, encodings)
+        self._labels[start:end] = [self.label_for(name) for name in names]
+        self.size = end
+        self._order = None
+        self._update_index(start, end)
+        return start, end
+
+    def rows_for(self, name):
+        """Encodings stored for one identity"""
+        label = self._label_of.get(name)
+        if label is None:
+            return np.empty((0, self.dim), dtype=np.float32)
+        return self.encodings[self.labels == label]
+
+    def replace_identity(self, name, encodings):
+        """Swap every row of one identity for new encodings, returns the removed rows"""
+        label = self.label_for(name)
+        keep = self.labels != label
+        removed = self.encodings[~keep].copy()
+        self._keep_rows(keep)
+        self.add(encodings, [name] * len(encodings))
+        return removed
+
+    def drop_removed(self):
+        """Forget the attached rows the store has removed"""
+        if self.removed:
+            self._keep_rows(self.labels != REMOVED)
+            self.removed = 0
+
+    def _keep_rows(self, keep):
+        self._prepare()
+        self._reserve(0)
+        mapping = np.full(self.size, -1, dtype=np.int64)
+        kept = int(keep.sum())
+        mapping[keep] = np.arange(kept)
+        self._encodings[:kept] = self.encodings[keep]
+        self._sq_norms[:kept] = self._sq_norms[:self.size][keep]
+        self._labels[:kept] = self.labels[keep]
+        self.size = kept
+        self._order = None
+        self.index.remap(mapping)
+
+    def clear(self):
+        # Fresh arrays: attached ones may be read-only, the caller's, or lack norms
+        self._encodings = np.empty((16, self.dim), dtype=np.float32)
+        self._sq_norms = np.empty(16, dtype=np.float32)
+        self._labels = np.empty(16, dtype=np.int32)
+        self.size = 0
+        self.removed = 0
+        self.identity_names = []
+        self._label_of = {}
+        self._order = None
+        self.index = BruteForceIndex(self)
+        self._prepared = True
+
+    def _update_index(self, start, end):
+        kind = self.index_kind
+        if kind == 'auto' or self.size == 0:
+            kind = choose_index_kind(self.size, self.ivf_threshold)
+
+        if kind != self.index.kind:
+            # Switching kind builds the new index over every row once
+            self.index = INDEX_TYPES[kind](self)
+        else:
+            self.index.add(start, end)
+
+    def distances(self, queries):
+        """Euclidean distances (Q, N) between queries and every stored encoding"""
+        self._prepare()
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        q_sq = np.einsum('ij,ij->i', queries, queries)
+        sq = q_sq[:, None] + self._sq_norms[:self.size][None, :] - 2.0 * (queries @ self.encodings.T)
+        np.maximum(sq, 0.0, out=sq)
+        return np.sqrt(sq)
+
+    def row_distances(self, query, rows):
+        """Euclidean distances between one query and the given gallery rows"""
+        query = np.asarray(query, dtype=np.float32).reshape(self.dim)
+        sq = query @ query + self._sq_norms[rows] - 2.0 * (self._encodings[rows] @ query)
+        return np.sqrt(np.maximum(sq, 0.0))
+
+    def _grouping(self):
+        if self._order is None:
+            # Removed rows sort first and belong to no identity
+            order = np.argsort(self.labels, kind='stable')[self.removed:]
+            sorted_labels = self.labels[order]
+            self._order = order
+            self._group_starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+            self._group_labels = sorted_labels[self._group_starts]
+        return self._order, self._group_starts, self._group_labels
+
+    def identity_min(self, distances):
+        """Reduce (Q, N) row distances to the best distance per identity (Q, L)"""
+        result = np.full((len(distances), len(self.identity_names)), np.inf, dtype=np.float32)
+        if len(self) == 0 or len(distances) == 0:
+            return result
+        order, starts, group_labels = self._grouping()
+        result[:, group_labels] = np.minimum.reduceat(distances[:, order], starts, axis=1)
+        return result
+
+    def match(self, queries, tolerance=0.6):
+        """Match all query encodings in one batched distance computation"""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if len(queries) == 0 or len(self) == 0:
+            return MatchResult(["Unknown"] * len(queries),
+                               np.full(len(queries), np.inf, dtype=np.float32),
+                               np.full((len(queries), len(self.identity_names)), np.inf, dtype=np.float32))
+
+        self._prepare()
+        rows, distances = self.index.search(queries)
+        if rows is None:
+            identity_distances = self.identity_min(distances)
+        else:
+            # Approximate indexes only score candidate rows; other identities stay at inf
+            identity_distances = np.full((len(queries), len(self.identity_names)), np.inf, dtype=np.float32)
+            labels = np.where(rows >= 0, self._labels[rows], REMOVED)
+            query_ids, columns = np.nonzero(labels != REMOVED)
+            np.minimum.at(identity_distances,
+                          (query_ids, labels[query_ids, columns]),
+                          distances[query_ids, columns])
+        best_labels = np.argmin(identity_distances, axis=1)
+        best_distances = identity_distances[np.arange(len(queries)), best_labels]
+
+        names = [self.identity_names[label] if distance < tolerance else "Unknown"
+                 for label, distance in zip(best_labels, best_distances)]
+        return MatchResult(names, best_distances, identity_distances)
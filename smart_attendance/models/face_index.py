@@ -0,0 +1,139 @@
+import numpy as np
+
+# Galleries at or above this many encodings switch from exact search to IVF
+IVF_THRESHOLD = 20000
+
+
+class BruteForceIndex:
+    """Exact search: every query is compared with every stored encoding"""
+
+    kind = 'exact'
+
+    def __init__(self, gallery):
+        self.gallery = gallery
+
+    def add(self, start, end):
+        pass
+
+    def remap(self, mapping):
+        pass
+
+    def search(self, queries):
+        # None rows means the distances cover all gallery rows in order
+        return None, self.gallery.distances(queries)
+
+
+def kmeans(data, k, iterations=10, seed=0, chunk=8192):
+    """Plain Lloyd's k-means, returns (centroids, assignments)"""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = assign_nearest(data, centroids, chunk)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, data)
+        counts = np.bincount(assignments, minlength=k)
+
+        # Re-seed empty clusters from random points so every list stays usable
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = data[rng.choice(len(data), size=int(empty.sum()), replace=False)]
+            counts[empty] = 1
+        centroids = (sums / counts[:, None]).astype(np.float32)
+    return centroids, assign_nearest(data, centroids, chunk)
+
+
+def assign_nearest(data, centroids, chunk=8192):
+    """Index of the nearest centroid for every row, computed in bounded chunks"""
+    c_sq = np.einsum('ij,ij->i', centroids, centroids)
+    result = np.empty(len(data), dtype=np.int32)
+    for start in range(0, len(data), chunk):
+        block = data[start:start + chunk]
+        # |x|^2 is constant per row, so it does not affect the argmin
+        result[start:start + chunk] = np.argmin(c_sq[None, :] - 2.0 * (block @ centroids.T), axis=1)
+    return result
+
+
+class IVFIndex:
+    """Inverted-file index: k-means coarse quantizer with per-centroid row lists"""
+
+    kind = 'ivf'
+
+    def __init__(self, gallery, n_lists=None, n_probe=None, train_size=50000, seed=0):
+        self.gallery = gallery
+        self.n_lists = n_lists or max(16, int(np.sqrt(len(gallery))))
+        self.n_probe = n_probe or max(8, self.n_lists // 16)
+        self.train_size = train_size
+        self.seed = seed
+        self.centroids = None
+        self._lists = []
+        self._counts = None
+        self.train()
+
+    def train(self):
+        """Fit the coarse quantizer on a sample and bucket every existing row"""
+        encodings = self.gallery.encodings
+        rng = np.random.default_rng(self.seed)
+        sample = encodings
+        if len(encodings) > self.train_size:
+            sample = encodings[rng.choice(len(encodings), size=self.train_size, replace=False)]
+
+        self.n_lists = min(self.n_lists, len(sample))
+        self.n_probe = min(self.n_probe, self.n_lists)
+        self.centroids, _ = kmeans(np.ascontiguousarray(sample), self.n_lists, seed=self.seed)
+        self._lists = [np.empty(16, dtype=np.int64) for _ in range(self.n_lists)]
+        self._counts = np.zeros(self.n_lists, dtype=np.int64)
+        self.add(0, len(encodings))
+
+    def add(self, start, end):
+        """Bucket gallery rows [start, end) without retraining the quantizer"""
+        if end <= start:
+            return
+        assignments = assign_nearest(self.gallery.encodings[start:end], self.centroids)
+        rows = np.arange(start, end, dtype=np.int64)
+        order = np.argsort(assignments, kind='stable')
+        lists, starts = np.unique(assignments[order], return_index=True)
+        for list_id, chunk in zip(lists, np.split(rows[order], starts[1:])):
+            self._append(list_id, chunk)
+
+    def _append(self, list_id, rows):
+        count = self._counts[list_id]
+        bucket = self._lists[list_id]
+        if count + len(rows) > len(bucket):
+            grown = np.empty(max(2 * len(bucket), count + len(rows)), dtype=np.int64)
+            grown[:count] = bucket[:count]
+            self._lists[list_id] = bucket = grown
+        bucket[count:count + len(rows)] = rows
+        self._counts[list_id] = count + len(rows)
+
+    def remap(self, mapping):
+        """Renumber rows after the gallery drops some, mapping[old] is the new row or -1"""
+        for list_id in range(self.n_lists):
+            rows = mapping[self._lists[list_id][:self._counts[list_id]]]
+            rows = rows[rows >= 0]
+            self._lists[list_id][:len(rows)] = rows
+            self._counts[list_id] = len(rows)
+
+    def search(self, queries):
+        """Candidate rows (Q, M) padded with -1 and their distances padded with inf"""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.gallery.dim)
+        c_sq = np.einsum('ij,ij->i', self.centroids, self.centroids)
+        probes = np.argsort(c_sq[None, :] - 2.0 * (queries @ self.centroids.T), axis=1)[:, :self.n_probe]
+
+        candidates = [np.concatenate([self._lists[l][:self._counts[l]] for l in probe]) for probe in probes]
+        width = max((len(c) for c in candidates), default=0)
+        rows = np.full((len(queries), width), -1, dtype=np.int64)
+        distances = np.full((len(queries), width), np.inf, dtype=np.float32)
+        for i, (query, candidate) in enumerate(zip(queries, candidates)):
+            rows[i, :len(candidate)] = candidate
+            distances[i, :len(candidate)] = self.gallery.row_distances(query, candidate)
+        return rows, distances
+
+
+INDEX_TYPES = {
+    'exact': BruteForceIndex,
+    'ivf': IVFIndex,
+}
+
+
+def choose_index_kind(gallery_size, threshold=IVF_THRESHOLD):
+    return 'ivf' if gallery_size >= threshold else 'exact'
@@ -1,43 +1,134 @@
 import cv2
 import face_recognition
-import numpy as np
-import os
-import pickle
-from datetime import datetime
+import threading
+import time
+from models.detection_scheduler import DetectionScheduler
+from models.face_compaction import compact_identity
+from models.face_gallery import FaceGallery
+from models.face_store import FaceStore, migrate_pickle
+from monitoring.metrics import metrics
 
 class FaceRecognizer:
-    def __init__(self):
-        self.known_face_encodings = []
-        self.known_face_names = []
+    def __init__(self, tolerance=0.6, index='auto', store_path='data/faces.emb',
+                 archive_path='data/faces_archive.emb', legacy_path='data/face_encodings.pkl',
+                 detection_policy='roi', read_only=False):
+        self.tolerance = tolerance
+        # Camera workers share the store's memory map and never write to it
+        self.read_only = read_only
+        # Downscale factor of the frames FaceTracker follows faces on
+        self.scale = 0.25
+        self.detector = DetectionScheduler(policy=detection_policy)
+        self.gallery = FaceGallery(index=index)
+        self.store = FaceStore(store_path)
+        # Samples dropped by compaction, kept for audit but never matched
+        self.archive_store = FaceStore(archive_path)
+        self.legacy_path = legacy_path
+        self.student_ids = {}
+        # Gallery rows [0, _persisted_rows) are already in the store
+        self._persisted_rows = 0
+        self._removed = set()
+        self._pending_archive = []
+        # Identities compacted before, whose first row is a centroid; from the archive
+        self._compacted = None
+        self._store_version = None
+        # The gallery is also written by the registration encoder thread
+        self.lock = threading.RLock()
         self.load_known_faces()
     
+    @property
+    def known_face_encodings(self):
+        return self.gallery.encodings
+    
+    @property
+    def known_face_names(self):
+        return self.gallery.names
+    
     def load_known_faces(self):
-        encodings_file = 'data/face_encodings.pkl'
-        if os.path.exists(encodings_file) and os.path.getsize(encodings_file) > 0:
+        try:
+            if not self.read_only:
+                migrate_pickle(self.legacy_path, self.store, self.archive_store)
+            self._store_version = self.store.version()
+            if not self.store.exists():
+                print("No existing face encodings found. Starting fresh.")
+                return
+            
+            # Embeddings stay memory-mapped until the first match touches them;
+            # rows removed by compaction stay mapped but are never matched
+            encodings, names, ids, live = self.store.load_rows()
+            self.gallery.attach(encodings, names, live)
+            self.student_ids = {name: student_id for name, student_id in zip(names, ids) if student_id}
+            self._persisted_rows = len(names)
+            print(f"Loaded {len(self.gallery)} known faces")
+        except Exception as e:
+            print(f"Error loading face encodings: {e}")
+            self.gallery.clear()
+            self._persisted_rows = 0
+    
+    def refresh(self):
+        """Reload the gallery if another process saved to the store, returns True if it did"""
+        try:
+            if self.store.version() == self._store_version:
+                return False
+        except Exception as e:
+            print(f"Error checking face encodings: {e}")
+            return False
+        with self.lock:
+            self.gallery.clear()
+            self._persisted_rows = 0
+            self.load_known_faces()
+        return True
+    
+    def _ids_for(self, names):
+        return [self.student_ids.get(name, '') for name in names]
+    
+    def save_known_faces(self):
+        if self.read_only:
+            return
+        with self.lock:
+            try:
+                names = self.gallery.names
+                if len(names) > self._persisted_rows or self._removed:
+                    # Only the rows added since the last save are written; compacted
+                    # identities are removed with tombstones in the same commit
+                    new_names = names[self._persisted_rows:]
+                    self.store.append(self.gallery.encodings[self._persisted_rows:], new_names,
+                                      self._ids_for(new_names), sorted(self._removed))
+                self._persisted_rows = len(names)
+                self._removed = set()
+                
+                for dropped, name in self._pending_archive:
+                    self.archive_store.append(dropped, [name] * len(dropped), self._ids_for([name] * len(dropped)))
+                self._pending_archive = []
+                print(f"Saved {len(self.gallery)} face encodings")
+                
+                # Rewriting once removed rows outnumber live ones keeps the
+                # file under twice its live size at O(1) amortized cost per row
+                version = self.store.version()
+                if version and version[0] - len(self.gallery) > len(self.gallery):
+                    self.compact_store()
+            except Exception as e:
+                print(f"Error saving face encodings: {e}")
+    
+    def compact_store(self):
+        """Rewrite the store without the rows removed by compaction"""
+        if self.read_only:
+            return
+        with self.lock:
             try:
-                with open(encodings_file, 'rb') as f:
-                    data = pickle.load(f)
-                    self.known_face_encodings = data.get('encodings', [])
-                    self.known_face_names = data.get('names', [])
-                    print(f"Loaded {len(self.known_face_names)} known faces")
+                self.gallery.drop_removed()
+                names = self.gallery.names
+                self.store.rewrite(self.gallery.encodings, names, self._ids_for(names))
+                self._persisted_rows = len(names)
+                self._removed = set()
+                print(f"Rewrote face store with {len(names)} encodings")
             except Exception as e:
-                print(f"Error loading face encodings: {e}")
-                self.known_face_encodings = []
-                self.known_face_names = []
-        else:
-            print("No existing face encodings found. Starting fresh.")
+                print(f"Error rewriting face encodings: {e}")
     
-    def save_known_faces(self):
-        data = {
-            'encodings': self.known_face_encodings,
-            'names': self.known_face_names
-        }
-        os.makedirs('data', exist_ok=True)
-        with open('data/face_encodings.pkl', 'wb') as f:
-            pickle.dump(data, f)
-        print(f"Saved {len(self.known_face_names)} face encodings")
-    
-    def add_face_encoding(self, face_image, name):
+    def archived_faces(self):
+        """Samples removed by compaction as (encodings, names, ids), for audit"""
+        return self.archive_store.load()
+    
+    def add_face_encoding(self, face_image, name, student_id=''):
         try:
             # Ensure the image is in RGB format
             if len(face_image.shape) == 3:
@@ -52,8 +143,7 @@ class FaceRecognizer:
             encodings = face_recognition.face_encodings(rgb_image)
             
             if len(encodings) > 0:
-                self.known_face_encodings.append(encodings[0])
-                self.known_face_names.append(name)
+                self.add_encoding(encodings[0], name, student_id)
                 print(f"Added face encoding for {name}")
                 return True
             else:
@@ -63,40 +153,84 @@ class FaceRecognizer:
             print(f"Error adding face encoding for {name}: {e}")
             return False
     
+    def encode_face(self, rgb, box):
+        """Encoding of the face at a known (top, right, bottom, left) box, or None"""
+        started_at = time.perf_counter()
+        encodings = face_recognition.face_encodings(rgb, [box])
+        metrics.observe('face_encodings', started_at)
+        return encodings[0] if encodings else None
+    
+    def face_landmarks(self, rgb, box):
+        """5-point landmarks (eyes and nose tip) of the face at a known box, or None"""
+        landmarks = face_recognition.face_landmarks(rgb, [box], model='small')
+        return landmarks[0] if landmarks else None
+    
+    def add_encoding(self, encoding, name, student_id=''):
+        with self.lock:
+            self.gallery.add(encoding, [name])
+            if student_id:
+                self.student_ids[name] = student_id
+    
+    def compact_identity(self, name, max_prototypes=3, coverage=0.3):
+        """Reduce one student's samples to a centroid plus a few prototypes"""
+        with self.lock:
+            if self._compacted is None:
+                self._compacted = set(self.archive_store.load_rows()[1])
+            persisted = self.gallery.names[:self._persisted_rows].count(name)
+            dropped = compact_identity(self.gallery, name, max_prototypes, coverage, self.tolerance,
+                                       has_centroid=name in self._compacted)
+            if len(dropped) > 0:
+                self._compacted.add(name)
+                # The identity's rows moved to the end of the gallery: the stored
+                # ones are tombstoned on the next save and the new ones appended
+                self._persisted_rows -= persisted
+                self._removed.add(name)
+                self._pending_archive.append((dropped, name))
+                print(f"Compacted {name}: archived {len(dropped)} samples, "
+                      f"{len(self.gallery.rows_for(name))} kept")
+        return len(dropped)
+    
+    def compact_all(self, max_prototypes=3, coverage=0.3):
+        return sum(self.compact_identity(name, max_prototypes, coverage)
+                   for name in list(self.gallery.identity_names))
+    
+    def match_encodings(self, face_encodings):
+        """Match encodings, returning names, best distances and per-identity best distances"""
+        started_at = time.perf_counter()
+        with self.lock:
+            result = self.gallery.match(face_encodings, self.tolerance)
+        metrics.observe('compare_faces', started_at)
+        return result
+    
+    def detect_faces(self, frame, rgb=None):
+        """Face boxes in full-frame pixels, at the scale and regions the scheduler picks"""
+        return self.detector.detect(frame, rgb)
+    
     def recognize_face(self, frame):
         try:
             # Skip recognition if no faces are registered
-            if len(self.known_face_encodings) == 0:
+            if len(self.gallery) == 0:
                 return [], []
             
-            # Resize frame for faster processing
-            small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-            rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+            # One conversion serves both detection and encoding
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             
             # Detect faces
-            face_locations = face_recognition.face_locations(rgb_small_frame)
-            face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
+            face_locations = self.detect_faces(frame, rgb_frame)
+            if not face_locations:
+                return [], []
             
-            face_names = []
-            for face_encoding in face_encodings:
-                # Compare with known faces
-                matches = face_recognition.compare_faces(self.known_face_encodings, face_encoding)
-                name = "Unknown"
-                
-                # Find the best match
-                face_distances = face_recognition.face_distance(self.known_face_encodings, face_encoding)
-                if len(face_distances) > 0:
-                    best_match_index = np.argmin(face_distances)
-                    if matches[best_match_index] and face_distances[best_match_index] < 0.6:  # Threshold for confidence
-                        name = self.known_face_names[best_match_index]
-                
-                face_names.append(name)
+            # Encode from the full-resolution frame; encoding cost depends on the
+            # number of faces, not the frame size
+            started_at = time.perf_counter()
+            face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+            metrics.observe('face_encodings', started_at)
             
-            # Scale back up face locations
-            face_locations = [(top * 4, right * 4, bottom * 4, left * 4) 
-                             for (top, right, bottom, left) in face_locations]
+            # Match every face in the frame against the gallery in one pass
+            face_names = self.match_encodings(face_encodings).names
             
             return face_locations, face_names
         except Exception as e:
             print(f"Error in face recognition: {e}")
+            metrics.increment('errors', stage='face_recognition')
             return [], []
\ No newline at end of file
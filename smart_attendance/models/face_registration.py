@@ -0,0 +1,279 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from monitoring.metrics import metrics
+
+# What the registration overlay asks the student to do after a rejected sample
+REJECTION_HINTS = {
+    'too_small': 'Move closer to the camera',
+    'blurry': 'Hold still',
+    'turned': 'Look straight at the camera',
+    'tilted': 'Keep your head level',
+    'no_encoding': 'Keep your face centered',
+}
+
+
+def sharpness(gray):
+    """Variance of the Laplacian of a grayscale face crop; low means blurred"""
+    import cv2
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def head_pose(landmarks):
+    """(yaw, roll) from 5-point landmarks.
+
+    Yaw is how far the nose tip sits from the eye midpoint along the eye
+    line, as a fraction of the eye distance (0 when facing the camera);
+    roll is the angle of the eye line in degrees.
+    """
+    left = np.mean(landmarks['left_eye'], axis=0)
+    right = np.mean(landmarks['right_eye'], axis=0)
+    nose = np.asarray(landmarks['nose_tip'][0], dtype=np.float64)
+    eye_line = right - left
+    distance_sq = float(np.dot(eye_line, eye_line))
+    if distance_sq == 0:
+        return 1.0, 90.0
+    yaw = float(np.dot(nose - (left + right) / 2, eye_line) / distance_sq)
+    roll = float(np.degrees(np.arctan2(eye_line[1], eye_line[0])))
+    if roll > 90:
+        roll -= 180
+    elif roll < -90:
+        roll += 180
+    return yaw, roll
+
+
+class RegistrationSession:
+    """Progress of one student's face registration"""
+
+    def __init__(self, name, student_id='', max_samples=10):
+        self.name = name
+        self.student_id = student_id
+        self.max_samples = max_samples
+        self.samples = 0
+        self.pending = 0         # samples queued or being encoded
+        self.rejected = {}       # reason -> count
+        self.last_rejection = None
+        self.last_submit = 0.0
+        self.capture_now = False
+        self.finished = False    # completed and compacted
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+
+    @property
+    def collected(self):
+        return self.samples >= self.max_samples
+
+
+class RegistrationManager:
+    """Face registrations in progress and the worker that encodes their samples.
+
+    Any number of students can be registering at once, each with their own
+    progress. The camera serves one of them at a time: the one whose
+    registration was started or reopened most recently. Others keep their
+    samples and continue when their page is opened again.
+
+    The face stage only offers the face box it already found; at most one
+    sample per session is in flight, at most every `interval` seconds. The
+    encoder thread rejects small, blurred, turned or tilted faces with cheap
+    checks, then encodes at the known box (no second detection), adds the
+    encoding to the recognizer and appends it to the face store, so an
+    interrupted registration keeps what it collected.
+    """
+
+    def __init__(self, recognizer, max_samples=10, interval=1.0, image_dir='data/face_images', min_face=80,
+                 min_sharpness=40.0, max_yaw=0.3, max_roll=20.0, queue_size=8):
+        self.recognizer = recognizer
+        self.max_samples = max_samples
+        self.interval = interval
+        self.image_dir = image_dir
+        self.min_face = min_face
+        self.min_sharpness = min_sharpness
+        self.max_yaw = max_yaw
+        self.max_roll = max_roll
+        self.sessions = {}
+        self.focus = None        # name of the registration using the camera
+        self.counters = {'submitted': 0, 'accepted': 0, 'rejected': 0, 'queue_full': 0}
+        self._lock = threading.Condition()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._worker = None
+
+    def start(self, name, student_id=''):
+        """Begin or resume a registration and give it the camera"""
+        with self._lock:
+            session = self.sessions.get(name)
+            if session is None or session.finished:
+                session = RegistrationSession(name, student_id, self.max_samples)
+                self.sessions[name] = session
+            elif student_id:
+                session.student_id = student_id
+            self.focus = name
+            return session
+
+    def current(self):
+        """Session the camera is collecting samples for, or None"""
+        with self._lock:
+            session = self.sessions.get(self.focus)
+            if session is None or session.collected:
+                return None
+            return session
+
+    def request_capture(self, name):
+        """Take the next sample for `name` without waiting for the interval.
+
+        Only registrations already in progress qualify; returns the session,
+        or None if `name` has none or it already has all its samples. The
+        camera stays with whichever registration has it.
+        """
+        with self._lock:
+            session = self.sessions.get(name)
+            if session is None or session.finished or session.collected:
+                return None
+            session.capture_now = True
+            return session
+
+    def offer(self, session, image, rgb, box):
+        """Queue a sample of the face at `box` if the session is due one"""
+        now = time.monotonic()
+        with self._lock:
+            if session.pending or session.collected or session.finished:
+                return False
+            if not session.capture_now and now - session.last_submit < self.interval:
+                return False
+            session.capture_now = False
+            session.last_submit = now
+            session.pending += 1
+
+        # Copy a margin around the face so the frame itself is not kept alive
+        height, width = rgb.shape[:2]
+        top, right, bottom, left = max(0, box[0]), min(width, box[1]), min(height, box[2]), max(0, box[3])
+        margin = (bottom - top) // 2
+        y0, x0 = max(0, top - margin), max(0, left - margin)
+        y1, x1 = min(height, bottom + margin), min(width, right + margin)
+        sample = (session, np.ascontiguousarray(rgb[y0:y1, x0:x1]), image[top:bottom, left:right].copy(),
+                  (top - y0, right - x0, bottom - y0, left - x0))
+        try:
+            self._queue.put_nowait(sample)
+        except queue.Full:
+            with self._lock:
+                session.pending -= 1
+                self.counters['queue_full'] += 1
+            return False
+        with self._lock:
+            self.counters['submitted'] += 1
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='registration-encoder', daemon=True)
+                self._worker.start()
+        return True
+
+    def check(self, rgb, box):
+        """Reason the face at `box` is not worth encoding, or None"""
+        import cv2
+        top, right, bottom, left = box
+        if min(bottom - top, right - left) < self.min_face:
+            return 'too_small'
+        gray = cv2.cvtColor(rgb[top:bottom, left:right], cv2.COLOR_RGB2GRAY)
+        # Fixed width so the blur threshold does not depend on face size
+        gray = cv2.resize(gray, (128, max(1, 128 * gray.shape[0] // gray.shape[1])), interpolation=cv2.INTER_AREA)
+        if sharpness(gray) < self.min_sharpness:
+            return 'blurry'
+        landmarks = self.recognizer.face_landmarks(rgb, box)
+        if landmarks is None:
+            return 'no_encoding'
+        yaw, roll = head_pose(landmarks)
+        if abs(yaw) > self.max_yaw:
+            return 'turned'
+        if abs(roll) > self.max_roll:
+            return 'tilted'
+        return None
+
+    def _run(self):
+        while True:
+            session, rgb, face_image, box = self._queue.get()
+            started_at = time.perf_counter()
+            try:
+                self._process(session, rgb, face_image, box)
+            except Exception as e:
+                print(f"Error encoding registration sample for {session.name}: {e}")
+                metrics.increment('errors', stage='registration')
+            finally:
+                metrics.observe('registration_sample', started_at)
+                with self._lock:
+                    session.pending -= 1
+                    self._lock.notify_all()
+
+    def _process(self, session, rgb, face_image, box):
+        import cv2
+        reason = self.check(rgb, box)
+        encoding = None if reason else self.recognizer.encode_face(rgb, box)
+        if encoding is None:
+            reason = reason or 'no_encoding'
+            with self._lock:
+                session.rejected[reason] = session.rejected.get(reason, 0) + 1
+                session.last_rejection = reason
+                self.counters['rejected'] += 1
+            return
+
+        with self._lock:
+            if session.finished or session.collected:
+                return
+            index = session.samples
+        self.recognizer.add_encoding(encoding, session.name, session.student_id)
+        # Persist each sample as it arrives; only the new row is appended
+        self.recognizer.save_known_faces()
+        cv2.imwrite(os.path.join(self.image_dir, f"{session.name}_{index}.jpg"), face_image)
+        with self._lock:
+            session.samples += 1
+            session.last_rejection = None
+            self.counters['accepted'] += 1
+
+    def complete(self, name, timeout=5.0):
+        """Finish a registration once its queued samples are encoded"""
+        with self._lock:
+            session = self.sessions.get(name)
+            if session is None:
+                return None
+            self._lock.wait_for(lambda: session.pending == 0, timeout)
+            session.finished = True
+            if self.focus == name:
+                self.focus = None
+            return session
+
+    def status(self, name=None):
+        """Progress of one registration (default: the one using the camera), or None"""
+        with self._lock:
+            if name is None:
+                name = self.focus
+            session = self.sessions.get(name)
+            if session is None:
+                return None
+            if session.finished:
+                state = 'complete'
+            elif session.collected:
+                state = 'collected'
+            elif self.focus == name:
+                state = 'capturing'
+            else:
+                state = 'waiting'
+            return {
+                'name': session.name,
+                'student_id': session.student_id,
+                'state': state,
+                'active': state == 'capturing',
+                'samples_collected': session.samples,
+                'max_samples': session.max_samples,
+                'pending': session.pending,
+                'rejected': dict(session.rejected),
+                'last_rejection': session.last_rejection,
+                'hint': REJECTION_HINTS.get(session.last_rejection),
+                'started_at': session.started_at,
+            }
+
+    def report(self):
+        with self._lock:
+            names = list(self.sessions)
+            counters = dict(self.counters, queued=self._queue.qsize())
+        return {'sessions': [self.status(name) for name in names], 'encoder': counters}
@@ -0,0 +1,250 @@
+import json
+import os
+import pickle
+import struct
+
+import numpy as np
+
+# magic, version, reserved, dim, row count, committed names bytes, generation,
+# committed removals bytes (zero padding in version 1 files)
+HEADER = struct.Struct('<8sHHIQQQQ')
+HEADER_SIZE = 64
+MAGIC = b'SAFACES1'
+VERSION = 2
+
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class FaceStore:
+    """Append-only float32 embedding file with a sidecar name/ID table.
+
+    `<path>` holds a fixed header followed by a contiguous (count, dim)
+    float32 block that is opened with np.memmap, so loading never reads
+    embeddings until they are used. `<path>.names` holds one JSON line
+    per row with the student name and ID, after a generation line.
+
+    Appends write the new rows and names past the committed end and fsync
+    them before the header's row count is bumped, so a crash mid-append
+    leaves the previous contents intact. Full rewrites go through temp
+    files and os.replace.
+
+    Removing an identity's rows does not rewrite anything either: an
+    append can carry tombstones, `[name, row count]` lines in
+    `<path>.removed`, that hide every earlier row of that name from
+    load(). The rows stay in the file until the next rewrite.
+    """
+
+    def __init__(self, path='data/faces.emb', dim=128):
+        self.path = path
+        self.names_path = path + '.names'
+        self.removed_path = path + '.removed'
+        self.dim = dim
+
+    @property
+    def row_bytes(self):
+        return self.dim * 4
+
+    def exists(self):
+        return os.path.exists(self.path) and os.path.getsize(self.path) >= HEADER_SIZE
+
+    def _read_header(self):
+        with open(self.path, 'rb') as f:
+            raw = f.read(HEADER.size)
+        magic, version, _, dim, count, names_size, generation, removed_size = HEADER.unpack(raw)
+        if magic != MAGIC or version not in (1, VERSION):
+            raise ValueError(f"{self.path} is not a face store")
+        if dim != self.dim:
+            raise ValueError(f"{self.path} stores {dim}-d embeddings, expected {self.dim}")
+        return count, names_size, generation, removed_size
+
+    def _write_header(self, f, count, names_size, generation, removed_size=0):
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, 0, self.dim, count, names_size, generation,
+                            removed_size).ljust(HEADER_SIZE, b'\0'))
+
+    def _recover_names(self, generation):
+        # A rewrite that crashed after replacing the embeddings is rolled forward
+        pending = self.names_path + '.new'
+        if os.path.exists(pending) and self._names_generation(pending) == generation:
+            os.replace(pending, self.names_path)
+            _fsync_dir(self.names_path)
+
+    def _names_generation(self, path):
+        try:
+            with open(path, 'rb') as f:
+                return json.loads(f.readline()).get('generation')
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def version(self):
+        """(row count, generation, removals) of the committed rows, cheap enough to poll"""
+        if not self.exists():
+            return None
+        count, _, generation, removed_size = self._read_header()
+        return count, generation, removed_size
+
+    def _removed_before(self, removed_size):
+        """name -> row count below which that name's rows are removed"""
+        if removed_size == 0:
+            return {}
+        with open(self.removed_path, 'rb') as f:
+            lines = f.read(removed_size).splitlines()
+        removed = {}
+        for line in lines:
+            name, before = json.loads(line)
+            removed[name] = max(before, removed.get(name, 0))
+        return removed
+
+    def load_rows(self):
+        """Return (encodings memmap, names, ids, live) for every committed row.
+
+        Removed rows are included so the memmap is never copied; `live` is
+        a boolean mask of the rows that are not removed, or None if none are.
+        """
+        if not self.exists():
+            return np.empty((0, self.dim), dtype=np.float32), [], [], None
+
+        count, names_size, generation, removed_size = self._read_header()
+        if self._names_generation(self.names_path) != generation:
+            self._recover_names(generation)
+
+        with open(self.names_path, 'rb') as f:
+            lines = f.read(names_size).splitlines()[1:]
+        rows = [json.loads(line) for line in lines[:count]]
+        if len(rows) != count:
+            raise ValueError(f"{self.names_path} has {len(rows)} names for {count} rows")
+
+        if count == 0:
+            encodings = np.empty((0, self.dim), dtype=np.float32)
+        else:
+            encodings = np.memmap(self.path, dtype=np.float32, mode='r',
+                                  offset=HEADER_SIZE, shape=(count, self.dim))
+
+        live = None
+        removed = self._removed_before(removed_size)
+        if removed:
+            live = np.array([i >= removed.get(row[0], 0) for i, row in enumerate(rows)], dtype=bool)
+        return encodings, [row[0] for row in rows], [row[1] for row in rows], live
+
+    def load(self):
+        """Return (encodings, names, ids) for the rows that are not removed.
+
+        Encodings are a memmap, or an in-memory copy of the live rows when
+        the store holds removed rows.
+        """
+        encodings, names, ids, live = self.load_rows()
+        if live is None:
+            return encodings, names, ids
+        rows = np.flatnonzero(live)
+        return encodings[rows], [names[i] for i in rows], [ids[i] for i in rows]
+
+    def _name_lines(self, names, ids):
+        ids = ids if ids is not None else [''] * len(names)
+        return b''.join(json.dumps([name, student_id]).encode() + b'\n'
+                        for name, student_id in zip(names, ids))
+
+    def append(self, encodings, names, ids=None, removed=()):
+        """Write only the new rows, then commit them with a header update.
+
+        Every row already stored under a name in `removed` is removed in
+        the same commit; the appended rows are not.
+        """
+        encodings = np.ascontiguousarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        if len(encodings) != len(names):
+            raise ValueError("encodings and names must have the same length")
+        if len(encodings) == 0 and not removed:
+            return
+        if not self.exists():
+            self.rewrite(encodings, names, ids)
+            return
+
+        count, names_size, generation, removed_size = self._read_header()
+        if removed:
+            with open(self.removed_path, 'ab') as f:
+                # Anything past the committed size is a torn append and is discarded
+                f.truncate(removed_size)
+                f.write(b''.join(json.dumps([name, count]).encode() + b'\n' for name in removed))
+                f.flush()
+                os.fsync(f.fileno())
+                removed_size = f.tell()
+
+        with open(self.names_path, 'r+b') as f:
+            # Anything past the committed size is a torn append and is discarded
+            f.truncate(names_size)
+            f.seek(names_size)
+            f.write(self._name_lines(names, ids))
+            f.flush()
+            os.fsync(f.fileno())
+            new_names_size = f.tell()
+
+        with open(self.path, 'r+b') as f:
+            end = HEADER_SIZE + count * self.row_bytes
+            f.truncate(end)
+            f.seek(end)
+            f.write(encodings.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+            self._write_header(f, count + len(encodings), new_names_size, generation, removed_size)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def rewrite(self, encodings, names, ids=None):
+        """Atomically replace the whole store, dropping removed rows for good"""
+        encodings = np.ascontiguousarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        generation = 0
+        if self.exists():
+            generation = self._read_header()[2] + 1
+
+        names_tmp = self.names_path + '.new'
+        header_line = json.dumps({'generation': generation}).encode() + b'\n'
+        with open(names_tmp, 'wb') as f:
+            f.write(header_line)
+            f.write(self._name_lines(names, ids))
+            f.flush()
+            os.fsync(f.fileno())
+            names_size = f.tell()
+
+        path_tmp = self.path + '.new'
+        with open(path_tmp, 'wb') as f:
+            self._write_header(f, len(encodings), names_size, generation)
+            f.write(encodings.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        # Embeddings first: load() rolls a pending names file forward if we stop here
+        os.replace(path_tmp, self.path)
+        os.replace(names_tmp, self.names_path)
+        _fsync_dir(self.path)
+
+
+def migrate_pickle(pickle_path, store, archive_store=None):
+    """One-shot import of the legacy face_encodings.pkl into binary stores"""
+    if not os.path.exists(pickle_path) or os.path.getsize(pickle_path) == 0:
+        return False
+    if store.exists():
+        return False
+
+    with open(pickle_path, 'rb') as f:
+        data = pickle.load(f)
+
+    store.rewrite(np.asarray(data.get('encodings', []), dtype=np.float32), list(data.get('names', [])))
+    archived_names = list(data.get('archived_names', []))
+    if archive_store is not None and archived_names:
+        archive_store.rewrite(np.asarray(data['archived_encodings'], dtype=np.float32), archived_names)
+
+    os.replace(pickle_path, pickle_path + '.migrated')
+    print(f"Migrated {len(data.get('names', []))} face encodings from {pickle_path}")
+    return True
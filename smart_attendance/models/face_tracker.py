@@ -0,0 +1,194 @@
+import time
+
+import cv2
+import face_recognition
+import numpy as np
+
+from monitoring.metrics import metrics
+
+
+def box_iou(a, b):
+    """IoU of two (top, right, bottom, left) boxes"""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+class Track:
+    _next_id = 1
+
+    def __init__(self, box):
+        self.id = Track._next_id
+        Track._next_id += 1
+        self.box = box
+        self.name = "Unknown"
+        self.distance = np.inf
+        self.encoded_box = None
+        self.encoded_at = None
+        self.misses = 0
+        self.template = None
+
+
+class FaceTracker:
+    """Track-then-recognize wrapper around a FaceRecognizer.
+
+    Faces are detected every `detect_every` frames and followed in between
+    by template matching on the downscaled grey frame; faces are encoded
+    from the full-resolution frame. Detections are associated with existing tracks by IoU and keep their identity. A track
+    is only re-encoded when it is new, every `reencode_every` frames, when
+    its box has moved (IoU with the box at the last encode below
+    `move_iou`), or every `retry_every` frames while its last match
+    distance is above `min_confidence` (including unknown faces).
+
+    Time spent in HOG detection and in encoding is accumulated in
+    `counters` (seconds) next to the call counts.
+    """
+
+    def __init__(self, recognizer, detect_every=5, reencode_every=30, move_iou=0.5,
+                 min_confidence=0.5, retry_every=5, match_iou=0.3, max_misses=2,
+                 template_threshold=0.6):
+        self.recognizer = recognizer
+        self.detect_every = detect_every
+        self.reencode_every = reencode_every
+        self.move_iou = move_iou
+        self.min_confidence = min_confidence
+        self.retry_every = retry_every
+        self.match_iou = match_iou
+        self.max_misses = max_misses
+        self.template_threshold = template_threshold
+        self.tracks = []
+        self.last_ids = []  # track ids of the faces returned by the last update
+        self.frame_index = 0
+        self._force_detect = True
+        self.counters = {'frames': 0, 'detections': 0, 'encodings': 0, 'encode_batches': 0, 'tracked': 0,
+                         'detect_time': 0.0, 'encode_time': 0.0}
+
+    def reset(self):
+        self.tracks = []
+        self.last_ids = []
+        self._force_detect = True
+
+    def _needs_encoding(self, track):
+        if track.encoded_at is None:
+            return True
+        age = self.frame_index - track.encoded_at
+        if age >= self.reencode_every:
+            return True
+        if box_iou(track.box, track.encoded_box) < self.move_iou:
+            return True
+        return track.distance > self.min_confidence and age >= self.retry_every
+
+    def _associate(self, detections):
+        pairs = sorted(((box_iou(track.box, box), t, d)
+                        for t, track in enumerate(self.tracks)
+                        for d, box in enumerate(detections)), reverse=True)
+        used_tracks, used_detections = set(), set()
+        for iou, t, d in pairs:
+            if iou < self.match_iou:
+                break
+            if t in used_tracks or d in used_detections:
+                continue
+            used_tracks.add(t)
+            used_detections.add(d)
+            self.tracks[t].box = detections[d]
+            self.tracks[t].misses = 0
+
+        for t, track in enumerate(self.tracks):
+            if t not in used_tracks:
+                track.misses += 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+        self.tracks.extend(Track(box) for d, box in enumerate(detections) if d not in used_detections)
+
+    def _follow(self, gray):
+        """Move each track to the best template match near its last box"""
+        height, width = gray.shape[:2]
+        lost = False
+        for track in self.tracks:
+            top, right, bottom, left = track.box
+            if track.template is None:
+                continue
+            pad_y, pad_x = (bottom - top) // 2 + 2, (right - left) // 2 + 2
+            y0, y1 = max(0, top - pad_y), min(height, bottom + pad_y)
+            x0, x1 = max(0, left - pad_x), min(width, right + pad_x)
+            window = gray[y0:y1, x0:x1]
+            if window.shape[0] < track.template.shape[0] or window.shape[1] < track.template.shape[1]:
+                track.misses += 1
+                lost = True
+                continue
+
+            scores = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (dx, dy) = cv2.minMaxLoc(scores)
+            if score < self.template_threshold:
+                track.misses += 1
+                lost = True
+                continue
+            track.box = (y0 + dy, x0 + dx + (right - left), y0 + dy + (bottom - top), x0 + dx)
+            self.counters['tracked'] += 1
+
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+        # A lost track triggers a full detection on the next frame
+        self._force_detect = self._force_detect or lost
+
+    def update(self, frame, rgb=None):
+        """Return (face_locations, face_names) for the frame, like recognize_face.
+
+        `rgb` is the frame already converted to RGB, if the caller has it.
+        """
+        try:
+            if len(self.recognizer.gallery) == 0:
+                self.last_ids = []
+                return [], []
+
+            scale = self.recognizer.scale
+            factor = 1.0 / scale
+            if rgb is None:
+                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            # Tracks live on the downscaled frame; encodings need the full one
+            gray = cv2.cvtColor(cv2.resize(rgb, (0, 0), fx=scale, fy=scale), cv2.COLOR_RGB2GRAY)
+
+            if self._force_detect or self.frame_index % self.detect_every == 0:
+                # The recognizer's scheduler picks detection scale and regions
+                started_at = time.perf_counter()
+                detections = [tuple(int(v * scale) for v in box) for box in self.recognizer.detect_faces(frame, rgb)]
+                self.counters['detect_time'] += time.perf_counter() - started_at
+                self._associate(detections)
+                self._force_detect = False
+                self.counters['detections'] += 1
+            else:
+                self._follow(gray)
+
+            stale = [track for track in self.tracks if self._needs_encoding(track)]
+            if stale:
+                started_at = time.perf_counter()
+                boxes = [tuple(int(v * factor) for v in track.box) for track in stale]
+                encodings = face_recognition.face_encodings(rgb, boxes)
+                metrics.observe('face_encodings', started_at)
+                result = self.recognizer.match_encodings(encodings)
+                self.counters['encode_time'] += time.perf_counter() - started_at
+                self.counters['encode_batches'] += 1
+                for track, name, distance in zip(stale, result.names, result.distances):
+                    track.name = name
+                    track.distance = float(distance)
+                    track.encoded_box = track.box
+                    track.encoded_at = self.frame_index
+                self.counters['encodings'] += len(stale)
+
+            for track in self.tracks:
+                top, right, bottom, left = track.box
+                track.template = gray[top:bottom, left:right].copy() if bottom > top and right > left else None
+
+            self.frame_index += 1
+            self.counters['frames'] += 1
+
+            face_locations = [tuple(int(v * factor) for v in track.box) for track in self.tracks]
+            self.last_ids = [track.id for track in self.tracks]
+            return face_locations, [track.name for track in self.tracks]
+        except Exception as e:
+            print(f"Error in face tracking: {e}")
+            metrics.increment('errors', stage='face_tracking')
+            self.reset()
+            return [], []
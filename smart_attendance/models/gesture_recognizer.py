@@ -1,100 +1,80 @@
+import time
+
 import cv2
 import mediapipe as mp
 import numpy as np
 
+from monitoring.metrics import metrics
+
+# Checked in this order; the first matching gesture wins
+GESTURES = ('open_hand', 'fist', 'victory', 'pointing')
+
+FINGER_TIPS = np.array([4, 8, 12, 16, 20])   # thumb, index, middle, ring, pinky
+FINGER_PIPS = np.array([3, 6, 10, 14, 18])   # PIP joints
+FINGER_MCPS = np.array([2, 5, 9, 13, 17])    # MCP joints
+
+def landmarks_to_array(hand_landmarks):
+    """MediaPipe hand landmarks as a (21, 3) float32 array of x, y, z"""
+    return np.array([(lm.x, lm.y, lm.z) for lm in hand_landmarks.landmark], dtype=np.float32)
+
+def classify_landmarks(points):
+    """Classify one (21, 3) or a batch (N, 21, 3) of landmark arrays.
+
+    Returns a gesture name (or None) per hand, as a list for batches.
+    """
+    points = np.asarray(points, dtype=np.float32)
+    single = points.ndim == 2
+    points = points.reshape(-1, 21, points.shape[-1])
+
+    y = points[:, :, 1]
+    tips, pips, mcps = y[:, FINGER_TIPS], y[:, FINGER_PIPS], y[:, FINGER_MCPS]
+    up = tips < pips            # (N, 5) finger extended
+    down = tips > pips          # (N, 5) finger folded below its PIP joint
+    curled = tips[:, 1:] > mcps[:, 1:]  # (N, 4) tip below its MCP joint, thumb excluded
+
+    index, middle, ring, pinky = 1, 2, 3, 4
+    matches = np.stack([
+        up.sum(axis=1) >= 4,                                                      # open_hand
+        curled.sum(axis=1) >= 3,                                                  # fist
+        up[:, index] & up[:, middle] & down[:, ring] & down[:, pinky],            # victory
+        up[:, index] & down[:, middle] & down[:, ring] & down[:, pinky],          # pointing
+    ], axis=1)
+
+    first = np.argmax(matches, axis=1)
+    names = [GESTURES[i] if matches[n, i] else None for n, i in enumerate(first)]
+    return names[0] if single else names
+
 class GestureRecognizer:
-    def __init__(self):
+    def __init__(self, max_num_hands=1):
         self.mp_hands = mp.solutions.hands
         self.hands = self.mp_hands.Hands(
             static_image_mode=False,
-            max_num_hands=1,
+            max_num_hands=max_num_hands,
             min_detection_confidence=0.5,
             min_tracking_confidence=0.5
         )
         self.mp_draw = mp.solutions.drawing_utils
-        
-        # Gesture definitions
-        self.gestures = {
-            'open_hand': self.is_open_hand,
-            'fist': self.is_fist,
-            'victory': self.is_victory,
-            'pointing': self.is_pointing
-        }
-    
-    def detect_hands(self, frame):
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        self.gestures = GESTURES
+
+    def detect_hands(self, frame, rgb=None):
+        """Landmarks of every detected hand (up to max_num_hands), possibly empty.
+
+        Pass `rgb` (the frame or a crop of it, already in RGB) to skip the
+        colour conversion; landmarks are then relative to that image.
+        """
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) if rgb is None else rgb
+        started_at = time.perf_counter()
         results = self.hands.process(rgb_frame)
-        
-        hand_landmarks = None
-        if results.multi_hand_landmarks:
-            hand_landmarks = results.multi_hand_landmarks[0]
-        
-        return hand_landmarks
-    
-    def is_open_hand(self, landmarks):
-        # Check if all fingers are extended
-        finger_tips = [4, 8, 12, 16, 20]  # thumb, index, middle, ring, pinky
-        finger_pips = [3, 6, 10, 14, 18]  # PIP joints
-        
-        extended_fingers = 0
-        for tip, pip in zip(finger_tips, finger_pips):
-            if landmarks.landmark[tip].y < landmarks.landmark[pip].y:
-                extended_fingers += 1
-        
-        return extended_fingers >= 4
-    
-    def is_fist(self, landmarks):
-        # Check if all fingers are curled
-        finger_tips = [8, 12, 16, 20]  # index, middle, ring, pinky
-        finger_mcps = [5, 9, 13, 17]   # MCP joints
-        
-        curled_fingers = 0
-        for tip, mcp in zip(finger_tips, finger_mcps):
-            if landmarks.landmark[tip].y > landmarks.landmark[mcp].y:
-                curled_fingers += 1
-        
-        return curled_fingers >= 3
-    
-    def is_victory(self, landmarks):
-        # Check if index and middle fingers are up, others down
-        index_tip = landmarks.landmark[8]
-        middle_tip = landmarks.landmark[12]
-        ring_tip = landmarks.landmark[16]
-        pinky_tip = landmarks.landmark[20]
-        
-        index_pip = landmarks.landmark[6]
-        middle_pip = landmarks.landmark[10]
-        ring_pip = landmarks.landmark[14]
-        pinky_pip = landmarks.landmark[18]
-        
-        index_up = index_tip.y < index_pip.y
-        middle_up = middle_tip.y < middle_pip.y
-        ring_down = ring_tip.y > ring_pip.y
-        pinky_down = pinky_tip.y > pinky_pip.y
-        
-        return index_up and middle_up and ring_down and pinky_down
-    
-    def is_pointing(self, landmarks):
-        # Check if only index finger is extended
-        index_tip = landmarks.landmark[8]
-        middle_tip = landmarks.landmark[12]
-        ring_tip = landmarks.landmark[16]
-        pinky_tip = landmarks.landmark[20]
-        
-        index_pip = landmarks.landmark[6]
-        middle_pip = landmarks.landmark[10]
-        ring_pip = landmarks.landmark[14]
-        pinky_pip = landmarks.landmark[18]
-        
-        index_up = index_tip.y < index_pip.y
-        middle_down = middle_tip.y > middle_pip.y
-        ring_down = ring_tip.y > ring_pip.y
-        pinky_down = pinky_tip.y > pinky_pip.y
-        
-        return index_up and middle_down and ring_down and pinky_down
-    
+        metrics.observe('hands_process', started_at)
+        return list(results.multi_hand_landmarks or [])
+
+    def recognize_gestures(self, hands):
+        """One gesture name (or None) per hand, classified in a single pass"""
+        if not hands:
+            return []
+        return classify_landmarks(np.stack([landmarks_to_array(hand) for hand in hands]))
+
     def recognize_gesture(self, landmarks):
-        for gesture_name, gesture_func in self.gestures.items():
-            if gesture_func(landmarks):
-                return gesture_name
-        return None
\ No newline at end of file
+        if isinstance(landmarks, np.ndarray):
+            return classify_landmarks(landmarks)
+        return classify_landmarks(landmarks_to_array(landmarks))
\ No newline at end of file
@@ -0,0 +1,65 @@
+import threading
+import time
+
+
+class LazyModel:
+    """Stand-in for a model that is built on first use.
+
+    Attribute access builds the object with `factory()` the first time,
+    under a lock so concurrent first users wait for one build instead of
+    starting their own, and is forwarded to it from then on. Factories
+    import the vision stack themselves, so importing the app stays cheap
+    and routes that never touch a model never load one. A factory that
+    raises leaves the model unbuilt and is tried again on the next use.
+    """
+
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self.load_time = None
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._instance is not None
+
+    def get(self):
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                if self._instance is None:
+                    started_at = time.perf_counter()
+                    self._instance = self.factory()
+                    self.load_time = time.perf_counter() - started_at
+                    print(f"Loaded {self.name} in {self.load_time:.2f}s")
+                instance = self._instance
+        return instance
+
+    def __getattr__(self, attr):
+        # Only reached for attributes LazyModel itself does not have
+        return getattr(self.get(), attr)
+
+    def report(self):
+        return {'loaded': self.loaded,
+                'load_s': round(self.load_time, 3) if self.load_time is not None else None}
+
+
+def warm_up(models, background=True):
+    """Build `models` now, in a daemon thread unless background is False.
+
+    Returns the thread, or None when the models were built in the caller.
+    """
+    def build():
+        for model in models:
+            try:
+                model.get()
+            except Exception as e:
+                print(f"Error loading {model.name}: {e}")
+
+    if not background:
+        build()
+        return None
+    thread = threading.Thread(target=build, name='model-warm-up', daemon=True)
+    thread.start()
+    return thread
@@ -1,6 +1,7 @@
 import cv2
+import face_recognition
 import os
-from face_recognizer import FaceRecognizer
+from models.face_recognizer import FaceRecognizer
 
 def collect_face_data(name, num_samples=10):
     """Collect face data for a new student"""
@@ -9,6 +10,7 @@ def collect_face_data(name, num_samples=10):
     
     cap = cv2.VideoCapture(0)
     count = 0
+    recognizer = FaceRecognizer()
     
     print(f"Collecting {num_samples} face samples for {name}...")
     
@@ -31,8 +33,7 @@ def collect_face_data(name, num_samples=10):
             print(f"Collected sample {count}/{num_samples}")
             
             # Add encoding to recognizer
-            recognizer = FaceRecognizer()
-            recognizer.add_face_encoding(filename, name)
+            recognizer.add_face_encoding(face_image, name)
         
         cv2.imshow('Collecting Face Data', frame)
         if cv2.waitKey(1) & 0xFF == ord('q'):
@@ -40,7 +41,9 @@ def collect_face_data(name, num_samples=10):
     
     cap.release()
     cv2.destroyAllWindows()
+    recognizer.save_known_faces()
     print("Face data collection completed!")
+    print("To enroll folders of existing images, use: python -m models.batch_enroll")
 
 if __name__ == "__main__":
     name = input("Enter student name: ")
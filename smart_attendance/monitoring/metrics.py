@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds in seconds, from sub-millisecond calls to multi-second stalls
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, Prometheus style"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def cumulative(self):
+        with self._lock:
+            counts = list(self.counts)
+        total, result = 0, []
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        """Estimate by linear interpolation inside the bucket holding the quantile"""
+        with self._lock:
+            counts, count, maximum = list(self.counts), self.count, self.max
+        if count == 0:
+            return 0.0
+        rank = q * count
+        seen, lower = 0, 0.0
+        for bound, bucket_count in zip(self.buckets + (maximum,), counts):
+            if bucket_count and seen + bucket_count >= rank:
+                upper = min(bound, maximum)
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+            lower = bound
+        return maximum
+
+    def summary(self):
+        return {'count': self.count,
+                'avg_ms': round(self.sum / self.count * 1000, 3) if self.count else 0.0,
+                'p50_ms': round(self.quantile(0.5) * 1000, 3),
+                'p95_ms': round(self.quantile(0.95) * 1000, 3),
+                'p99_ms': round(self.quantile(0.99) * 1000, 3),
+                'max_ms': round(self.max * 1000, 3)}
+
+
+class Metrics:
+    """Process-wide latency histograms, counters and scrape-time gauges.
+
+    Hot paths call observe(stage, started_at) with a time.perf_counter()
+    start; when disabled (PERF_METRICS=0) that returns immediately. Gauges
+    such as FPS, queue depths and gallery size are not recorded at all:
+    collectors registered with add_collector() read them from the live
+    objects when /metrics or /api/perf is requested.
+    """
+
+    def __init__(self, enabled=True, prefix='attendance'):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.stages = {}
+        self.counters = {}
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def observe(self, stage, started_at):
+        if not self.enabled:
+            return
+        elapsed = time.perf_counter() - started_at
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stages.setdefault(stage, Histogram())
+        histogram.observe(elapsed)
+
+    def increment(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def reset(self):
+        """Forget recorded latencies and counters; collectors stay registered"""
+        with self._lock:
+            self.stages = {}
+            self.counters = {}
+
+    def add_collector(self, collector):
+        """collector() returns [(name, help, {labels}, value), ...] of gauges"""
+        self.collectors.append(collector)
+
+    def gauges(self):
+        gauges = []
+        for collector in self.collectors:
+            try:
+                gauges.extend(collector())
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+        return gauges
+
+    def snapshot(self):
+        """JSON form: stage latency summaries, counters and gauges"""
+        with self._lock:
+            stages = dict(self.stages)
+            counters = dict(self.counters)
+        gauges = {}
+        for name, _, labels, value in self.gauges():
+            key = name + ''.join(f"[{v}]" for _, v in sorted(labels.items()))
+            gauges[key] = value
+        return {
+            'enabled': self.enabled,
+            'stages': {stage: histogram.summary() for stage, histogram in sorted(stages.items())},
+            'counters': {name + ''.join(f"[{v}]" for _, v in labels): value
+                         for (name, labels), value in sorted(counters.items())},
+            'gauges': gauges,
+        }
+
+    def prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        name = f"{self.prefix}_stage_seconds"
+        with self._lock:
+            stages = sorted(self.stages.items())
+            counters = sorted(self.counters.items())
+        lines.append(f"# HELP {name} Latency of recognition loop stages and storage calls")
+        lines.append(f"# TYPE {name} histogram")
+        for stage, histogram in stages:
+            for bound, count in histogram.cumulative():
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {count}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+
+        declared = set()
+        for (counter, labels), value in counters:
+            metric = f"{self.prefix}_{counter}_total"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_labels(dict(labels))} {value}")
+
+        # Samples of one metric family must be contiguous
+        for gauge, help_text, labels, value in sorted(self.gauges(), key=lambda g: g[0]):
+            metric = f"{self.prefix}_{gauge}"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric}{_labels(labels)} {float(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in labels.values())
+    return '{' + ','.join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + '}'
+
+
+metrics = Metrics(enabled=os.environ.get('PERF_METRICS', '1') != '0')
@@ -1,18 +1,22 @@
+// Query string for the filters currently shown on the attendance page
+function attendanceFilters() {
+    const form = document.getElementById('attendance-filters');
+    const params = form ? new URLSearchParams(new FormData(form)) : new URLSearchParams();
+    for (const [key, value] of [...params.entries()]) {
+        if (!value) params.delete(key);
+    }
+    return params;
+}
+
 // Update attendance statistics
 async function updateStats() {
     try {
-        const response = await fetch('/api/attendance');
-        const data = await response.json();
+        // Today's headcount comes from the precomputed summary
+        const summary = await (await fetch('/api/attendance/summary')).json();
+        document.getElementById('today-count').textContent = summary.today_count;
         
-        // Calculate today's attendance
-        const today = new Date().toISOString().split('T')[0];
-        const todayCount = data.filter(record => record.Date === today).length;
-        
-        document.getElementById('today-count').textContent = todayCount;
-        
-        // Calculate unique students (simplified)
-        const uniqueStudents = new Set(data.map(record => record.Name)).size;
-        document.getElementById('total-students').textContent = uniqueStudents;
+        const students = await (await fetch('/api/students')).json();
+        document.getElementById('total-students').textContent = students.length;
         
     } catch (error) {
         console.error('Error fetching attendance data:', error);
@@ -22,13 +26,13 @@ async function updateStats() {
 // Load attendance records
 async function loadAttendance() {
     try {
-        const response = await fetch('/api/attendance');
+        const response = await fetch('/api/attendance?' + attendanceFilters().toString());
         const data = await response.json();
         
         const tbody = document.getElementById('attendance-body');
         tbody.innerHTML = '';
         
-        data.forEach(record => {
+        data.records.forEach(record => {
             const row = document.createElement('tr');
             row.innerHTML = `
                 <td>${record.Name}</td>
@@ -46,8 +50,10 @@ async function loadAttendance() {
 
 // Export attendance to CSV
 function exportAttendance() {
-    // This would typically make a request to generate and download a CSV file
-    alert('Export feature would be implemented here');
+    // Streamed server-side, so large exports never load into the page
+    const params = attendanceFilters();
+    params.set('format', 'csv');
+    window.location.href = '/api/attendance?' + params.toString();
 }
 
 // Initialize the page
@@ -56,8 +62,5 @@ document.addEventListener('DOMContentLoaded', function() {
     updateStats();
     setInterval(updateStats, 30000);
     
-    // Load attendance if on attendance page
-    if (document.getElementById('attendance-body')) {
-        loadAttendance();
-    }
+    // Attendance rows are rendered server-side, one page at a time
 });
\ No newline at end of file
@@ -0,0 +1,184 @@
+import csv
+import io
+import os
+import threading
+from datetime import datetime
+
+FIELDS = ['Name', 'Date', 'Time', 'Status']
+
+
+class AttendanceLedger:
+    """Append-only attendance CSV with an in-memory (name, date) index.
+
+    Each mark appends one row and fsyncs it; the whole file is never read
+    or rewritten. Duplicate checks hit a set of today's (name, date) keys,
+    rebuilt at startup by scanning the file backwards only as far as
+    today's rows go. A lock serializes concurrent marks.
+    """
+
+    def __init__(self, path='data/attendance.csv', durable=True):
+        self.path = path
+        self.durable = durable
+        self._lock = threading.Lock()
+        self._marked = set()
+        self._index_date = None
+        self._ensure_file()
+        self._rebuild_index(datetime.now().strftime("%Y-%m-%d"))
+
+    def _ensure_file(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            with open(self.path, 'w', newline='') as f:
+                csv.writer(f, lineterminator='\n').writerow(FIELDS)
+            return
+
+        # Make sure appended rows start on their own line
+        with open(self.path, 'rb+') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) not in (b'\n', b'\r'):
+                f.write(b'\n')
+
+    def _header(self):
+        with open(self.path, newline='') as f:
+            return next(csv.reader(f), FIELDS)
+
+    def _tail_lines(self, block_size=65536):
+        """Yield data lines from the end of the file towards the start"""
+        with open(self.path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            remainder = b''
+            while position > 0:
+                step = min(block_size, position)
+                position -= step
+                f.seek(position)
+                lines = (f.read(step) + remainder).split(b'\n')
+                remainder = lines.pop(0)
+                for line in reversed(lines):
+                    if line.strip():
+                        yield line
+            # What remains is the first line of the file, the header
+
+    def _rebuild_index(self, date):
+        header = self._header()
+        name_col, date_col = header.index('Name'), header.index('Date')
+        marked = set()
+        for line in self._tail_lines():
+            row = next(csv.reader(io.StringIO(line.decode('utf-8'))), [])
+            if len(row) <= max(name_col, date_col):
+                continue
+            # Rows are appended in time order, so older dates end the scan
+            if row[date_col] < date:
+                break
+            if row[date_col] == date:
+                marked.add((row[name_col], date))
+        self._marked = marked
+        self._index_date = date
+
+    def is_marked(self, name, date):
+        return (name, date) in self._marked
+
+    def mark(self, name, status='Present', now=None):
+        """Append one attendance row unless `name` is already marked today"""
+        now = now or datetime.now()
+        date = now.strftime("%Y-%m-%d")
+        time = now.strftime("%H:%M:%S")
+
+        with self._lock:
+            if date != self._index_date:
+                # New day: yesterday's keys can never collide again
+                self._marked = set()
+                self._index_date = date
+            if (name, date) in self._marked:
+                return False, "Attendance already marked today"
+
+            with open(self.path, 'a', newline='') as f:
+                csv.writer(f, lineterminator='\n').writerow([name, date, time, status])
+                f.flush()
+                if self.durable:
+                    os.fsync(f.fileno())
+            self._marked.add((name, date))
+        return True, "Attendance marked successfully"
+
+    def _parse(self, header, line):
+        row = next(csv.reader(io.StringIO(line.decode('utf-8'))), [])
+        return dict(zip(header, row)) if len(row) >= len(header) else None
+
+    def _line_at(self, f, position, data_start):
+        """Start offset and content of the first line starting at or after position"""
+        if position <= data_start:
+            f.seek(data_start)
+        else:
+            f.seek(position - 1)
+            f.readline()
+        line_start = f.tell()
+        return line_start, f.readline()
+
+    def _offset_for_date(self, f, header, date, data_start, end):
+        """Binary search for the first row dated on or after `date`.
+
+        Rows are appended in time order, so the file is sorted by date.
+        """
+        lo, hi = data_start, end
+        while lo < hi:
+            mid = (lo + hi) // 2
+            _, line = self._line_at(f, mid, data_start)
+            row = self._parse(header, line) if line else None
+            if line and (row is None or row['Date'] < date):
+                lo = mid + 1
+            else:
+                hi = mid
+        return self._line_at(f, lo, data_start)[0]
+
+    def _scan(self, query=None, cursor=None):
+        """Yield (row, offset after the row) for matching rows from a cursor"""
+        with open(self.path, 'rb') as f:
+            header = next(csv.reader([f.readline().decode('utf-8')]), FIELDS)
+            data_start = f.tell()
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+
+            offset = max(int(cursor), data_start) if cursor else data_start
+            if query is not None and query.start:
+                offset = max(offset, self._offset_for_date(f, header, query.start, data_start, end))
+
+            f.seek(offset)
+            while True:
+                line = f.readline()
+                if not line:
+                    return
+                row = self._parse(header, line)
+                if row is None:
+                    continue
+                if query is not None and query.end and row['Date'] > query.end:
+                    return
+                if query is None or query.matches(row):
+                    yield row, f.tell()
+
+    def records(self, query=None):
+        """Iterate matching rows as dicts, oldest first, without loading the file"""
+        for row, _ in self._scan(query):
+            yield row
+
+    def records_since(self, cursor=None):
+        """Yield (row, cursor) for every row after `cursor`, for replaying the ledger"""
+        for row, offset in self._scan(None, cursor):
+            yield row, str(offset)
+
+    def end_cursor(self):
+        return str(os.path.getsize(self.path))
+
+    def page(self, query=None, cursor=None, limit=100):
+        """Up to `limit` matching rows after `cursor`, and the cursor for the next page.
+
+        The cursor is the byte offset just past the last returned row.
+        """
+        rows, next_cursor = [], None
+        for row, offset in self._scan(query, cursor):
+            if len(rows) == limit:
+                break
+            rows.append(row)
+            next_cursor = str(offset)
+        else:
+            next_cursor = None
+        return rows, next_cursor
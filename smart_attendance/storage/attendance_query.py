@@ -0,0 +1,46 @@
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+class AttendanceQuery:
+    """Filters for attendance listings: date range, name(s) and status.
+
+    `names` restricts results to a set of names (e.g. every student in a
+    department); an empty set matches nothing.
+    """
+
+    def __init__(self, start=None, end=None, name=None, names=None, status=None, department=None):
+        self.start = start or None
+        self.end = end or None
+        self.name = name or None
+        self.names = names
+        self.status = status or None
+        # The SQLite store filters on the department itself; the CSV ledger
+        # needs it resolved to `names`
+        self.department = department or None
+
+    def matches(self, row):
+        if self.start and row['Date'] < self.start:
+            return False
+        if self.end and row['Date'] > self.end:
+            return False
+        if self.name and row['Name'] != self.name:
+            return False
+        if self.names is not None and row['Name'] not in self.names:
+            return False
+        if self.status and row['Status'] != self.status:
+            return False
+        return True
+
+    def as_args(self):
+        """The filters as query-string arguments, for building page links"""
+        args = {'start': self.start, 'end': self.end, 'name': self.name,
+                'status': self.status, 'department': self.department}
+        return {key: value for key, value in args.items() if value}
+
+
+def parse_limit(value, default=DEFAULT_LIMIT):
+    limit = int(value) if value not in (None, '') else default
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return min(limit, MAX_LIMIT)
@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+import time
+from datetime import date as Date, timedelta
+
+
+def _previous_day(day):
+    return (Date.fromisoformat(day) - timedelta(days=1)).isoformat()
+
+
+class AttendanceAggregates:
+    """Attendance rollups updated on every mark instead of recomputed per request.
+
+    Holds per-day headcounts, per-student totals and streaks and
+    per-department totals. The state is checkpointed to JSON together with
+    the ledger position it covers, so startup only replays rows appended
+    after the checkpoint.
+    """
+
+    def __init__(self, path='data/attendance_summary.json', save_interval=10.0):
+        self.path = path
+        self.save_interval = save_interval
+        self.lock = threading.RLock()
+        self.position = None
+        self._last_save = 0.0
+        self._dirty = False
+        self.reset()
+
+    def reset(self):
+        self.daily = {}
+        self.students = {}
+        self.departments = {}
+
+    def record(self, name, day, department=''):
+        """Fold one attendance row into the rollups"""
+        with self.lock:
+            self.daily[day] = self.daily.get(day, 0) + 1
+
+            student = self.students.get(name)
+            if student is None:
+                student = self.students[name] = {'total': 0, 'first': day, 'last': None,
+                                                 'streak': 0, 'best_streak': 0}
+            student['total'] += 1
+            if student['last'] == _previous_day(day):
+                student['streak'] += 1
+            elif student['last'] != day:
+                student['streak'] = 1
+            student['last'] = day
+            student['best_streak'] = max(student['best_streak'], student['streak'])
+
+            department = department or 'Unassigned'
+            totals = self.departments.setdefault(department, {'total': 0, 'daily': {}})
+            totals['total'] += 1
+            totals['daily'][day] = totals['daily'].get(day, 0) + 1
+            self._dirty = True
+
+    def replay(self, store, department_of, cursor=None):
+        """Record every ledger row after `cursor`, returns the number replayed"""
+        count = 0
+        with self.lock:
+            for row, position in store.records_since(cursor):
+                self.record(row['Name'], row['Date'], department_of(row['Name']))
+                self.position = position
+                count += 1
+        return count
+
+    def summary(self, today):
+        with self.lock:
+            return {
+                'today': today,
+                'today_count': self.daily.get(today, 0),
+                'total_records': sum(s['total'] for s in self.students.values()),
+                'days_recorded': len(self.daily),
+                'students_seen': len(self.students),
+                'departments': {name: d['total'] for name, d in self.departments.items()},
+            }
+
+    def daily_counts(self, start=None, end=None):
+        with self.lock:
+            return {day: count for day, count in sorted(self.daily.items())
+                    if (not start or day >= start) and (not end or day <= end)}
+
+    def student(self, name):
+        """Totals, streaks and attendance rate (share of recorded days attended)"""
+        with self.lock:
+            student = self.students.get(name)
+            if student is None:
+                return None
+            days = len(self.daily)
+            return dict(student, name=name, rate=round(student['total'] / days, 4) if days else 0.0)
+
+    def all_students(self):
+        with self.lock:
+            return [self.student(name) for name in sorted(self.students)]
+
+    def department_totals(self):
+        with self.lock:
+            return {name: {'total': d['total'], 'days': len(d['daily'])}
+                    for name, d in sorted(self.departments.items())}
+
+    def state(self):
+        with self.lock:
+            return {'daily': self.daily, 'students': self.students, 'departments': self.departments}
+
+    def load(self):
+        """Restore the last checkpoint, returns False if there is none"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except ValueError:
+            return False
+        with self.lock:
+            self.daily = data.get('daily', {})
+            self.students = data.get('students', {})
+            self.departments = data.get('departments', {})
+            self.position = data.get('position')
+        return True
+
+    def save(self):
+        with self.lock:
+            data = dict(self.state(), position=self.position)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            self._last_save = time.monotonic()
+
+    def maybe_save(self):
+        """Checkpoint at most once per save_interval"""
+        if self._dirty and time.monotonic() - self._last_save >= self.save_interval:
+            self.save()
+
+    def verify(self, other):
+        """Differences between these rollups and another set, e.g. a rebuild"""
+        mine, theirs = self.state(), other.state()
+        problems = []
+        for section in ('daily', 'students', 'departments'):
+            for key in sorted(set(mine[section]) | set(theirs[section])):
+                if mine[section].get(key) != theirs[section].get(key):
+                    problems.append(f"{section}[{key}]: {mine[section].get(key)} != {theirs[section].get(key)}")
+        return problems
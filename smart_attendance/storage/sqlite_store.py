@@ -0,0 +1,186 @@
+import csv
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    student_id TEXT NOT NULL DEFAULT '',
+    department TEXT NOT NULL DEFAULT '',
+    registered_at TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_students_name ON students(name);
+CREATE INDEX IF NOT EXISTS idx_students_student_id ON students(student_id);
+CREATE INDEX IF NOT EXISTS idx_students_department ON students(department);
+
+CREATE TABLE IF NOT EXISTS attendance (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    date TEXT NOT NULL,
+    time TEXT NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_name_date ON attendance(name, date);
+CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance(date);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+ATTENDANCE_COLUMNS = "name AS Name, date AS Date, time AS Time, status AS Status"
+STUDENT_COLUMNS = "name, student_id AS id, department, registered_at"
+
+
+class SQLiteStore:
+    """Students and attendance in one SQLite database in WAL mode.
+
+    Each thread gets its own connection. On first open, rows from the
+    legacy attendance CSV and students JSON are imported once.
+    """
+
+    def __init__(self, path='data/attendance.db', attendance_csv=None, students_json=None):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+        self.import_legacy(attendance_csv, students_json)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _imported(self, conn, key):
+        return conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone() is not None
+
+    def import_legacy(self, attendance_csv=None, students_json=None):
+        """Copy existing CSV/JSON data in, once per source"""
+        with self._connection() as conn:
+            if attendance_csv and os.path.exists(attendance_csv) and not self._imported(conn, 'attendance_csv'):
+                with open(attendance_csv, newline='') as f:
+                    rows = ((r.get('Name', ''), r.get('Date', ''), r.get('Time', ''), r.get('Status', 'Present'))
+                            for r in csv.DictReader(f))
+                    conn.executemany("INSERT OR IGNORE INTO attendance (name, date, time, status) "
+                                     "VALUES (?, ?, ?, ?)", rows)
+                conn.execute("INSERT INTO meta (key, value) VALUES ('attendance_csv', ?)",
+                             (datetime.now().isoformat(),))
+
+            if students_json and os.path.exists(students_json) and not self._imported(conn, 'students_json'):
+                try:
+                    with open(students_json) as f:
+                        students = json.load(f)
+                except ValueError:
+                    students = []
+                conn.executemany("INSERT INTO students (name, student_id, department, registered_at) "
+                                 "VALUES (?, ?, ?, ?)",
+                                 [(s.get('name', ''), s.get('id', ''), s.get('department', ''),
+                                   s.get('registered_at', '')) for s in students])
+                conn.execute("INSERT INTO meta (key, value) VALUES ('students_json', ?)",
+                             (datetime.now().isoformat(),))
+
+    def mark(self, name, status='Present', now=None):
+        """Insert one attendance row, the (name, date) index rejects duplicates"""
+        now = now or datetime.now()
+        with self._connection() as conn:
+            cursor = conn.execute("INSERT OR IGNORE INTO attendance (name, date, time, status) VALUES (?, ?, ?, ?)",
+                                  (name, now.strftime("%Y-%m-%d"), now.strftime("%H:%M:%S"), status))
+        if cursor.rowcount == 0:
+            return False, "Attendance already marked today"
+        return True, "Attendance marked successfully"
+
+    def is_marked(self, name, date):
+        row = self._connection().execute("SELECT 1 FROM attendance WHERE name = ? AND date = ?",
+                                         (name, date)).fetchone()
+        return row is not None
+
+    def _where(self, query, after_id=None):
+        clauses, params = [], []
+        if after_id is not None:
+            clauses.append("id > ?")
+            params.append(after_id)
+        if query is not None:
+            if query.start:
+                clauses.append("date >= ?")
+                params.append(query.start)
+            if query.end:
+                clauses.append("date <= ?")
+                params.append(query.end)
+            if query.name:
+                clauses.append("name = ?")
+                params.append(query.name)
+            if query.department:
+                # Resolved in SQL through the department index, not by loading students
+                clauses.append("name IN (SELECT name FROM students WHERE department = ?)")
+                params.append(query.department)
+            elif query.names is not None:
+                clauses.append(f"name IN ({', '.join('?' * len(query.names))})" if query.names else "0")
+                params.extend(sorted(query.names))
+            if query.status:
+                clauses.append("status = ?")
+                params.append(query.status)
+        return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+    def records(self, query=None):
+        """Matching attendance rows oldest first, streamed from the cursor"""
+        where, params = self._where(query)
+        cursor = self._connection().execute(f"SELECT {ATTENDANCE_COLUMNS} FROM attendance {where} ORDER BY id",
+                                            params)
+        for row in cursor:
+            yield dict(row)
+
+    def records_since(self, cursor=None):
+        """Yield (row, cursor) for every row after `cursor`, for replaying the ledger"""
+        rows = self._connection().execute(f"SELECT id, {ATTENDANCE_COLUMNS} FROM attendance WHERE id > ? ORDER BY id",
+                                          (int(cursor) if cursor else 0,))
+        for row in rows:
+            yield {key: row[key] for key in ('Name', 'Date', 'Time', 'Status')}, str(row['id'])
+
+    def end_cursor(self):
+        row = self._connection().execute("SELECT MAX(id) FROM attendance").fetchone()
+        return str(row[0] or 0)
+
+    def page(self, query=None, cursor=None, limit=100):
+        """Up to `limit` matching rows after `cursor` (the last row id seen)"""
+        where, params = self._where(query, int(cursor) if cursor else None)
+        rows = self._connection().execute(
+            f"SELECT id, {ATTENDANCE_COLUMNS} FROM attendance {where} ORDER BY id LIMIT ?",
+            params + [limit + 1]).fetchall()
+        next_cursor = str(rows[limit - 1]['id']) if len(rows) > limit else None
+        return [{key: row[key] for key in ('Name', 'Date', 'Time', 'Status')} for row in rows[:limit]], next_cursor
+
+    def students(self):
+        cursor = self._connection().execute(f"SELECT {STUDENT_COLUMNS} FROM students ORDER BY id")
+        return [dict(row) for row in cursor]
+
+    def find_student(self, name=None, student_id=None):
+        if student_id:
+            row = self._connection().execute(f"SELECT {STUDENT_COLUMNS} FROM students WHERE student_id = ?",
+                                             (student_id,)).fetchone()
+        else:
+            row = self._connection().execute(f"SELECT {STUDENT_COLUMNS} FROM students WHERE name = ?",
+                                             (name,)).fetchone()
+        return dict(row) if row else None
+
+    def add_student(self, student):
+        with self._connection() as conn:
+            conn.execute("INSERT INTO students (name, student_id, department, registered_at) VALUES (?, ?, ?, ?)",
+                         (student.get('name', ''), student.get('id', ''), student.get('department', ''),
+                          student.get('registered_at', '')))
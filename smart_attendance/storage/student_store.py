@@ -0,0 +1,29 @@
+import json
+import os
+import threading
+
+
+class JsonStudentStore:
+    """Student records kept in data/students.json"""
+
+    def __init__(self, path='data/students.json'):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def students(self):
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            try:
+                with open(self.path, 'r') as f:
+                    return json.load(f)
+            except Exception:
+                return []
+        return []
+
+    def add_student(self, student):
+        with self._lock:
+            students = self.students()
+            students.append(student)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(students, f, indent=2)
+            os.replace(tmp_path, self.path)
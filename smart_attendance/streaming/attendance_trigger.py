@@ -0,0 +1,128 @@
+import threading
+import time
+from datetime import date as Date
+
+
+class AttendanceTrigger:
+    """Per-identity state machine that turns gesture frames into attendance marks.
+
+    An identity is marked once `confirm_frames` consecutive fresh gesture
+    results show `gesture` from a hand bound to the same face track. A hand
+    is bound to the nearest recognized face whose centre is within
+    `bind_distance` face widths of the palm. Held (not fresh) results
+    neither advance nor reset the count.
+
+    Each identity is marked at most once per session (per day while the
+    pipeline runs); identities the store already has for today are
+    remembered without writing. After a failed write the identity waits
+    `cooldown` seconds before it can be confirmed again.
+
+    mark(name) returns (success, message); is_marked(name, date) is optional.
+    """
+
+    def __init__(self, mark, is_marked=None, confirm_frames=4, cooldown=5.0, bind_distance=3.0,
+                 gesture='open_hand', clock=time.monotonic):
+        self.mark = mark
+        self.is_marked = is_marked
+        self.confirm_frames = confirm_frames
+        self.cooldown = cooldown
+        self.bind_distance = bind_distance
+        self.gesture = gesture
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.progress = {}       # track id -> (name, consecutive frames)
+        self.cooldown_until = {}  # name -> clock time
+        self.marked = set()
+        self.session_day = None
+        self.last_mark = None    # (name, clock time)
+        self.counters = {'frames': 0, 'bound': 0, 'confirmed': 0, 'marks': 0, 'already_marked': 0,
+                         'cooling_down': 0, 'failed': 0}
+
+    def _start_session(self, today):
+        if today != self.session_day:
+            self.session_day = today
+            self.marked = set()
+            self.cooldown_until = {}
+
+    def bind(self, faces, points):
+        """Track ids whose face has a palm point within bind_distance face widths"""
+        bound = set()
+        for x, y in points:
+            best, best_distance = None, self.bind_distance
+            for (top, right, bottom, left), track_id in faces:
+                width = max(1, right - left)
+                cx, cy = (left + right) / 2, (top + bottom) / 2
+                distance = ((x - cx) ** 2 + (y - cy) ** 2) ** 0.5 / width
+                if distance <= best_distance:
+                    best, best_distance = track_id, distance
+            if best is not None:
+                bound.add(best)
+        return bound
+
+    def update(self, face, gesture, today=None):
+        """Advance the state machine with the latest face and gesture results"""
+        if not gesture.get('fresh', True):
+            return self
+        with self.lock:
+            self._start_session(today or Date.today().isoformat())
+            self.counters['frames'] += 1
+
+            names = dict(zip(face['track_ids'], face['names']))
+            known = [(box, track_id) for box, track_id, name
+                     in zip(face['locations'], face['track_ids'], face['names']) if name != "Unknown"]
+            points = [point for point, name in zip(gesture['points'], gesture['gestures']) if name == self.gesture]
+            bound = self.bind(known, points) if points else set()
+            self.counters['bound'] += len(bound)
+
+            # Tracks that left, changed identity or lowered the hand start over
+            progress = {}
+            for track_id in bound:
+                name = names[track_id]
+                previous_name, count = self.progress.get(track_id, (name, 0))
+                progress[track_id] = (name, count + 1 if previous_name == name else 1)
+            self.progress = progress
+
+            for track_id, (name, count) in list(progress.items()):
+                if count >= self.confirm_frames:
+                    del self.progress[track_id]
+                    self._confirm(name)
+        return self
+
+    def _confirm(self, name):
+        self.counters['confirmed'] += 1
+        now = self.clock()
+        if name in self.marked:
+            self.counters['already_marked'] += 1
+            return
+        if self.cooldown_until.get(name, 0) > now:
+            self.counters['cooling_down'] += 1
+            return
+        if self.is_marked is not None and self.is_marked(name, self.session_day):
+            self.counters['already_marked'] += 1
+            self.marked.add(name)
+            return
+
+        success, message = self.mark(name)
+        if success:
+            self.counters['marks'] += 1
+            self.marked.add(name)
+            self.last_mark = (name, now)
+        else:
+            self.counters['failed'] += 1
+            self.cooldown_until[name] = now + self.cooldown
+            print(f"Attendance for {name} not marked: {message}")
+
+    def pending(self):
+        """(name, frames confirmed so far) for identities currently confirming"""
+        with self.lock:
+            return [(name, count) for name, count in self.progress.values() if name not in self.marked]
+
+    def recent_mark(self, within=2.0):
+        """Name marked within the last `within` seconds, if any"""
+        if self.last_mark and self.clock() - self.last_mark[1] < within:
+            return self.last_mark[0]
+        return None
+
+    def report(self):
+        with self.lock:
+            return dict(self.counters, marked_this_session=len(self.marked), confirming=len(self.progress))
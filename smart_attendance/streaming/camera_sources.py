@@ -0,0 +1,160 @@
+import glob
+import os
+import time
+from abc import ABC, abstractmethod
+
+import cv2
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def parse_source(source):
+    """USB index for digit strings, otherwise a URL or file path unchanged"""
+    if isinstance(source, int):
+        return source
+    source = str(source).strip()
+    return int(source) if source.isdigit() else source
+
+
+class ReplaySource(ABC):
+    """Recorded frames played back like a camera.
+
+    Frames are paced to `fps` when `realtime` is set and delivered as fast
+    as they can be decoded otherwise, and playback restarts at the end when
+    `loop` is set, so a recording can stand in for a door camera in tests,
+    demos and benchmarks. Subclasses implement _next() and _rewind().
+    """
+
+    def __init__(self, loop=True, realtime=True, fps=25.0):
+        self.loop = loop
+        self.realtime = realtime
+        self.fps = fps
+        self.frames_read = 0
+        self._next_at = None
+
+    @abstractmethod
+    def _next(self):
+        """(success, frame) for the next recorded frame"""
+
+    @abstractmethod
+    def _rewind(self):
+        """Restart playback from the first frame"""
+
+    def read(self):
+        success, frame = self._next()
+        if not success and self.loop and self.frames_read:
+            self._rewind()
+            success, frame = self._next()
+        if success:
+            self.frames_read += 1
+            if self.realtime:
+                now = time.monotonic()
+                if self._next_at is not None and self._next_at > now:
+                    time.sleep(self._next_at - now)
+                self._next_at = max(now, self._next_at or now) + 1.0 / self.fps
+        return success, frame
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        pass
+
+
+class FileCapture(ReplaySource):
+    """Video file replayed at its own frame rate, or `fps` if given"""
+
+    def __init__(self, path, loop=True, realtime=True, fps=None):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.path = path
+        self._capture = cv2.VideoCapture(path)
+        super().__init__(loop, realtime, fps or self._capture.get(cv2.CAP_PROP_FPS) or 25.0)
+
+    def isOpened(self):
+        return self._capture.isOpened()
+
+    def _next(self):
+        return self._capture.read()
+
+    def _rewind(self):
+        self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def set(self, prop, value):
+        return self._capture.set(prop, value)
+
+    def release(self):
+        self._capture.release()
+
+
+class ImageSequenceCapture(ReplaySource):
+    """Still images replayed in file name order as if they were video frames.
+
+    `pattern` is a directory (every image in it) or a glob such as
+    'frames/*.png'. Images that cannot be decoded are skipped.
+    """
+
+    def __init__(self, pattern, loop=True, realtime=True, fps=25.0):
+        if os.path.isdir(pattern):
+            paths = [os.path.join(pattern, name) for name in os.listdir(pattern)
+                     if name.lower().endswith(IMAGE_EXTENSIONS)]
+        else:
+            paths = glob.glob(pattern)
+        if not paths:
+            raise FileNotFoundError(f"no images match {pattern}")
+        self.path = pattern
+        self.paths = sorted(paths)
+        self._position = 0
+        super().__init__(loop, realtime, fps)
+
+    def isOpened(self):
+        return True
+
+    def _next(self):
+        while self._position < len(self.paths):
+            frame = cv2.imread(self.paths[self._position])
+            self._position += 1
+            if frame is not None:
+                return True, frame
+            print(f"Skipping unreadable image {self.paths[self._position - 1]}")
+        return False, None
+
+    def _rewind(self):
+        self._position = 0
+
+
+def is_image_sequence(source):
+    return os.path.isdir(source) or any(c in source for c in '*?[')
+
+
+def open_source(source, width=640, height=480, loop=True, realtime=True, fps=None):
+    """Capture for a camera index, stream URL (rtsp://, http://), video file,
+    image directory or image glob. `fps` overrides the replay rate of files."""
+    source = parse_source(source)
+    if isinstance(source, str) and '://' not in source:
+        if is_image_sequence(source):
+            return ImageSequenceCapture(source, loop=loop, realtime=realtime, fps=fps or 25.0)
+        return FileCapture(source, loop=loop, realtime=realtime, fps=fps)
+    cap = cv2.VideoCapture(source)
+    if isinstance(source, int):
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    else:
+        # Keep network streams from buffering stale frames
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+def read_frames(source, max_frames):
+    """Decode up to `max_frames` frames of a recording into memory, played once"""
+    capture = open_source(source, loop=False, realtime=False)
+    frames = []
+    try:
+        while len(frames) < max_frames:
+            success, frame = capture.read()
+            if not success:
+                break
+            frames.append(frame)
+    finally:
+        capture.release()
+    return frames
@@ -0,0 +1,294 @@
+"""Camera worker processes and the service that collects their events.
+
+Each configured camera runs in its own process. A worker loads the face
+store read-only (its embeddings are a memory map of the store file, so
+all workers share one copy through the page cache and pick up new
+registrations when the store changes; rows removed by compaction stay
+mapped and are skipped rather than copied out), tracks faces, confirms gestures
+and sends recognition events to the web app over an authenticated local
+socket. The web app dedupes the events and writes attendance.
+
+Cameras are listed in a JSON file (CAMERA_CONFIG, default cameras.json):
+
+    [{"id": "front-door", "source": 0},
+     {"id": "side-door", "source": "rtsp://10.0.0.12/stream1"},
+     {"id": "replay", "source": "data/videos/entrance.mp4", "loop": true}]
+
+A worker can also be started by hand, e.g. to try a recording:
+
+    python -m streaming.camera_workers --camera '{"id": "replay", "source": "entrance.mp4"}'
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from multiprocessing.connection import Client, Listener
+
+
+AUTHKEY_ENV = 'CAMERA_SERVICE_KEY'
+
+
+def load_camera_config(path):
+    """Camera entries from a JSON list, [] if the file does not exist"""
+    if not path or not os.path.exists(path):
+        return []
+    with open(path) as f:
+        cameras = json.load(f)
+    seen = set()
+    for index, camera in enumerate(cameras):
+        if 'source' not in camera:
+            raise ValueError(f"Camera {index} in {path} has no source")
+        camera.setdefault('id', f"camera-{index}")
+        if camera['id'] in seen:
+            raise ValueError(f"Duplicate camera id in {path}: {camera['id']}")
+        seen.add(camera['id'])
+    return cameras
+
+
+def run_worker(camera, send, stop, refresh_every=5.0, stats_every=5.0):
+    """Recognize faces and gestures from one camera until `stop` is set.
+
+    Returns True when a non-looping recording played to the end, False
+    when the source could not be opened or stopped delivering frames.
+    """
+    # The vision stack is only needed inside the worker process
+    from models.face_recognizer import FaceRecognizer
+    from models.face_tracker import FaceTracker
+    from models.gesture_recognizer import GestureRecognizer
+    from streaming.attendance_trigger import AttendanceTrigger
+    from streaming.camera_sources import ReplaySource, open_source
+    from streaming.frame_scheduler import FrameScheduler
+
+    camera_id = camera['id']
+    recognizer = FaceRecognizer(read_only=True)
+    tracker = FaceTracker(recognizer)
+    scheduler = FrameScheduler(tracker, GestureRecognizer(),
+                               gesture_policy=camera.get('gesture_policy', 'roi'),
+                               gesture_every=camera.get('gesture_every', 2))
+
+    def report_mark(name):
+        send({'type': 'recognized', 'camera': camera_id, 'name': name,
+              'time': datetime.now().isoformat(timespec='seconds')})
+        return True, 'sent'
+
+    # Repeats from this camera are dropped here; the service dedupes across cameras
+    trigger = AttendanceTrigger(report_mark, confirm_frames=camera.get('confirm_frames', 4))
+
+    try:
+        capture = open_source(camera['source'], loop=camera.get('loop', True), realtime=camera.get('realtime', True),
+                              fps=camera.get('fps'))
+    except OSError as e:
+        send({'type': 'error', 'camera': camera_id, 'message': f"could not open {camera['source']}: {e}"})
+        return False
+    if not capture.isOpened():
+        send({'type': 'error', 'camera': camera_id, 'message': f"could not open {camera['source']}"})
+        return False
+    send({'type': 'started', 'camera': camera_id, 'pid': os.getpid(), 'gallery': len(recognizer.gallery)})
+
+    frames = 0
+    last_refresh = last_stats = time.monotonic()
+    stats_frames = 0
+    try:
+        while not stop.is_set():
+            success, image = capture.read()
+            if not success:
+                send({'type': 'error', 'camera': camera_id, 'message': 'source ended'})
+                return isinstance(capture, ReplaySource)
+            frame = scheduler.prepare(image)
+            locations, names, track_ids = scheduler.faces(frame)
+            trigger.update({'locations': locations, 'names': names, 'track_ids': track_ids}, scheduler.hands(frame))
+            frames += 1
+            stats_frames += 1
+
+            now = time.monotonic()
+            if now - last_refresh >= refresh_every:
+                last_refresh = now
+                if recognizer.refresh():
+                    tracker.reset()
+                    scheduler.reset()
+            if now - last_stats >= stats_every:
+                send({'type': 'stats', 'camera': camera_id, 'frames': frames,
+                      'fps': round(stats_frames / (now - last_stats), 2), 'gallery': len(recognizer.gallery),
+                      'scheduler': scheduler.report(), 'trigger': trigger.report()})
+                last_stats, stats_frames = now, 0
+    finally:
+        capture.release()
+    return True
+
+
+class CameraManager:
+    """Runs a worker process per camera and records attendance from their events.
+
+    Workers connect back to a listener on localhost with a per-run key.
+    A recognition is written through `mark(name)` unless the same name was
+    already handled that day, here or (via `is_marked`) in the store. Workers
+    that fail (a camera that cannot be opened, a dropped stream, a crash)
+    are restarted after `restart_delay` seconds.
+    """
+
+    def __init__(self, cameras, mark, is_marked=None, restart_delay=5.0):
+        self.cameras = {camera['id']: camera for camera in cameras}
+        self.mark = mark
+        self.is_marked = is_marked
+        self.restart_delay = restart_delay
+        self.processes = {}
+        self.status = {camera_id: {'source': str(camera['source']), 'restarts': 0, 'last_event': None,
+                                   'last_stats': None, 'error': None}
+                       for camera_id, camera in self.cameras.items()}
+        self.seen = set()  # (name, date) already handled
+        self.counters = {'events': 0, 'marked': 0, 'duplicates': 0, 'failed': 0}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._authkey = os.urandom(16)
+        self._listener = None
+
+    def start(self):
+        self._listener = Listener(('127.0.0.1', 0), authkey=self._authkey)
+        threading.Thread(target=self._accept_loop, name='camera-service', daemon=True).start()
+        for camera_id in self.cameras:
+            self._spawn(camera_id)
+        threading.Thread(target=self._monitor_loop, name='camera-monitor', daemon=True).start()
+        return self
+
+    def _spawn(self, camera_id):
+        host, port = self._listener.address
+        env = dict(os.environ, **{AUTHKEY_ENV: self._authkey.hex()})
+        self.processes[camera_id] = subprocess.Popen(
+            [sys.executable, '-m', 'streaming.camera_workers', '--connect', f"{host}:{port}",
+             '--camera', json.dumps(self.cameras[camera_id])],
+            cwd=os.getcwd(), env=env)
+
+    def _monitor_loop(self):
+        exited_at = {}
+        while not self._stopping.wait(1.0):
+            for camera_id, process in list(self.processes.items()):
+                # Exit status 0 means a recording finished or the worker was stopped
+                if process.poll() is None or process.returncode == 0:
+                    continue
+                exited_at.setdefault(camera_id, time.monotonic())
+                if time.monotonic() - exited_at[camera_id] >= self.restart_delay:
+                    del exited_at[camera_id]
+                    with self._lock:
+                        self.status[camera_id]['restarts'] += 1
+                    self._spawn(camera_id)
+
+    def _accept_loop(self):
+        while not self._stopping.is_set():
+            try:
+                conn = self._listener.accept()
+            except (OSError, EOFError):
+                if self._stopping.is_set():
+                    return
+                continue
+            threading.Thread(target=self._receive_loop, args=(conn,), daemon=True).start()
+
+    def _receive_loop(self, conn):
+        with conn:
+            while not self._stopping.is_set():
+                try:
+                    event = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    self.handle(event)
+                except Exception as e:
+                    print(f"Error handling camera event {event}: {e}")
+
+    def handle(self, event):
+        camera_id = event.get('camera')
+        with self._lock:
+            status = self.status.setdefault(camera_id, {'source': None, 'restarts': 0, 'last_event': None,
+                                                        'last_stats': None, 'error': None})
+            if event['type'] == 'stats':
+                status['last_stats'] = event
+                return
+            if event['type'] == 'error':
+                status['error'] = event['message']
+                print(f"Camera {camera_id}: {event['message']}")
+                return
+            if event['type'] == 'started':
+                status['error'] = None
+                status['pid'] = event['pid']
+                return
+            if event['type'] != 'recognized':
+                return
+
+            self.counters['events'] += 1
+            status['last_event'] = event
+            key = (event['name'], event['time'][:10])
+            if key in self.seen or (self.is_marked is not None and self.is_marked(*key)):
+                self.seen.add(key)
+                self.counters['duplicates'] += 1
+                return
+
+            success, message = self.mark(event['name'])
+            if success:
+                self.seen.add(key)
+                self.counters['marked'] += 1
+                print(f"Camera {camera_id}: {message}")
+            else:
+                self.counters['failed'] += 1
+                print(f"Camera {camera_id}: attendance for {event['name']} not marked: {message}")
+
+    def report(self):
+        with self._lock:
+            cameras = {}
+            for camera_id, status in self.status.items():
+                process = self.processes.get(camera_id)
+                cameras[camera_id] = dict(status, alive=process is not None and process.poll() is None)
+            return {'cameras': cameras, 'service': dict(self.counters)}
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        for process in self.processes.values():
+            if process.poll() is None:
+                process.terminate()
+        for process in self.processes.values():
+            try:
+                process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--camera', required=True, help='camera entry as JSON')
+    parser.add_argument('--connect', help='host:port of the camera service (default: print events)')
+    args = parser.parse_args()
+    camera = json.loads(args.camera)
+    camera.setdefault('id', 'camera-0')
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    if args.connect:
+        host, port = args.connect.rsplit(':', 1)
+        conn = Client((host, int(port)), authkey=bytes.fromhex(os.environ[AUTHKEY_ENV]))
+        send = conn.send
+    else:
+        conn = None
+        send = print
+    finished = False
+    try:
+        finished = run_worker(camera, send, stop)
+    except (EOFError, ConnectionError) as e:
+        # The service went away; nothing left to report to
+        print(f"Camera {camera['id']} stopping: {e}")
+        finished = True
+    finally:
+        if conn is not None:
+            conn.close()
+    sys.exit(0 if finished else 1)
+
+
+if __name__ == '__main__':
+    main()
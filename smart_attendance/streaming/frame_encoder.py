@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import namedtuple
+
+from monitoring.metrics import metrics
+
+try:
+    from turbojpeg import TurboJPEG
+except ImportError:
+    TurboJPEG = None
+
+ENCODERS = ('auto', 'opencv', 'turbojpeg')
+
+MIN_QUALITY = 30
+QUALITY_STEP = 10
+
+StreamProfile = namedtuple('StreamProfile', ['width', 'quality', 'max_fps', 'adaptive'])
+DEFAULT_PROFILE = StreamProfile(width=None, quality=80, max_fps=None, adaptive=True)
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def parse_profile(params, default=DEFAULT_PROFILE):
+    """Stream settings from query parameters: width, quality, fps, adaptive.
+
+    `params` is a mapping of strings (e.g. request.args); missing or
+    malformed values fall back to `default`.
+    """
+    def number(key, cast):
+        try:
+            return cast(params[key])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    width = number('width', int)
+    quality = number('quality', int)
+    fps = number('fps', float)
+    adaptive = params.get('adaptive')
+    return StreamProfile(
+        width=_clamp(width, 80, 3840) if width else default.width,
+        quality=_clamp(quality, MIN_QUALITY, 100) if quality else default.quality,
+        max_fps=_clamp(fps, 0.5, 60.0) if fps else default.max_fps,
+        adaptive=default.adaptive if adaptive is None else adaptive.lower() not in ('0', 'false', 'no', 'off'),
+    )
+
+
+class JpegEncoder:
+    """JPEG encoding through libjpeg-turbo when PyTurboJPEG is installed, else OpenCV.
+
+    Counts encodes and time per backend so the cost is visible in the
+    pipeline stats.
+    """
+
+    def __init__(self, backend='auto'):
+        if backend not in ENCODERS:
+            raise ValueError(f"Unknown JPEG encoder: {backend}")
+        self._turbo = None
+        if backend in ('auto', 'turbojpeg') and TurboJPEG is not None:
+            try:
+                self._turbo = TurboJPEG()
+            except (OSError, RuntimeError) as e:
+                # The Python package is there but the libturbojpeg library is not
+                print(f"libjpeg-turbo unavailable, using OpenCV: {e}")
+        elif backend == 'turbojpeg':
+            print("PyTurboJPEG is not installed, using OpenCV for JPEG encoding")
+        self.backend = 'turbojpeg' if self._turbo is not None else 'opencv'
+        self.encodes = 0
+        self.total_time = 0.0
+        self._lock = threading.Lock()
+
+    def encode(self, image, quality=80):
+        started_at = time.perf_counter()
+        if self._turbo is not None:
+            data = self._turbo.encode(image, quality=quality)
+        else:
+            import cv2
+            _, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            data = buffer.tobytes()
+        metrics.observe('jpeg_encode', started_at)
+        with self._lock:
+            self.encodes += 1
+            self.total_time += time.perf_counter() - started_at
+        return data
+
+    def report(self):
+        with self._lock:
+            return {'backend': self.backend, 'encodes': self.encodes,
+                    'avg_ms': round(self.total_time / self.encodes * 1000, 2) if self.encodes else 0.0}
+
+
+class QualityController:
+    """Per-client JPEG quality that follows how fast the client consumes frames.
+
+    Quality moves in QUALITY_STEP steps below the profile's quality, so
+    clients with the same settings tend to land on the same level and share
+    encodes. Every `window` deliveries, more than `drop_ratio` frames
+    replaced before the client took them steps quality down; a window with
+    no drops steps it back up.
+    """
+
+    def __init__(self, profile, window=15, drop_ratio=0.2):
+        self.profile = profile
+        self.window = window
+        self.drop_ratio = drop_ratio
+        self.quality = profile.quality
+        self._delivered = 0
+        self._dropped = 0
+
+    def record(self, dropped):
+        if not self.profile.adaptive:
+            return
+        self._delivered += 1
+        self._dropped += int(dropped)
+        if self._delivered < self.window:
+            return
+        if self._dropped > self.window * self.drop_ratio:
+            self.quality = max(MIN_QUALITY, self.quality - QUALITY_STEP)
+        elif self._dropped == 0:
+            self.quality = min(self.profile.quality, self.quality + QUALITY_STEP)
+        self._delivered = self._dropped = 0
@@ -0,0 +1,242 @@
+import asyncio
+import threading
+import time
+
+from streaming.frame_encoder import DEFAULT_PROFILE, JpegEncoder, QualityController
+from streaming.frame_pipeline import DropQueue
+
+
+class Subscription:
+    """One client's view of the hub: a single-slot queue of encoded frames.
+
+    `profile` holds the client's output width, JPEG quality and frame rate
+    cap; the quality it is currently served at adapts to how many frames
+    it leaves unconsumed.
+    """
+
+    def __init__(self, profile=None, queue_size=1):
+        self.queue = DropQueue(queue_size, 'drop_oldest')
+        self.profile = profile or DEFAULT_PROFILE
+        self.quality = QualityController(self.profile)
+        self.closed = False
+        self.delivered = 0
+        self._next_at = None
+
+    @property
+    def dropped(self):
+        return self.queue.dropped
+
+    def due(self, now):
+        """Whether the frame rate cap allows sending a frame at `now`"""
+        return not self.profile.max_fps or self._next_at is None or now >= self._next_at
+
+    def _sent(self, now):
+        if not self.profile.max_fps:
+            return
+        now = now if now is not None else time.monotonic()
+        interval = 1.0 / self.profile.max_fps
+        # Schedule from the previous slot so the average rate matches the cap
+        # even when captures do not line up with it; restart after a stall
+        if self._next_at is None or now - self._next_at > interval:
+            self._next_at = now + interval
+        else:
+            self._next_at += interval
+
+    def put(self, frame_bytes, now=None):
+        """Hand over a frame, returns True if an unconsumed one was replaced"""
+        self._sent(now)
+        dropped = self.queue.dropped
+        self.queue.put(frame_bytes)
+        replaced = self.queue.dropped > dropped
+        self.quality.record(replaced)
+        return replaced
+
+    def close(self):
+        self.closed = True
+
+
+class AsyncSubscription(Subscription):
+    """Subscription for an asyncio client.
+
+    The hub thread stores the newest frame and wakes the event loop; a
+    frame the client has not taken yet is replaced and counted as dropped,
+    so a slow connection never builds up a backlog.
+    """
+
+    def __init__(self, loop, profile=None):
+        super().__init__(profile)
+        self.loop = loop
+        self.ready = asyncio.Event()
+        self._frame = None
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    @property
+    def dropped(self):
+        return self._dropped
+
+    def _wake(self):
+        try:
+            self.loop.call_soon_threadsafe(self.ready.set)
+        except RuntimeError:
+            # Event loop already closed
+            self.closed = True
+
+    def put(self, frame_bytes, now=None):
+        self._sent(now)
+        with self._lock:
+            replaced = self._frame is not None
+            if replaced:
+                self._dropped += 1
+            self._frame = frame_bytes
+        self._wake()
+        self.quality.record(replaced)
+        return replaced
+
+    def close(self):
+        self.closed = True
+        self._wake()
+
+    async def get(self, timeout=None):
+        """Newest frame, or None on timeout or close"""
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.ready.clear()
+        with self._lock:
+            frame_bytes, self._frame = self._frame, None
+        return frame_bytes
+
+
+class FrameHub:
+    """Process-wide broadcaster for the camera stream.
+
+    One pipeline captures and runs inference. For each new frame the hub
+    draws annotations once per output width, on the downscaled copy, and
+    encodes once per (width, quality); subscribers with the same settings
+    share the bytes. Subscribers whose frame rate cap is not yet due are
+    skipped, and nothing is rendered while none is due. Each subscriber has
+    its own drop-oldest slot, so a slow client skips frames instead of
+    holding up the others. The pipeline starts with the first subscriber
+    and stops `linger` seconds after the last one leaves.
+    """
+
+    def __init__(self, pipeline_factory, linger=2.0, encoder=None):
+        self.pipeline_factory = pipeline_factory
+        self.linger = linger
+        self.encoder = encoder or JpegEncoder()
+        self.outputs = 0  # frames handed to subscribers, shared encodes included
+        self.pipeline = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._stop_timer = None
+
+    def subscribe(self, subscription=None):
+        subscription = subscription or Subscription()
+        with self._lock:
+            if self._stop_timer is not None:
+                self._stop_timer.cancel()
+                self._stop_timer = None
+            if self.pipeline is None or not self.pipeline.running:
+                self._start()
+            # Added only once the camera is open: a failed start leaves no viewer behind
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+            if self._subscribers or self.pipeline is None:
+                return
+            if self.linger > 0:
+                self._stop_timer = threading.Timer(self.linger, self._stop_if_idle)
+                self._stop_timer.daemon = True
+                self._stop_timer.start()
+            else:
+                self._stop()
+
+    def _start(self):
+        if self.pipeline is not None:
+            # A pipeline that ended on its own (camera lost) still holds its capture
+            self.pipeline.stop()
+        pipeline = self.pipeline_factory().start()
+        self.pipeline = pipeline
+        threading.Thread(target=self._broadcast, args=(pipeline,), name='frame-hub', daemon=True).start()
+
+    def _stop(self):
+        if self.pipeline is not None:
+            self.pipeline.stop()
+
+    def _stop_if_idle(self):
+        with self._lock:
+            self._stop_timer = None
+            if not self._subscribers:
+                self._stop()
+
+    def _broadcast(self, pipeline):
+        for snapshot in pipeline.frames():
+            now = time.monotonic()
+            with self._lock:
+                due = [s for s in self._subscribers if s.due(now)]
+            rendered, encoded = {}, {}
+            for subscription in due:
+                width = subscription.profile.width
+                key = (width, subscription.quality.quality)
+                if key not in encoded:
+                    if width not in rendered:
+                        rendered[width] = pipeline.render(snapshot, width)
+                    encoded[key] = self.encoder.encode(rendered[width], key[1])
+                subscription.put(encoded[key], now)
+            self.outputs += len(due)
+
+        # Pipeline ended (camera lost or stopped): release anyone still waiting
+        with self._lock:
+            if self.pipeline is pipeline:
+                for subscription in self._subscribers:
+                    subscription.close()
+
+    def stream(self, profile=None):
+        """Yield encoded frames for one client until it disconnects"""
+        subscription = self.subscribe(Subscription(profile))
+        try:
+            while not subscription.closed:
+                frame_bytes = subscription.queue.get(timeout=0.5)
+                if frame_bytes is None:
+                    continue
+                subscription.delivered += 1
+                yield frame_bytes
+        finally:
+            self.unsubscribe(subscription)
+
+    async def astream(self, profile=None):
+        """Async counterpart of stream() for event-loop servers"""
+        loop = asyncio.get_running_loop()
+        subscription = AsyncSubscription(loop, profile)
+        # The first subscriber opens the camera, which may block for a while
+        await loop.run_in_executor(None, self.subscribe, subscription)
+        try:
+            while not subscription.closed:
+                frame_bytes = await subscription.get(timeout=0.5)
+                if frame_bytes is None:
+                    continue
+                subscription.delivered += 1
+                yield frame_bytes
+        finally:
+            self.unsubscribe(subscription)
+
+    def report(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+            pipeline = self.pipeline
+        report = pipeline.report() if pipeline is not None else {}
+        report['hub'] = {
+            'running': bool(pipeline and pipeline.running),
+            'subscribers': len(subscribers),
+            'delivered': [s.delivered for s in subscribers],
+            'dropped': [s.dropped for s in subscribers],
+            'streams': [dict(s.profile._asdict(), current_quality=s.quality.quality) for s in subscribers],
+            'outputs': self.outputs,
+            'encoder': self.encoder.report(),
+        }
+        return report
@@ -0,0 +1,225 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+from monitoring.metrics import metrics
+
+Frame = namedtuple('Frame', ['seq', 'image', 'captured_at'])
+StageResult = namedtuple('StageResult', ['seq', 'value', 'finished_at'])
+# A captured frame with the newest results available when it was taken
+Snapshot = namedtuple('Snapshot', ['frame', 'face', 'gesture', 'status'])
+
+
+class DropQueue:
+    """Bounded queue that never blocks the producer.
+
+    When full, 'drop_oldest' evicts the queued item to make room and
+    'drop_newest' discards the incoming one. Drops are counted.
+    """
+
+    def __init__(self, maxsize=1, policy='drop_oldest'):
+        if policy not in ('drop_oldest', 'drop_newest'):
+            raise ValueError(f"Unknown drop policy: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self.dropped += 1
+                if self.policy == 'drop_newest':
+                    return False
+                self._items.popleft()
+            self._items.append(item)
+            self._cond.notify()
+            return True
+
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class StageStats:
+    """Throughput and latency counters for one pipeline stage"""
+
+    def __init__(self, name, window=120):
+        self.name = name
+        self.metric = f"pipeline_{name}"
+        self.processed = 0
+        self.total_time = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, started_at, captured_at=None):
+        metrics.observe(self.metric, started_at)
+        now = time.perf_counter()
+        with self._lock:
+            self.processed += 1
+            self.total_time += now - started_at
+            # (finish time, work time, time since the frame was captured)
+            self._recent.append((now, now - started_at, now - (captured_at or started_at)))
+
+    def snapshot(self):
+        with self._lock:
+            recent = list(self._recent)
+            processed, total_time = self.processed, self.total_time
+        fps = 0.0
+        if len(recent) > 1 and recent[-1][0] > recent[0][0]:
+            fps = (len(recent) - 1) / (recent[-1][0] - recent[0][0])
+        return {
+            'processed': processed,
+            'fps': round(fps, 2),
+            'avg_ms': round(total_time / processed * 1000, 2) if processed else 0.0,
+            'recent_ms': round(sum(r[1] for r in recent) / len(recent) * 1000, 2) if recent else 0.0,
+            'frame_age_ms': round(sum(r[2] for r in recent) / len(recent) * 1000, 2) if recent else 0.0,
+        }
+
+
+class FramePipeline:
+    """Capture, inference and rendering decoupled into threads.
+
+    A capture thread keeps only the newest frame and offers it to the face
+    and gesture workers through bounded drop queues. The workers run
+    concurrently and publish their latest results. `frames()` pairs the
+    newest frame with whatever results are available, so the stream never
+    waits for inference, and `render()` draws them at an output size.
+
+    face_stage(image) and gesture_stage(image) must not modify the image.
+    If `prepare` is given, both stages receive prepare(image) instead, one
+    object per captured frame, e.g. to share colour conversions.
+    on_results(face, gesture) runs after each gesture result and may return
+    a status value that is passed on to render(image, face, gesture, status,
+    scale), which draws on an image already resized by `scale`.
+    """
+
+    def __init__(self, open_capture, face_stage, gesture_stage, render, on_results=None,
+                 queue_size=1, drop_policy='drop_oldest', prepare=None):
+        self.open_capture = open_capture
+        self.prepare = prepare
+        self.draw = render
+        self.on_results = on_results
+        self.stages = {
+            'face': (face_stage, DropQueue(queue_size, drop_policy)),
+            'gesture': (gesture_stage, DropQueue(queue_size, drop_policy)),
+        }
+        self.stats = {name: StageStats(name) for name in ('capture', 'face', 'gesture', 'decision', 'render')}
+        self.results = {'face': None, 'gesture': None}
+        self.status = None
+
+        self._latest = None
+        self._latest_cond = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+        self._capture = None
+
+    @property
+    def running(self):
+        return not self._stop.is_set() and any(t.is_alive() for t in self._threads)
+
+    def start(self):
+        self._capture = self.open_capture()
+        self._threads = [threading.Thread(target=self._capture_loop, name='capture', daemon=True)]
+        for name in self.stages:
+            self._threads.append(threading.Thread(target=self._stage_loop, args=(name,),
+                                                  name=f'{name}-worker', daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._latest_cond:
+            self._latest_cond.notify_all()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=2)
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+
+    def _capture_loop(self):
+        seq = 0
+        while not self._stop.is_set():
+            started_at = time.perf_counter()
+            success, image = self._capture.read()
+            if not success:
+                break
+            seq += 1
+            frame = Frame(seq, image, started_at)
+            self.stats['capture'].record(started_at)
+
+            with self._latest_cond:
+                self._latest = frame
+                self._latest_cond.notify_all()
+            work = frame if self.prepare is None else Frame(seq, self.prepare(image), started_at)
+            for _, queue in self.stages.values():
+                queue.put(work)
+        self._stop.set()
+        with self._latest_cond:
+            self._latest_cond.notify_all()
+
+    def _stage_loop(self, name):
+        func, queue = self.stages[name]
+        while not self._stop.is_set():
+            frame = queue.get(timeout=0.1)
+            if frame is None:
+                continue
+            started_at = time.perf_counter()
+            try:
+                value = func(frame.image)
+            except Exception as e:
+                print(f"Error in {name} stage: {e}")
+                metrics.increment('errors', stage=name)
+                continue
+            self.results[name] = StageResult(frame.seq, value, time.perf_counter())
+            self.stats[name].record(started_at, frame.captured_at)
+
+            if name == 'gesture' and self.on_results is not None:
+                started_at = time.perf_counter()
+                self.status = self.on_results(self.results['face'], self.results[name])
+                self.stats['decision'].record(started_at, frame.captured_at)
+
+    def frames(self):
+        """Yield a Snapshot per new capture, each frame at most once"""
+        last_seq = 0
+        while not self._stop.is_set():
+            with self._latest_cond:
+                while not self._stop.is_set() and (self._latest is None or self._latest.seq == last_seq):
+                    self._latest_cond.wait(timeout=0.5)
+                frame = self._latest
+            if frame is None or frame.seq == last_seq:
+                continue
+            last_seq = frame.seq
+            yield Snapshot(frame, self.results['face'], self.results['gesture'], self.status)
+
+    def render(self, snapshot, width=None):
+        """Annotated copy of a snapshot's frame, downscaled to `width` first"""
+        started_at = time.perf_counter()
+        image = snapshot.frame.image
+        scale = 1.0
+        if width and width < image.shape[1]:
+            import cv2
+            scale = width / image.shape[1]
+            image = cv2.resize(image, (width, round(image.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+        else:
+            image = image.copy()
+        rendered = self.draw(image, snapshot.face, snapshot.gesture, snapshot.status, scale)
+        self.stats['render'].record(started_at, snapshot.frame.captured_at)
+        return rendered
+
+    def report(self):
+        report = {name: stats.snapshot() for name, stats in self.stats.items()}
+        for name, (_, queue) in self.stages.items():
+            report[name]['queue_depth'] = len(queue)
+            report[name]['dropped'] = queue.dropped
+        return report
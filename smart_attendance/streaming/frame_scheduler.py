@@ -0,0 +1,211 @@
+import threading
+import time
+
+import numpy as np
+
+GESTURE_POLICIES = ('always', 'stable', 'roi')
+
+EMPTY_GESTURES = {'landmarks': [], 'gestures': [], 'gesture': None, 'points': [], 'fresh': False, 'region': None}
+
+# Landmarks around the palm: wrist and the four finger MCP joints
+PALM_LANDMARKS = (0, 5, 9, 13, 17)
+
+
+class ModelStats:
+    """Invocation counts and time spent per model"""
+
+    def __init__(self):
+        self.models = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, started_at, calls=1):
+        elapsed = time.perf_counter() - started_at
+        with self._lock:
+            model = self.models.setdefault(name, {'calls': 0, 'time': 0.0})
+            model['calls'] += calls
+            model['time'] += elapsed
+
+    def snapshot(self):
+        with self._lock:
+            return {name: {'calls': m['calls'], 'total_ms': round(m['time'] * 1000, 2),
+                           'avg_ms': round(m['time'] / m['calls'] * 1000, 2) if m['calls'] else 0.0}
+                    for name, m in self.models.items()}
+
+
+class SharedFrame:
+    """A captured BGR frame and its RGB conversion, made at most once.
+
+    The face and gesture workers receive the same instance for a frame, so
+    whichever asks first pays for the conversion and the other reuses it.
+    """
+
+    def __init__(self, image, stats=None):
+        self.image = image
+        self.stats = stats
+        self._rgb = None
+        self._lock = threading.Lock()
+
+    @property
+    def rgb(self):
+        with self._lock:
+            if self._rgb is None:
+                import cv2
+                started_at = time.perf_counter()
+                self._rgb = cv2.cvtColor(self.image, cv2.COLOR_BGR2RGB)
+                if self.stats is not None:
+                    self.stats.record('rgb_convert', started_at)
+            return self._rgb
+
+
+def contains(outer, inner):
+    """Whether (top, right, bottom, left) box `inner` lies inside `outer`"""
+    return outer[0] <= inner[0] and outer[1] >= inner[1] and outer[2] >= inner[2] and outer[3] <= inner[3]
+
+
+class FrameScheduler:
+    """Decides which models run on a frame and shares their input.
+
+    Faces are tracked on every frame the face worker picks up. Hand
+    detection is gated on the latest face result:
+
+    'always' runs MediaPipe hands on every frame, as before.
+    'stable' runs it on the full frame once a recognized face has been seen
+    in `stable_frames` consecutive face results.
+    'roi' additionally restricts it to a region around the recognized faces,
+    `hand_margin` face widths to either side and below. The region only
+    moves when a face leaves it, so MediaPipe's tracking between frames
+    keeps working in stable crop coordinates.
+
+    While the gate is open hands are detected every `gesture_every` frames;
+    frames in between repeat the last result with 'fresh' set to False.
+    """
+
+    def __init__(self, tracker, gesture_recognizer, gesture_policy='roi', gesture_every=2,
+                 stable_frames=3, hand_margin=2.0):
+        if gesture_policy not in GESTURE_POLICIES:
+            raise ValueError(f"Unknown gesture policy: {gesture_policy}")
+        self.tracker = tracker
+        self.gesture_recognizer = gesture_recognizer
+        self.gesture_policy = gesture_policy
+        self.gesture_every = max(1, gesture_every)
+        self.stable_frames = stable_frames
+        self.hand_margin = hand_margin
+        self.stats = ModelStats()
+        self.gate = {'frames': 0, 'ran': 0, 'no_face': 0, 'unstable': 0, 'cadence': 0}
+        self.reset()
+
+    def reset(self):
+        # (boxes of recognized faces, names, consecutive results with a recognized face)
+        self._known = ([], set(), 0)
+        self._region = None
+        self._last = None
+        self._since_run = 0
+
+    def prepare(self, image):
+        """Per-frame object handed to both pipeline stages"""
+        return SharedFrame(image, self.stats)
+
+    def faces(self, frame):
+        """Track and recognize faces, returns (face_locations, face_names, track_ids)"""
+        started_at = time.perf_counter()
+        face_locations, face_names = self.tracker.update(frame.image, frame.rgb)
+        track_ids = list(self.tracker.last_ids)
+        self.stats.record('face_tracker', started_at)
+
+        boxes = [box for box, name in zip(face_locations, face_names) if name != "Unknown"]
+        names = {name for name in face_names if name != "Unknown"}
+        _, previous, streak = self._known
+        if not names:
+            streak = 0
+        elif names & previous:
+            streak += 1
+        else:
+            streak = 1
+        self._known = (boxes, names, streak)
+        return face_locations, face_names, track_ids
+
+    def _hand_region(self, boxes, shape):
+        height, width = shape[:2]
+        top = min(b[0] for b in boxes)
+        right = max(b[1] for b in boxes)
+        bottom = max(b[2] for b in boxes)
+        left = min(b[3] for b in boxes)
+        pad = int(max(b[1] - b[3] for b in boxes) * self.hand_margin)
+        # Raised hands are beside and below the face rather than above it
+        wanted = (max(0, top - pad // 2), min(width, right + pad), min(height, bottom + pad), max(0, left - pad))
+        if self._region is None or not contains(self._region, wanted):
+            self._region = wanted
+        return self._region
+
+    def _idle(self, reason):
+        self.gate[reason] += 1
+        self._last = None
+        self._region = None
+        # A fresh observation of no hands: gesture confirmations start over
+        return dict(EMPTY_GESTURES, fresh=True)
+
+    def hands(self, frame):
+        """Hand landmarks and gestures, or the held/empty result when gated"""
+        self.gate['frames'] += 1
+        boxes, _, streak = self._known
+        if self.gesture_policy != 'always':
+            if not boxes:
+                return self._idle('no_face')
+            if streak < self.stable_frames:
+                return self._idle('unstable')
+
+        if self._last is not None and self._since_run < self.gesture_every - 1:
+            self._since_run += 1
+            self.gate['cadence'] += 1
+            return dict(self._last, fresh=False)
+        self._since_run = 0
+
+        rgb = frame.rgb
+        region = None
+        if self.gesture_policy == 'roi':
+            region = self._hand_region(boxes, rgb.shape)
+            top, right, bottom, left = region
+            rgb = np.ascontiguousarray(rgb[top:bottom, left:right])
+
+        started_at = time.perf_counter()
+        hands = self.gesture_recognizer.detect_hands(frame.image, rgb)
+        self.stats.record('hands', started_at)
+        if region is not None:
+            self._to_frame_coords(hands, region, frame.image.shape)
+
+        gestures = self.gesture_recognizer.recognize_gestures(hands)
+        self.gate['ran'] += 1
+        self._last = {'landmarks': hands, 'gestures': gestures,
+                      'gesture': next((g for g in gestures if g), None),
+                      'points': self._palm_points(hands, frame.image.shape), 'fresh': True, 'region': region}
+        return self._last
+
+    def _palm_points(self, hands, shape):
+        """Palm centre of each hand in frame pixels, used to bind hands to faces"""
+        height, width = shape[:2]
+        return [(sum(hand.landmark[i].x for i in PALM_LANDMARKS) / len(PALM_LANDMARKS) * width,
+                 sum(hand.landmark[i].y for i in PALM_LANDMARKS) / len(PALM_LANDMARKS) * height)
+                for hand in hands]
+
+    def _to_frame_coords(self, hands, region, shape):
+        """Rescale landmarks normalized to the crop to the full frame, in place"""
+        height, width = shape[:2]
+        top, right, bottom, left = region
+        sx, sy = (right - left) / width, (bottom - top) / height
+        for hand in hands:
+            for lm in hand.landmark:
+                lm.x = left / width + lm.x * sx
+                lm.y = top / height + lm.y * sy
+                lm.z = lm.z * sx
+
+    def report(self):
+        report = {'models': self.stats.snapshot(), 'gesture_gate': dict(self.gate, policy=self.gesture_policy)}
+        counters = self.tracker.counters
+        report['models']['face_detect'] = {
+            'calls': counters['detections'], 'total_ms': round(counters['detect_time'] * 1000, 2),
+            'avg_ms': round(counters['detect_time'] / counters['detections'] * 1000, 2) if counters['detections'] else 0.0}
+        report['models']['face_encode'] = {
+            'calls': counters['encode_batches'], 'faces': counters['encodings'],
+            'total_ms': round(counters['encode_time'] * 1000, 2),
+            'avg_ms': round(counters['encode_time'] / counters['encode_batches'] * 1000, 2) if counters['encode_batches'] else 0.0}
+        return report